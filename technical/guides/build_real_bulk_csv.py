@@ -1,60 +1,40 @@
 #!/usr/bin/env python3
 """
-Query UHC API for full patient details and create bulk upload CSV
+Create a bulk upload CSV from real claims in one search
+
+Search results already carry each patient's DOB and subscriber ID
+(memberInfo), so the rows come straight from the stored results - no
+GET /claims/{claim_number}/ per claim.
 """
-import requests
+import asyncio
 import csv
-from datetime import datetime
 
-API_BASE_URL = "https://connectme.be.totesoft.com"
+from connectme import ClaimsClient
+from connectme.cache import CachedSearch, WindowCache
+from connectme.export import cache_pages, stream_csv, table_fields
 
 # Claims from manual search
-claims = [
-    {"claim_number": "51598988", "patient_name": "TOMMY HOWELL", "service_date": "07/03/2025"},
-    {"claim_number": "51611599", "patient_name": "MOSTAFA KORDI", "service_date": "07/03/2025"},
-    {"claim_number": "FE98163821", "patient_name": "ZOEY WILCOX", "service_date": "07/02/2025"},
-    {"claim_number": "FE23924647", "patient_name": "KIMBERLY KURAK", "service_date": "07/01/2025"},
-    {"claim_number": "51545088", "patient_name": "RANDALL MOIR", "service_date": "07/01/2025"},
-]
+FIRST_SERVICE_DATE = "2025-07-01"
+LAST_SERVICE_DATE = "2025-07-03"
+CLAIM_NUMBERS = {"51598988", "51611599", "FE98163821", "FE23924647", "51545088"}
 
-def get_auth_token():
+async def get_auth_token(client):
     """Get authentication token"""
     print("🔐 Authenticating...")
     try:
-        response = requests.post(f"{API_BASE_URL}/api/v1/auth/mock/login/", json={}, timeout=10)
-        if response.status_code == 200:
-            token = response.json().get('access_token')
-            print("✅ Authenticated\n")
-            return token
-        return None
+        token = await client.token()
+        print("✅ Authenticated\n")
+        return token
     except Exception as e:
         print(f"❌ Auth error: {e}")
         return None
 
-def get_claim_details(token, claim_number):
-    """Get full claim details including patient info"""
-    print(f"   Querying claim {claim_number}...", end='')
-    
-    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-    
-    try:
-        response = requests.get(
-            f"{API_BASE_URL}/api/v1/claims/{claim_number}/",
-            headers=headers,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            print(" ✅")
-            return response.json()
-        else:
-            print(f" ❌ Error: {response.status_code}")
-            return None
-    except Exception as e:
-        print(f" ❌ Error: {e}")
-        return None
+def selected_pages(cache, scope):
+    """Stored claims for the window, limited to CLAIM_NUMBERS when it is set"""
+    for page in cache_pages(cache, scope, FIRST_SERVICE_DATE, LAST_SERVICE_DATE, fields=table_fields(['bulk_upload'])):
+        yield [claim for claim in page if not CLAIM_NUMBERS or claim.get('claimNumber') in CLAIM_NUMBERS]
 
-def main():
+async def main():
     print("""
 ╔═══════════════════════════════════════════════════════════════════════════╗
 ║                                                                           ║
@@ -63,64 +43,40 @@ def main():
 ╚═══════════════════════════════════════════════════════════════════════════╝
     """)
     
-    token = get_auth_token()
-    if not token:
-        print("❌ Cannot proceed without authentication")
-        return
-    
-    csv_data = []
-    
-    print("📊 Fetching full patient details:\n")
-    for claim in claims:
-        details = get_claim_details(token, claim['claim_number'])
+    cache = WindowCache()
+    async with ClaimsClient() as client:
+        token = await get_auth_token(client)
+        if not token:
+            print("❌ Cannot proceed without authentication")
+            return
         
-        if details:
-            patient = details.get('patient', {})
-            subscriber = details.get('subscriber', {})
-            
-            # Parse names
-            first_name = patient.get('firstName', '').strip()
-            last_name = patient.get('lastName', '').strip()
-            
-            # Get DOB and subscriber ID
-            dob = patient.get('dateOfBirth', 'UNKNOWN')
-            subscriber_id = subscriber.get('memberId') or subscriber.get('subscriberId', 'UNKNOWN')
-            
-            # Parse service date
-            service_date = claim['service_date']
-            try:
-                dt = datetime.strptime(service_date, '%m/%d/%Y')
-                service_date_iso = dt.strftime('%Y-%m-%d')
-            except:
-                service_date_iso = service_date
-            
-            csv_data.append({
-                'claim_number': claim['claim_number'],
-                'first_name': first_name,
-                'last_name': last_name,
-                'date_of_birth': dob,
-                'subscriber_id': subscriber_id,
-                'first_service_date': service_date_iso,
-                'last_service_date': service_date_iso
-            })
-            
-            print(f"      ✓ {first_name} {last_name} | DOB: {dob} | Subscriber: {subscriber_id}")
-    
-    if not csv_data:
-        print("\n❌ No claims retrieved successfully")
-        return
+        print(f"📊 Searching {FIRST_SERVICE_DATE} to {LAST_SERVICE_DATE} (cached days are not re-queried)...")
+        try:
+            scope, truncated = await CachedSearch(client, cache).refresh(FIRST_SERVICE_DATE, LAST_SERVICE_DATE, timeout=30)
+        except Exception as e:
+            print(f"❌ Search error: {e}")
+            return
+        if truncated:
+            print(f"⚠️  {len(truncated)} day(s) still hit the 500-claim cap: {', '.join(map(str, truncated))}")
     
     # Create CSV
     filename = 'csv-templates/real-claims-july-2025.csv'
-    with open(filename, 'w', newline='') as f:
-        fieldnames = ['claim_number', 'first_name', 'last_name', 'date_of_birth', 
-                     'subscriber_id', 'first_service_date', 'last_service_date']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(csv_data)
+    with open(filename, 'wb') as f:
+        for block in stream_csv(selected_pages(cache, scope), 'bulk_upload'):
+            f.write(block)
+    
+    with open(filename, newline='') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        print(f"      ✓ {row['first_name']} {row['last_name']} | DOB: {row['date_of_birth']} | "
+              f"Subscriber: {row['subscriber_id']}")
+    
+    if not rows:
+        print("\n❌ No claims with patient details found")
+        return
     
     print(f"\n✅ Created: {filename}")
-    print(f"   📊 Total claims: {len(csv_data)}")
+    print(f"   📊 Total claims: {len(rows)}")
     print(f"   📅 Date range: July 1-3, 2025 (3 days)")
     print("\n" + "="*80)
     print("\n🎉 SUCCESS! Your bulk upload CSV is ready!")
@@ -133,4 +89,4 @@ def main():
     print("="*80)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
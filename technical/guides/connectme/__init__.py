@@ -0,0 +1,27 @@
+"""
+ConnectMe claims tooling shared by the guide and testing scripts
+"""
+from .client import (
+    API_BASE_URL,
+    AuthenticationError,
+    ClaimsAPIError,
+    ClaimsClient,
+    HttpxTransport,
+    KeycloakPasswordAuth,
+    MockLoginAuth,
+    StaticTokenAuth,
+)
+from .fake_backend import FakeBackend, generate_claims
+
+__all__ = [
+    "API_BASE_URL",
+    "AuthenticationError",
+    "ClaimsAPIError",
+    "ClaimsClient",
+    "FakeBackend",
+    "HttpxTransport",
+    "KeycloakPasswordAuth",
+    "MockLoginAuth",
+    "StaticTokenAuth",
+    "generate_claims",
+]
@@ -0,0 +1,358 @@
+"""
+Benchmarks for /claims/search/ and the bulk-upload pipeline
+
+8_BULK_UPLOAD_OPTIMIZATION.md promises 3 / 10 / 100 / 1000 claims in
+~10 / 12 / 15 / 30 seconds; nothing measured it. run_suite() starts a
+FakeUHCServer (uhc_server.py) in a child process, so its CPU and memory do
+not count against the client, and for each size runs:
+
+- search: ClaimsClient pages through /claims/search/ over HTTP
+- bulk:   a CSV of `size` patient rows streamed through
+          ingest.stream_csv_job; every chunk is planned with
+          coalesce.plan_fetches and its UHC Summary pages are fetched over
+          HTTP through a resilience.Endpoint (so injected errors are retried)
+
+Each run records wall time, throughput, p50 / p95 / p99 per-request
+latency and peak memory growth (sampled RSS on Linux, tracemalloc
+elsewhere). Bulk runs at a documented size are checked against the table.
+Results are saved as JSON; compare() lists everything that got slower or
+bigger than a saved baseline, so a regression fails the run before deploy.
+
+Usage:
+    results = run_suite([10, 1000, 100_000], latency=(0.05, 0.2), error_rate=0.01)
+    print(format_table(results))
+    save_results(results, 'bench.json')
+    regressions = compare(results, load_results('baseline.json'))
+"""
+import asyncio
+import csv
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+from .client import ClaimsAPIError, ClaimsClient, HttpxTransport
+from .coalesce import PageStats, plan_fetches, run_plan
+from .dates import iso
+from .ingest import stream_csv_job
+from .pagination import PAGE_SIZE, iter_summary_pages
+from .resilience import Endpoint
+from .uhc_server import SUMMARY_PATH, FakeUHCServer, SyntheticClaims
+
+# Claims -> seconds, from the performance table in 8_BULK_UPLOAD_OPTIMIZATION.md
+TARGETS = {3: 10.0, 10: 12.0, 100: 15.0, 1000: 30.0}
+SIZES = (10, 100, 1000, 10_000, 100_000)
+SCENARIOS = ('search', 'bulk')
+START, END = '2025-07-01', '2025-07-30'
+TIN, PAYER_ID = '854203105', '87726'
+REGRESSION_TOLERANCE = 0.2
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.05
+MIN_MB_DELTA = 2.0
+# Summary windows kept per bulk job; a date-ordered CSV fetches each day once
+WINDOW_MEMO = 4
+SAMPLE_SECONDS = 0.02
+CSV_FIELDS = ['claim_number', 'first_name', 'last_name', 'date_of_birth',
+              'first_service_date', 'last_service_date']
+
+
+@dataclass
+class BenchResult:
+    scenario: str
+    claims: int
+    seconds: float
+    throughput: float               # claims per second
+    p50: float                      # per-request latency, seconds
+    p95: float
+    p99: float
+    peak_mb: float
+    requests: int
+    errors: int
+    matched: int = None             # bulk: rows matched to a claim
+    target_seconds: float = None
+
+    @property
+    def met_target(self):
+        return None if self.target_seconds is None else self.seconds <= self.target_seconds
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of `samples` (0.0 when empty)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class MemoryPeak:
+    """Peak memory growth (MB) while the block runs"""
+
+    def __init__(self, interval=SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._use_rss = os.path.exists('/proc/self/statm')
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _rss():
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    def _sample(self, baseline):
+        peak = baseline
+        while not self._stop.wait(self.interval):
+            peak = max(peak, self._rss())
+        self.peak_mb = (max(peak, self._rss()) - baseline) / 1e6
+
+    def __enter__(self):
+        if self._use_rss:
+            self._thread = threading.Thread(target=self._sample, args=(self._rss(),), daemon=True)
+            self._thread.start()
+        else:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._use_rss:
+            self._stop.set()
+            self._thread.join()
+        else:
+            self.peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+
+
+# --- fake server in a child process -----------------------------------
+
+def _serve(count, start, end, seed, options, ready):
+    server = FakeUHCServer(SyntheticClaims(count, start, end, seed=seed), seed=seed, **options)
+    ready.put(server.url)
+    server.serve_forever()
+
+
+class ServerProcess:
+    """FakeUHCServer over SyntheticClaims(count, start, end), run in a child process"""
+
+    def __init__(self, count, start=START, end=END, *, seed=0, **options):
+        self._ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(count, start, end, seed, options, self._ready), daemon=True)
+        self.url = None
+
+    def __enter__(self):
+        self._process.start()
+        self.url = self._ready.get(timeout=300)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._process.terminate()
+        self._process.join()
+
+    def stats(self):
+        """Request counts per path (and injected errors) so far"""
+        import httpx
+        return httpx.get(self.url + '/__stats__').json()
+
+
+# --- scenarios ---------------------------------------------------------
+
+class _TimedTransport:
+    """Records the duration of every request made through `inner`"""
+
+    def __init__(self, inner, samples):
+        self.inner = inner
+        self.samples = samples
+
+    async def request(self, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.inner.request(method, url, **kwargs)
+        finally:
+            self.samples.append(time.perf_counter() - started)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def bench_search(url, size, start=START, end=END, *, page_size=PAGE_SIZE):
+    """Page through /claims/search/ for [start, end] once"""
+    samples = []
+    errors = 0
+
+    async def run():
+        nonlocal errors
+        found = 0
+        transport = _TimedTransport(HttpxTransport(), samples)
+        async with ClaimsClient(base_url=url, transport=transport) as client:
+            try:
+                async for page in client.iter_search_pages(start, end, page_size=page_size):
+                    found += len(page)
+            except ClaimsAPIError:
+                errors += 1
+        return found
+
+    with MemoryPeak() as memory:
+        started = time.perf_counter()
+        found = asyncio.run(run())
+        seconds = time.perf_counter() - started
+    return BenchResult(
+        'search', size, round(seconds, 3), round(found / seconds, 1),
+        *(round(percentile(samples, q), 4) for q in (50, 95, 99)),
+        round(memory.peak_mb, 1), len(samples), errors, matched=found,
+    )
+
+
+def write_bulk_csv(path, claims):
+    """Patient-info upload CSV with one row per claim, in service-date order"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        for i in range(len(claims)):
+            first, last, dob = claims.patient(i)
+            service_date = claims.claim(i)['serviceDate']
+            writer.writerow([f"FK{i:08d}", first, last, dob, service_date, service_date])
+
+
+def summary_fetcher(url, samples, *, endpoint=None, memo=WINDOW_MEMO):
+    """
+    coalesce fetch() against a Summary API at `url`: follows transactionId
+    pages, retries through `endpoint`, and keeps the last `memo` results.
+    """
+    import httpx
+    http = httpx.Client(timeout=60)
+    endpoint = endpoint or Endpoint('bench-summary', hedge=False)
+    cached = OrderedDict()
+    lock = threading.Lock()
+
+    def fetch(tin, payer_id, start, end, patient=None):
+        memo_key = (tin, payer_id, start, end, tuple(sorted((patient or {}).items())))
+        with lock:
+            if memo_key in cached:
+                cached.move_to_end(memo_key)
+                return cached[memo_key]
+        headers = {'tin': tin, 'payerId': payer_id, 'firstServiceDt': iso(start),
+                   'lastServiceDt': iso(end), **(patient or {})}
+
+        def fetch_page(transaction_id):
+            page_headers = dict(headers, transactionId=transaction_id) if transaction_id else headers
+            started = time.perf_counter()
+            response = endpoint.call(http.get, url + SUMMARY_PATH, headers=page_headers)
+            samples.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise ClaimsAPIError(response.status_code, response.text[:200])
+            data = response.json()
+            return data.get('claims', []), data.get('transactionId')
+
+        pages = list(iter_summary_pages(fetch_page, max_claims=math.inf))
+        result = [claim for page in pages for claim in page], len(pages)
+        with lock:
+            cached[memo_key] = result
+            while len(cached) > memo:
+                cached.popitem(last=False)
+        return result
+
+    fetch.close = http.close
+    return fetch
+
+
+def bench_bulk(url, claims, start=START, end=END, *, chunk_rows=500):
+    """Run a `len(claims)`-row patient upload through the streaming pipeline"""
+    size = len(claims)
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, results_path = os.path.join(tmp, 'upload.csv'), os.path.join(tmp, 'results.csv')
+        write_bulk_csv(csv_path, claims)
+        endpoint = Endpoint('bench-summary', hedge=False)
+        fetch = summary_fetcher(url, samples, endpoint=endpoint)
+        stats = PageStats()
+
+        def process_chunk(rows):
+            plan = plan_fetches(rows, start, end, stats=stats, default_tin=TIN,
+                                default_payer_id=PAYER_ID, numbered=True)
+            return run_plan(plan, fetch, stats=stats)
+
+        with MemoryPeak() as memory:
+            started = time.perf_counter()
+            with open(csv_path, 'rb') as upload, open(results_path, 'w', newline='') as out:
+                job = stream_csv_job(upload, process_chunk, out, chunk_rows=chunk_rows)
+            seconds = time.perf_counter() - started
+        fetch.close()
+    return BenchResult(
+        'bulk', size, round(seconds, 3), round(size / seconds, 1),
+        *(round(percentile(samples, q), 4) for q in (50, 95, 99)),
+        round(memory.peak_mb, 1), len(samples), job.failure_count,
+        matched=job.success_count, target_seconds=TARGETS.get(size),
+    )
+
+
+def run_suite(sizes=SIZES, scenarios=SCENARIOS, *, latency=0.0, page_size=PAGE_SIZE,
+              error_rate=0.0, start=START, end=END, seed=0, on_result=None):
+    """
+    Benchmark every scenario at every size against a fresh fake server.
+    Server options (latency, page_size, error_rate) are FakeUHCServer's.
+    """
+    results = []
+    for size in sizes:
+        with ServerProcess(size, start, end, seed=seed, latency=latency,
+                           page_size=page_size, error_rate=error_rate) as server:
+            for scenario in scenarios:
+                if scenario == 'search':
+                    result = bench_search(server.url, size, start, end, page_size=page_size)
+                else:
+                    result = bench_bulk(server.url, SyntheticClaims(size, start, end, seed=seed),
+                                        start, end)
+                results.append(result)
+                if on_result:
+                    on_result(result)
+    return results
+
+
+# --- reporting -----------------------------------------------------------
+
+def save_results(results, path, **meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': [asdict(r) for r in results]}, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return [BenchResult(**r) for r in json.load(f)['results']]
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Human-readable regressions of `results` against `baseline` (empty = none)"""
+    previous = {(r.scenario, r.claims): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get((result.scenario, result.claims))
+        if base is None:
+            continue
+        checks = [('seconds', MIN_SECONDS_DELTA), ('p95', MIN_SECONDS_DELTA), ('peak_mb', MIN_MB_DELTA)]
+        for name, min_delta in checks:
+            now, before = getattr(result, name), getattr(base, name)
+            if now - before > max(min_delta, before * tolerance):
+                regressions.append(
+                    f"{result.scenario} x{result.claims}: {name} {before} -> {now} "
+                    f"(+{(now - before) / before:.0%})" if before else
+                    f"{result.scenario} x{result.claims}: {name} 0 -> {now}"
+                )
+    return regressions
+
+
+def format_table(results):
+    lines = [f"{'scenario':<8} {'claims':>7} {'seconds':>8} {'claims/s':>9} {'p50':>7} "
+             f"{'p95':>7} {'p99':>7} {'peak MB':>8} {'reqs':>6} {'errors':>6}  target"]
+    for r in results:
+        target = ''
+        if r.target_seconds is not None:
+            target = f"{'OK' if r.met_target else 'MISSED'} (<= {r.target_seconds:g}s)"
+        lines.append(
+            f"{r.scenario:<8} {r.claims:>7} {r.seconds:>8.2f} {r.throughput:>9.1f} {r.p50:>7.3f} "
+            f"{r.p95:>7.3f} {r.p99:>7.3f} {r.peak_mb:>8.1f} {r.requests:>6} {r.errors:>6}  {target}"
+        )
+    return '\n'.join(lines)
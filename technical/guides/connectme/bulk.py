@@ -0,0 +1,155 @@
+"""
+Bulk CSV processing with parallel (TIN, Payer ID) groups
+
+process_csv_file groups rows by (TIN, Payer ID) and used to run each
+group's batch query one after another (MULTI_PRACTICE_TIN_PAYER_SUPPORT.md).
+process_groups() fans the groups out over a thread pool instead, with a
+per-TIN cap so one practice's credentials never carry more than
+`per_tin_limit` concurrent UHC sessions. Results are merged back into CSV
+row order, so a multi-practice file finishes in about the time of its
+slowest group.
+
+Usage (inside the Celery task):
+    groups = group_csv_by_practice_payer(rows, default_tin=org.tin, default_payer_id='87726')
+    result = process_groups(groups, run_group_batch_query, max_workers=8, per_tin_limit=2)
+    job.success_count, job.failure_count = result.success_count, result.failure_count
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .tracing import bind, span
+
+# Columns of the results CSV (CSV_BULK_UPLOAD_GUIDE.md, "Results CSV Format")
+RESULT_FIELDS = [
+    'row', 'claim_number', 'status', 'patient_name', 'total_charged',
+    'total_paid', 'processed_date', 'success', 'error',
+]
+
+
+def group_csv_by_practice_payer(rows, default_tin=None, default_payer_id=None):
+    """
+    Group CSV rows by (TIN, Payer ID), keeping CSV order inside each group.
+
+    Returns {(tin, payer_id): [(row_number, row), ...]} with 1-based row
+    numbers. Rows without tin/payer_id columns (single-practice CSVs) fall
+    back to the defaults - the user's organization TIN.
+    """
+    return group_numbered_rows(enumerate(rows, start=1), default_tin, default_payer_id)
+
+
+def group_numbered_rows(numbered_rows, default_tin=None, default_payer_id=None):
+    """group_csv_by_practice_payer() for (row_number, row) pairs, e.g. one streamed chunk"""
+    groups = {}
+    for row_number, row in numbered_rows:
+        tin = (row.get('tin') or '').strip() or default_tin
+        payer_id = (row.get('payer_id') or '').strip() or default_payer_id
+        groups.setdefault((tin, payer_id), []).append((row_number, row))
+    return groups
+
+
+def failed_row(row_number, row, error):
+    """Result row for a CSV row that could not be processed"""
+    return {
+        'row': row_number,
+        'claim_number': row.get('claim_number', ''),
+        'status': 'Error',
+        'patient_name': f"{row.get('first_name', '')} {row.get('last_name', '')}".strip(),
+        'success': False,
+        'error': str(error),
+    }
+
+
+@dataclass
+class GroupOutcome:
+    """How one (TIN, Payer ID) group went"""
+    tin: str
+    payer_id: str
+    rows: int
+    seconds: float
+    error: str = None
+
+
+@dataclass
+class BulkResult:
+    """Per-row results in CSV order plus per-group outcomes"""
+    rows: list = field(default_factory=list)
+    groups: list = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    @property
+    def success_count(self):
+        return sum(1 for r in self.rows if r.get('success'))
+
+    @property
+    def failure_count(self):
+        return len(self.rows) - self.success_count
+
+
+class _TinLimiter:
+    """One bounded semaphore per TIN, created on first use"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def __call__(self, tin):
+        with self._lock:
+            if tin not in self._semaphores:
+                self._semaphores[tin] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[tin]
+
+
+def _interleave_by_tin(keys):
+    """Round-robin group keys across TINs so pool threads are not all parked on one TIN's cap"""
+    by_tin = {}
+    for key in keys:
+        by_tin.setdefault(key[0], []).append(key)
+    queues = list(by_tin.values())
+    ordered = []
+    while queues:
+        ordered.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def process_groups(groups, process_group, *, max_workers=8, per_tin_limit=2):
+    """
+    Run process_group(tin, payer_id, rows) for every group concurrently.
+
+    - rows is the group's [(row_number, row), ...] list
+    - process_group returns one result dict per row (RESULT_FIELDS keys)
+    - max_workers: groups in flight overall
+    - per_tin_limit: groups in flight for any one TIN
+
+    A group that raises does not stop the others: each of its rows is
+    reported as failed with the group's error.
+    """
+    limiter = _TinLimiter(per_tin_limit)
+
+    def run(key, rows):
+        tin, payer_id = key
+        with limiter(tin):
+            started = time.monotonic()
+            try:
+                with span('bulk.group', tin=tin, payer_id=payer_id, rows=len(rows)):
+                    results = process_group(tin, payer_id, rows)
+                error = None
+            except Exception as e:
+                results = [failed_row(n, row, e) for n, row in rows]
+                error = str(e)
+            return results, GroupOutcome(tin, payer_id, len(rows), time.monotonic() - started, error)
+
+    result = BulkResult()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(bind(run), key, groups[key]) for key in _interleave_by_tin(groups)]
+        for future in futures:
+            rows, outcome = future.result()
+            result.rows.extend(rows)
+            result.groups.append(outcome)
+    result.rows.sort(key=lambda r: r['row'])
+    result.wall_seconds = time.monotonic() - started
+    return result
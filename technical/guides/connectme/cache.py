@@ -0,0 +1,260 @@
+"""
+Day-granular result cache for /claims/search/
+
+Search results are stored per (scope, service day) in a local SQLite file,
+where scope is the canonical set of search filters (TIN, payerId,
+practiceId, statusFilter, ...). A wide range is answered from cached day
+buckets, and only the days that are missing or older than the TTL go back
+to UHC - so month-over-month searches with overlapping 90-day windows pay
+for each day once.
+
+The TTL defaults to 24 hours, matching the re-query window RequeryPolicy
+enforces (RBAC_DESIGN_HEALTHCARE_WORKFLOW.md).
+
+A window that comes back at the 500-claim cap is bisected and re-fetched
+(as planner.fetch_range does); a single day still at the cap is stored but
+not marked fresh, so it is fetched again next time instead of being served
+as if complete.
+
+Payloads are stored packed (compact.py): about a quarter of the claim JSON,
+with code descriptions and object keys in the claim_lookup table. Payloads
+written by earlier versions are plain JSON and load unchanged.
+
+Usage:
+    cache = WindowCache()
+    search = CachedSearch(client, cache)
+    claims = await search.search('2025-01-01', '2025-06-30', practice_id=1)
+
+WindowCache itself is synchronous, so backend code (batch_query_claims in a
+Celery task) can use missing_days()/store()/load() directly around its own
+UHC calls.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from .dates import (
+    MAX_WINDOW_DAYS,
+    claim_key,
+    claim_service_date,
+    contiguous_runs,
+    days_between,
+    iso,
+    parse_date,
+)
+from . import compact
+from .metrics import CACHE_LOOKUPS
+from .planner import PAGE_CAP, split_range
+
+DEFAULT_CACHE_PATH = Path(
+    os.environ.get('CONNECTME_CACHE_PATH', Path.home() / '.cache' / 'connectme' / 'claims_windows.sqlite3')
+)
+DEFAULT_TTL = timedelta(hours=24)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS day_buckets (
+    scope       TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    fetched_at  REAL NOT NULL,
+    PRIMARY KEY (scope, day)
+);
+CREATE TABLE IF NOT EXISTS bucket_claims (
+    scope         TEXT NOT NULL,
+    day           TEXT NOT NULL,
+    claim_number  TEXT NOT NULL,
+    payload       TEXT NOT NULL,
+    PRIMARY KEY (scope, day, claim_number)
+);
+"""
+
+
+def make_scope(client=None, **filters):
+    """
+    Canonical cache scope for a set of search filters (None values dropped).
+    With a client, its base_url and login are part of the scope, so results
+    from another environment or user are never served from the same buckets.
+    """
+    if client is not None:
+        filters = dict(filters, base_url=client.base_url, login=client.identity)
+    return json.dumps(
+        {k: str(v) for k, v in filters.items() if v is not None},
+        sort_keys=True,
+    )
+
+
+class WindowCache:
+    """SQLite-backed store of search results bucketed by service day"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl.total_seconds() if isinstance(ttl, timedelta) else float(ttl)
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript(SCHEMA)
+        self.lookup = compact.SQLiteLookup(self._db)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self._db.close()
+
+    def missing_days(self, scope, start, end, now=None):
+        """Days in [start, end] with no bucket, or a bucket older than the TTL"""
+        now = time.time() if now is None else now
+        rows = self._db.execute(
+            "SELECT day FROM day_buckets WHERE scope = ? AND day BETWEEN ? AND ? AND fetched_at >= ?",
+            (scope, iso(start), iso(end), now - self.ttl),
+        )
+        fresh = {row[0] for row in rows}
+        days = days_between(start, end)
+        missing = [day for day in days if iso(day) not in fresh]
+        self.hits += len(days) - len(missing)
+        self.misses += len(missing)
+        CACHE_LOOKUPS.inc(len(days) - len(missing), result='hit')
+        CACHE_LOOKUPS.inc(len(missing), result='miss')
+        return missing
+
+    def store(self, scope, start, end, claims, now=None, complete=True):
+        """
+        Record a fetched window: every day in [start, end] becomes a fresh
+        bucket (empty days included), replacing whatever was cached for them.
+        Claims dated outside the window are ignored. complete=False (a
+        window truncated at the result cap) stores the claims but leaves
+        the days missing, so missing_days() keeps asking for them.
+        """
+        now = time.time() if now is None else now
+        start, end = parse_date(start), parse_date(end)
+        # Packed before the transaction: new lookup texts are committed first,
+        # so a reader never sees a payload it cannot decode
+        rows = []
+        for claim in claims:
+            day = claim_service_date(claim)
+            if day is None or not start <= day <= end:
+                continue
+            rows.append((scope, iso(day), claim_key(claim), compact.dumps(claim, self.lookup)))
+        with self._db:
+            self._db.execute(
+                "DELETE FROM bucket_claims WHERE scope = ? AND day BETWEEN ? AND ?",
+                (scope, iso(start), iso(end)),
+            )
+            if complete:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO day_buckets (scope, day, fetched_at) VALUES (?, ?, ?)",
+                    [(scope, iso(day), now) for day in days_between(start, end)],
+                )
+            else:
+                self._db.execute(
+                    "DELETE FROM day_buckets WHERE scope = ? AND day BETWEEN ? AND ?",
+                    (scope, iso(start), iso(end)),
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO bucket_claims (scope, day, claim_number, payload) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def load(self, scope, start, end, fields=None):
+        """
+        Cached claims for [start, end], ordered by service day. fields: only
+        these top-level keys (list views), which skips decoding the rest.
+        """
+        rows = self._db.execute(
+            "SELECT payload FROM bucket_claims WHERE scope = ? AND day BETWEEN ? AND ? ORDER BY day, claim_number",
+            (scope, iso(start), iso(end)),
+        )
+        return [self.decode(row[0], fields) for row in rows]
+
+    def page_after(self, scope, start, end, after, limit, fields=None):
+        """
+        One keyset page of [start, end]: up to `limit` ((day, claim_number),
+        claim) pairs ordered by the primary key, after the key `after`
+        (None for the first page). Memory stays at one page for any range.
+        """
+        if after is None:
+            where, params = "day >= ?", (iso(start),)
+        else:
+            where, params = "(day > ? OR (day = ? AND claim_number > ?))", (after[0], after[0], after[1])
+        rows = self._db.execute(
+            f"SELECT day, claim_number, payload FROM bucket_claims WHERE scope = ? AND day <= ? AND {where} "
+            "ORDER BY day, claim_number LIMIT ?",
+            (scope, iso(end)) + params + (limit,),
+        ).fetchall()
+        return [((day, number), self.decode(payload, fields)) for day, number, payload in rows]
+
+    def decode(self, payload, fields=None):
+        """A bucket_claims payload as the claim dict (packed or legacy JSON)"""
+        return compact.loads(payload, self.lookup, fields)
+
+    def purge_expired(self, now=None):
+        """Drop buckets (and their claims) older than the TTL"""
+        now = time.time() if now is None else now
+        cutoff = now - self.ttl
+        with self._db:
+            self._db.execute(
+                "DELETE FROM bucket_claims WHERE (scope, day) IN "
+                "(SELECT scope, day FROM day_buckets WHERE fetched_at < ?)",
+                (cutoff,),
+            )
+            self._db.execute("DELETE FROM day_buckets WHERE fetched_at < ?", (cutoff,))
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def fetch_windows(missing_days, max_days=MAX_WINDOW_DAYS):
+    """Group missing days into contiguous API-legal windows"""
+    windows = []
+    for run_start, run_end in contiguous_runs(missing_days):
+        windows.extend(split_range(run_start, run_end, max_days))
+    return windows
+
+
+class CachedSearch:
+    """ClaimsClient.search() that only sends the uncached days to UHC"""
+
+    def __init__(self, client, cache=None, *, page_cap=PAGE_CAP):
+        self.client = client
+        self.cache = cache if cache is not None else WindowCache()
+        self.page_cap = page_cap
+
+    async def search(self, first_service_date, last_service_date, *, timeout=None, **filters):
+        scope, _ = await self.refresh(first_service_date, last_service_date, timeout=timeout, **filters)
+        return self.cache.load(scope, first_service_date, last_service_date)
+
+    async def refresh(self, first_service_date, last_service_date, *, timeout=None, **filters):
+        """
+        Fetch and store the uncached days without loading the range; returns
+        (scope, truncated), truncated being the single days this call found
+        still at page_cap
+        """
+        scope = make_scope(self.client, **filters)
+        missing = self.cache.missing_days(scope, first_service_date, last_service_date)
+        truncated = []
+        errors = []
+
+        async def fetch(start, end):
+            try:
+                claims = await self.client.search(iso(start), iso(end), timeout=timeout, **filters)
+            except Exception as e:
+                # Keep whatever did come back before surfacing a failed window
+                errors.append(e)
+                return
+            if len(claims) >= self.page_cap and start < end:
+                middle = start + (end - start) // 2
+                await asyncio.gather(fetch(start, middle), fetch(middle + timedelta(days=1), end))
+                return
+            complete = len(claims) < self.page_cap
+            if not complete:
+                truncated.append(start)
+            self.cache.store(scope, start, end, claims, complete=complete)
+
+        await asyncio.gather(*(fetch(start, end) for start, end in fetch_windows(missing)))
+        if errors:
+            raise errors[0]
+        return scope, sorted(truncated)
@@ -0,0 +1,332 @@
+"""
+Async client for the ConnectMe claims API
+
+Replaces the get_auth_token() / requests.post boilerplate that every script
+used to carry. One ClaimsClient holds a pooled keep-alive connection set and
+a cached bearer token, so hundreds of searches can be in flight at once.
+
+Usage:
+    async with ClaimsClient() as client:
+        claims = await client.search('2025-07-01', '2025-07-03')
+"""
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+
+from .stores import default_store
+
+API_BASE_URL = "https://connectme.be.totesoft.com"
+KEYCLOAK_URL = "https://auth.totesoft.com/realms/connectme-preprod/protocol/openid-connect/token"
+
+SEARCH_PATH = "/api/v1/claims/search/"
+CLAIM_DETAIL_PATH = "/api/v1/claims/{claim_number}/"
+MOCK_LOGIN_PATH = "/api/v1/auth/mock/login/"
+PRACTICES_PATH = "/api/v1/providers/practices/"
+BULK_UPLOAD_PATH = "/api/v1/claims/bulk/upload/"
+CSV_JOB_PATH = "/api/v1/claims/csv-jobs/{job_id}/"
+
+PAGE_SIZE = 50
+
+
+class ClaimsAPIError(Exception):
+    """Raised when the claims API returns a non-2xx response"""
+
+    def __init__(self, status_code, message=""):
+        super().__init__(f"{status_code}: {message}" if message else str(status_code))
+        self.status_code = status_code
+        self.message = message
+
+
+class AuthenticationError(ClaimsAPIError):
+    """Raised when no access token could be obtained"""
+
+
+@dataclass
+class Response:
+    """Transport-neutral HTTP response"""
+    status_code: int
+    payload: object = None
+    text: str = ""
+
+    def json(self):
+        return self.payload
+
+
+@dataclass
+class Token:
+    """Bearer token with its absolute expiry (time.monotonic() based)"""
+    access_token: str
+    expires_at: float = float("inf")
+
+    def is_fresh(self, leeway=30.0):
+        return time.monotonic() + leeway < self.expires_at
+
+    @classmethod
+    def from_response(cls, data):
+        expires_in = data.get('expires_in')
+        expires_at = time.monotonic() + float(expires_in) if expires_in else float("inf")
+        return cls(data['access_token'], expires_at)
+
+
+@dataclass
+class StaticTokenAuth:
+    """An access token obtained elsewhere (e.g. a script's own Keycloak login)"""
+    access_token: str
+
+    @property
+    def identity(self):
+        # Who the token belongs to is unknown here; a digest keeps the token out of cache keys
+        return 'token:' + hashlib.sha1(self.access_token.encode()).hexdigest()[:12]
+
+    async def fetch_token(self, client):
+        return Token(self.access_token)
+
+
+class MockLoginAuth:
+    """Token from the backend's /auth/mock/login/ endpoint (dev/pre-prod)"""
+
+    identity = 'mock'
+
+    async def fetch_token(self, client):
+        response = await client.transport.request(
+            "POST", client.url(MOCK_LOGIN_PATH), json={}, timeout=client.auth_timeout
+        )
+        if response.status_code != 200:
+            raise AuthenticationError(response.status_code, response.text[:200])
+        return Token.from_response(response.json())
+
+
+@dataclass
+class KeycloakPasswordAuth:
+    """Token from a Keycloak password grant (same call the test_*.py scripts make)"""
+    username: str
+    password: str
+    client_id: str = "connectme-preprod-frontend"
+    token_url: str = KEYCLOAK_URL
+    scope: str = "openid profile email"
+
+    @property
+    def identity(self):
+        return self.username
+
+    async def fetch_token(self, client):
+        response = await client.transport.request(
+            "POST",
+            self.token_url,
+            data={
+                'client_id': self.client_id,
+                'username': self.username,
+                'password': self.password,
+                'grant_type': 'password',
+                'scope': self.scope,
+            },
+            timeout=client.auth_timeout,
+        )
+        if response.status_code != 200:
+            raise AuthenticationError(response.status_code, response.text[:200])
+        return Token.from_response(response.json())
+
+
+class HttpxTransport:
+    """Pooled keep-alive transport backed by httpx.AsyncClient"""
+
+    def __init__(self, max_connections=20, verify=True):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError(
+                "HttpxTransport requires httpx: pip install httpx"
+            ) from e
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            verify=verify,
+        )
+
+    async def request(self, method, url, *, headers=None, json=None, data=None, timeout=None):
+        response = await self._client.request(
+            method, url, headers=headers, json=json, data=data, timeout=timeout
+        )
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return Response(response.status_code, payload, response.text)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+@dataclass
+class ClaimsClient:
+    """
+    Shared async client for /api/v1/claims/search/ and /api/v1/claims/{n}/
+
+    - transport: HttpxTransport by default; pass a FakeBackend for offline runs
+    - auth: MockLoginAuth by default, or KeycloakPasswordAuth(username, password)
+    - max_concurrency: requests allowed in flight at once across all callers
+    - token_store: Redis / LocalStore for a tokens.TokenBroker, so every
+      client and process logged in as the same user shares one token;
+      defaults to Redis when REDIS_URL is set
+    """
+    base_url: str = API_BASE_URL
+    auth: object = None
+    transport: object = None
+    max_concurrency: int = 20
+    timeout: float = 60.0
+    auth_timeout: float = 10.0
+    verify: bool = True
+    token_store: object = None
+    _token: Token = field(default=None, init=False, repr=False)
+    _token_lock: asyncio.Lock = field(default=None, init=False, repr=False)
+    _semaphore: asyncio.Semaphore = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.base_url = self.base_url.rstrip('/')
+        if self.auth is None:
+            self.auth = MockLoginAuth()
+        if self.token_store is None and os.environ.get('REDIS_URL'):
+            self.token_store = default_store()
+        if self.token_store is not None and not isinstance(self.auth, StaticTokenAuth):
+            from .tokens import BrokeredAuth, TokenBroker
+            if not isinstance(self.auth, BrokeredAuth):
+                self.auth = BrokeredAuth(TokenBroker(self.token_store),
+                                         f'claims:{self.base_url}:{self.identity}', self.auth)
+        if self.transport is None:
+            self.transport = HttpxTransport(self.max_concurrency, verify=self.verify)
+        self._token_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        close = getattr(self.transport, 'aclose', None)
+        if close is not None:
+            await close()
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    @property
+    def identity(self):
+        """The login searches run as, so results for different users are kept apart"""
+        return getattr(self.auth, 'identity', None) or type(self.auth).__name__
+
+    def _token_usable(self, rejected):
+        token = self._token
+        return token is not None and token.is_fresh() and token.access_token != rejected
+
+    async def token(self, rejected=None):
+        """
+        Return the cached access token, fetching a new one only when it is
+        missing, about to expire, or is the `rejected` token a 401 came back for.
+        """
+        if not self._token_usable(rejected):
+            async with self._token_lock:
+                # Another task may have refreshed while we waited for the lock
+                if not self._token_usable(rejected):
+                    self._token = await self.auth.fetch_token(self)
+        return self._token.access_token
+
+    async def request(self, method, path, *, json=None, timeout=None):
+        """Authenticated request; refreshes the token once on 401"""
+        token = None
+        async with self._semaphore:
+            for _ in range(2):
+                token = await self.token(rejected=token)
+                response = await self.transport.request(
+                    method,
+                    self.url(path),
+                    headers={
+                        'Authorization': f'Bearer {token}',
+                        'Content-Type': 'application/json',
+                    },
+                    json=json,
+                    timeout=timeout or self.timeout,
+                )
+                if response.status_code != 401:
+                    break
+        if response.status_code != 200:
+            raise ClaimsAPIError(response.status_code, response.text[:200])
+        return response.json()
+
+    @staticmethod
+    def _search_payload(first_service_date, last_service_date, practice_id, status_filter, filters):
+        payload = {
+            'firstServiceDate': first_service_date,
+            'lastServiceDate': last_service_date,
+        }
+        if practice_id is not None:
+            payload['practiceId'] = str(practice_id)
+        if status_filter:
+            payload['statusFilter'] = status_filter
+        payload.update(filters)
+        return payload
+
+    async def search(self, first_service_date, last_service_date, *,
+                     practice_id=None, status_filter=None, timeout=None, **filters):
+        """POST /claims/search/ for one window and return its claims list"""
+        payload = self._search_payload(
+            first_service_date, last_service_date, practice_id, status_filter, filters
+        )
+        data = await self.request("POST", SEARCH_PATH, json=payload, timeout=timeout)
+        return data.get('claims', [])
+
+    async def iter_search_pages(self, first_service_date, last_service_date, *,
+                                page_size=PAGE_SIZE, practice_id=None, status_filter=None,
+                                timeout=None, **filters):
+        """
+        Yield one claims list per result page. Asks the backend for
+        `page_size` claims at a time and follows nextTransactionId until it
+        stops coming back; a backend without paging answers in one page.
+        Breaking out of the loop stops further page requests.
+        """
+        payload = self._search_payload(
+            first_service_date, last_service_date, practice_id, status_filter, filters
+        )
+        payload['pageSize'] = page_size
+        while True:
+            data = await self.request("POST", SEARCH_PATH, json=payload, timeout=timeout)
+            yield data.get('claims', [])
+            next_transaction_id = data.get('nextTransactionId')
+            if not next_transaction_id:
+                return
+            payload = {**payload, 'transactionId': next_transaction_id}
+
+    async def iter_search(self, first_service_date, last_service_date, **kwargs):
+        """Yield claims one at a time as their pages arrive"""
+        async for page in self.iter_search_pages(first_service_date, last_service_date, **kwargs):
+            for claim in page:
+                yield claim
+
+    async def search_many(self, windows, **filters):
+        """
+        Run one search per (first_service_date, last_service_date) window
+        concurrently. Results come back in window order; a failed window
+        yields its exception instead of a claims list.
+        """
+        return await asyncio.gather(
+            *(self.search(start, end, **filters) for start, end in windows),
+            return_exceptions=True,
+        )
+
+    async def get_claim(self, claim_number, timeout=None):
+        """GET /claims/{claim_number}/"""
+        return await self.request(
+            "GET", CLAIM_DETAIL_PATH.format(claim_number=claim_number), timeout=timeout
+        )
+
+    async def get_claims(self, claim_numbers):
+        """Fetch several claim details concurrently, keyed by claim number"""
+        results = await asyncio.gather(
+            *(self.get_claim(n) for n in claim_numbers), return_exceptions=True
+        )
+        return dict(zip(claim_numbers, results))
@@ -0,0 +1,263 @@
+"""
+Coalescing scheduler for patient-info bulk uploads
+
+The UHC Summary API accepts optional ptntFn / ptntLn / ptntDob headers,
+and patient-based uploads used to send one filtered call per CSV row.
+plan_fetches() groups rows by (TIN, Payer ID) and overlapping service
+dates, then picks, per group, whichever is cheaper:
+
+- one unfiltered window fetch (pages follow transactionId one after
+  another), matched locally with matcher.ClaimIndex, or
+- one patient-filtered fetch per distinct patient, run in parallel
+
+Row date ranges come from planner.csv_service_ranges, and a window fetch
+covers planner.cluster_ranges of its rows: padded, clamped to the 24-month
+lookback and split into API-legal windows. Rows entirely outside the
+lookback are reported as failed instead of being sent to UHC.
+
+The estimate uses observed page counts: PageStats learns claims per day
+for each (TIN, Payer ID) from window fetches and pages per patient call
+from patient fetches, and every executed plan feeds it.
+
+plan_fetches / run_plan are library entry points for the backend's bulk
+Celery task (its process_chunk for ingest.stream_csv_job); in this tree
+bench.bench_bulk drives them the same way.
+
+Usage:
+    stats = PageStats()
+    plan = plan_fetches(rows, start, end, stats=stats, default_tin=org.tin, default_payer_id='87726')
+    results = run_plan(plan, fetch, stats=stats)    # results-CSV rows in CSV order
+
+fetch(tin, payer_id, start, end, patient=None) returns (claims, pages);
+patient is None for a window fetch, otherwise a dict of the
+ptntFn / ptntLn / ptntDob headers (see patient_headers()).
+"""
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .dates import iso, parse_date
+from .matcher import ClaimIndex, match_result, row_patient
+from .pagination import MAX_CLAIMS, PAGE_SIZE
+from .planner import cluster_ranges, csv_service_ranges
+from .tracing import bind, span
+
+DEFAULT_CLAIMS_PER_DAY = 5.0
+DEFAULT_PATIENT_PAGES = 1.0
+CALL_SECONDS = 1.5
+PATIENT_CONCURRENCY = 4
+# One second of wall clock weighs as much as this many UHC calls
+SECONDS_WEIGHT = 0.5
+EWMA_ALPHA = 0.3
+OUTSIDE_LOOKBACK = 'Service dates are outside the 24-month lookback UHC allows'
+
+
+def patient_headers(row):
+    """
+    ptntFn / ptntLn / ptntDob headers for a CSV row. Names are sent as
+    typed (UHC does its own matching); the DOB is reformatted to MM/DD/YYYY,
+    and left out when it cannot be read, so the fetch filters on name only.
+    """
+    headers = {'ptntFn': row.get('first_name', '').strip(), 'ptntLn': row.get('last_name', '').strip()}
+    if row.get('date_of_birth'):
+        try:
+            headers['ptntDob'] = parse_date(row['date_of_birth']).strftime('%m/%d/%Y')
+        except ValueError:
+            pass
+    return headers
+
+
+class PageStats:
+    """Observed UHC page counts, smoothed per (TIN, Payer ID)"""
+
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.claims_per_day = {}
+        self.patient_pages = {}
+
+    def _smooth(self, table, key, value):
+        with self._lock:
+            previous = table.get(key)
+            table[key] = value if previous is None else (1 - self.alpha) * previous + self.alpha * value
+
+    def observe_window(self, tin, payer_id, days, claims):
+        self._smooth(self.claims_per_day, (tin, payer_id), claims / max(days, 1))
+
+    def observe_patient(self, tin, payer_id, pages):
+        self._smooth(self.patient_pages, (tin, payer_id), max(pages, 1))
+
+    def density(self, tin, payer_id):
+        return self.claims_per_day.get((tin, payer_id), DEFAULT_CLAIMS_PER_DAY)
+
+    def pages_per_patient(self, tin, payer_id):
+        return self.patient_pages.get((tin, payer_id), DEFAULT_PATIENT_PAGES)
+
+
+@dataclass
+class Fetch:
+    """One planned UHC lookup and the CSV rows it serves"""
+    tin: str
+    payer_id: str
+    start: object
+    end: object
+    rows: list = field(default_factory=list)
+    patient: dict = None            # patient_headers() for a filtered fetch
+    windows: list = None            # API-legal (start, end) windows for a window fetch
+
+    @property
+    def days(self):
+        if self.windows:
+            return sum((end - start).days + 1 for start, end in self.windows)
+        return (self.end - self.start).days + 1
+
+
+@dataclass
+class Decision:
+    """Why a group was fetched the way it was (estimated calls and seconds)"""
+    tin: str
+    payer_id: str
+    start: object
+    end: object
+    patients: int
+    window_calls: float
+    window_seconds: float
+    patient_calls: float
+    patient_seconds: float
+    strategy: str
+
+
+@dataclass
+class FetchPlan:
+    fetches: list = field(default_factory=list)
+    decisions: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)     # (row_number, row) outside the queryable range
+
+    @property
+    def estimated_calls(self):
+        return sum(
+            d.window_calls if d.strategy == 'window' else d.patient_calls for d in self.decisions
+        )
+
+
+def _overlapping_groups(items):
+    """Merge (start, end, payload) items into groups whose intervals overlap"""
+    groups = []
+    for start, end, payload in sorted(items, key=lambda item: item[0]):
+        if groups and start <= groups[-1][1]:
+            groups[-1][1] = max(groups[-1][1], end)
+            groups[-1][2].append((start, end, payload))
+        else:
+            groups.append([start, end, [(start, end, payload)]])
+    return groups
+
+
+def estimate(tin, payer_id, start, end, patients, stats, *, call_seconds=CALL_SECONDS,
+             concurrency=PATIENT_CONCURRENCY):
+    """(window calls, window seconds, patient calls, patient seconds) for one group"""
+    days = (end - start).days + 1
+    expected = stats.density(tin, payer_id) * days
+    window_calls = max(1, math.ceil(expected / PAGE_SIZE))
+    # Pages of one window are sequential; above the 500-claim cap the
+    # planner bisects, and the halves' page chains run side by side
+    chains = max(1, math.ceil(expected / MAX_CLAIMS))
+    window_seconds = math.ceil(window_calls / chains) * call_seconds
+    per_patient = stats.pages_per_patient(tin, payer_id)
+    patient_calls = patients * per_patient
+    patient_seconds = math.ceil(patients / concurrency) * per_patient * call_seconds
+    return window_calls, window_seconds, patient_calls, patient_seconds
+
+
+def plan_fetches(rows, default_start, default_end, *, stats=None, default_tin=None,
+                 default_payer_id=None, numbered=False, today=None, **cost):
+    """
+    Coalesce rows into a FetchPlan.
+
+    rows are CSV dicts (or (row_number, row) pairs with numbered=True).
+    Rows without (readable) service dates use [default_start, default_end].
+    Extra keyword arguments (call_seconds, concurrency) go to estimate().
+    """
+    stats = stats if stats is not None else PageStats()
+    default_start, default_end = parse_date(default_start), parse_date(default_end)
+    numbered_rows = list(rows if numbered else enumerate(rows, start=1))
+    ranges = csv_service_ranges((row for _, row in numbered_rows), default_start, default_end)
+    by_payer = {}
+    for (row_number, row), (start, end) in zip(numbered_rows, ranges):
+        tin = (row.get('tin') or '').strip() or default_tin
+        payer_id = (row.get('payer_id') or '').strip() or default_payer_id
+        by_payer.setdefault((tin, payer_id), []).append((start, end, (row_number, row)))
+
+    plan = FetchPlan()
+    for (tin, payer_id), items in by_payer.items():
+        for start, end, members in _overlapping_groups(items):
+            windows = cluster_ranges([(start, end)], today=today).windows
+            if not windows:
+                plan.skipped.extend(member[2] for member in members)
+                continue
+            patients = {}
+            for row_start, row_end, (row_number, row) in members:
+                patient = row_patient(row)
+                entry = patients.setdefault(patient.exact, [patient, row_start, row_end, []])
+                entry[1], entry[2] = min(entry[1], row_start), max(entry[2], row_end)
+                entry[3].append((row_number, row))
+            window_calls, window_seconds, patient_calls, patient_seconds = estimate(
+                tin, payer_id, windows[0][0], windows[-1][1], len(patients), stats, **cost
+            )
+            window_cost = window_calls + SECONDS_WEIGHT * window_seconds
+            patient_cost = patient_calls + SECONDS_WEIGHT * patient_seconds
+            # A patient filter needs both names; rows missing one can only be found in a window
+            unfilterable = any(not (p.first and p.last) for p, *_ in patients.values())
+            strategy = 'window' if unfilterable or window_cost <= patient_cost else 'patient'
+            plan.decisions.append(Decision(
+                tin, payer_id, start, end, len(patients),
+                window_calls, window_seconds, patient_calls, patient_seconds, strategy,
+            ))
+            if strategy == 'window':
+                plan.fetches.append(Fetch(tin, payer_id, windows[0][0], windows[-1][1],
+                                          [member[2] for member in members], windows=windows))
+            else:
+                for patient, p_start, p_end, patient_rows in patients.values():
+                    plan.fetches.append(Fetch(tin, payer_id, p_start, p_end, patient_rows,
+                                              patient_headers(patient_rows[0][1])))
+    return plan
+
+
+def run_plan(plan, fetch, *, stats=None, max_workers=PATIENT_CONCURRENCY):
+    """
+    Execute a FetchPlan on a thread pool and match every row.
+
+    Window results are matched with a ClaimIndex over the window; a
+    patient fetch matches its rows against that patient's claims only. A
+    failed fetch, or a row outside the queryable range, is marked failed.
+    Returns results-CSV rows in CSV order, and feeds observed page counts
+    back into `stats`.
+    """
+    def run(item):
+        try:
+            with span('bulk.fetch', tin=item.tin, payer_id=item.payer_id, window_start=iso(item.start),
+                      window_end=iso(item.end), strategy='window' if item.patient is None else 'patient',
+                      rows=len(item.rows)) as current:
+                claims, pages = [], 0
+                for start, end in item.windows or [(item.start, item.end)]:
+                    window_claims, window_pages = fetch(item.tin, item.payer_id, start, end, item.patient)
+                    claims.extend(window_claims)
+                    pages += window_pages
+                current.set(claims=len(claims), pages=pages)
+        except Exception as e:
+            return [dict(match_result(n, row, None), error=str(e)) for n, row in item.rows]
+        if stats is not None:
+            if item.patient is None:
+                stats.observe_window(item.tin, item.payer_id, item.days, len(claims))
+            else:
+                stats.observe_patient(item.tin, item.payer_id, pages)
+        with span('bulk.match', tin=item.tin, payer_id=item.payer_id, rows=len(item.rows), claims=len(claims)):
+            index = ClaimIndex(claims)
+            return [match_result(n, row, index.match(row)) for n, row in item.rows]
+
+    results = [dict(match_result(n, row, None), error=OUTSIDE_LOOKBACK) for n, row in plan.skipped]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for rows in pool.map(bind(run), plan.fetches):
+            results.extend(rows)
+    results.sort(key=lambda r: r['row'])
+    return results
@@ -0,0 +1,284 @@
+"""
+Compact, lossless encoding for stored claims
+
+A /claims/search/ result (search_results_july_2025.json) is ~9KB of JSON,
+most of it repeated: every CARC / REMARK description is spelled out in full
+in every claim that carries the code, every object repeats its key names,
+amounts are strings ("1133.85"), the timeline restates dates found elsewhere
+in the claim, and rawJson / detailsJson / paymentJson repeat claimSummary,
+memberInfo, lineItems and payments verbatim. pack() removes each of these:
+
+- descriptions (description / *Desc values) and object key lists are
+  interned into a lookup table keyed by a hash of their text, so any
+  process can add an entry without coordination
+- "0.00"-style amounts are stored as integer cents
+- the timeline is dropped when derive_timeline() rebuilds it exactly
+- a larger subtree that occurs more than once in a claim is stored once
+
+unpack() restores the claim exactly (unpack(*pack(c)) == c), or only some
+top-level fields, which is all a list view or an export table reads.
+Payloads written before this format are plain claim JSON and still load.
+
+Usage:
+    lookup = SQLiteLookup(db)                           # or StoreLookup(redis_from_url())
+    payload = dumps(claim, lookup)                      # str for a TEXT column / Redis value
+    claim = loads(payload, lookup)
+    row = loads(payload, lookup, fields=('claimNumber', 'patient', 'status'))
+"""
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+from .stores import key, to_text
+
+FORMAT_VERSION = 1
+# Subtrees at least this long (as JSON) are stored once when they repeat
+SHARE_BYTES = 96
+INTERN_MIN_LENGTH = 16
+AMOUNT = re.compile(r'-?\d+\.\d\d')
+LOOKUP_KEY = key('claim_lookup')
+
+# Payload layout: {"@v": 1, "c": claim, "k": [shape ids], "s": [shared], "t": 1}.
+# Inside it every JSON array is an object ([shape index, *values]) and every
+# JSON object is one of the markers below.
+VERSION, CLAIM, SHAPES, SHARED, TIMELINE = '@v', 'c', 'k', 's', 't'
+REF, TEXT, NUMBER, LIST = '@r', '@d', '@n', '@l'
+
+
+def _is_description(name):
+    return name == 'description' or name.endswith('Desc')
+
+
+def lookup_id(text):
+    """Content address of an interned text, so writers never need to coordinate"""
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _cents(text):
+    negative = text.startswith('-')
+    whole, _, fraction = text.lstrip('-').partition('.')
+    cents = int(whole) * 100 + int(fraction)
+    cents = -cents if negative else cents
+    # "007.50" or "-0.00" would not come back as written; leave those as text
+    return cents if _cents_text(cents) == text else None
+
+
+def _cents_text(cents):
+    if cents < 0:
+        return '-%d.%02d' % divmod(-cents, 100)
+    return '%d.%02d' % divmod(cents, 100)
+
+
+_canonical = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+
+@lru_cache(maxsize=4096)
+def _shape_keys(text):
+    return tuple(json.loads(text))
+
+
+def derive_timeline(claim):
+    """The timeline events the backend builds from a claim's own dates"""
+    summary = claim.get('claimSummary') or {}
+    events = []
+
+    def add(date, event, description, kind):
+        if date:
+            events.append({'date': date, 'event': event, 'description': description, 'type': kind})
+
+    add(claim.get('serviceDate'), 'Service Provided',
+        f"Service date: {summary.get('firstSrvcDt')} - {summary.get('lastSrvcDt')}", 'service')
+    add(claim.get('claimReceivedDate'), 'Claim Received',
+        f"UHC received claim on {claim.get('claimReceivedDate')}", 'received')
+    add(summary.get('processedDt'), 'Claim Processed',
+        f"Processed on {summary.get('processedDt')} at {summary.get('processedTm')}", 'processed')
+    add(summary.get('statusEfctDt'), 'Status Updated',
+        f"Status effective date: {summary.get('statusEfctDt')}", 'status')
+    if claim.get('checkNumber'):
+        add(claim.get('paymentDate'), 'Payment Issued',
+            f"Check #{claim.get('checkNumber')} issued for ${claim.get('checkAmount')}", 'payment')
+    return events
+
+
+class _Packer:
+    def __init__(self, claim):
+        self.texts = {}
+        self.shapes = []
+        self.shared = []
+        self._shape_index = {}
+        self._shared_index = {}
+        self._json = {}
+        self._counts = {}
+        self._count(claim)
+
+    def _count(self, value):
+        # Occurrences of every large subtree; a repeat's children were
+        # counted with its first occurrence and are stored with it
+        if isinstance(value, (dict, list)):
+            text = self._json[id(value)] = _canonical(value)
+            if len(text) >= SHARE_BYTES:
+                self._counts[text] = self._counts.get(text, 0) + 1
+                if self._counts[text] > 1:
+                    return
+            for child in value.values() if isinstance(value, dict) else value:
+                self._count(child)
+
+    def _intern(self, text):
+        ident = lookup_id(text)
+        self.texts[ident] = text
+        return ident
+
+    def pack(self, value, name=None, share=True):
+        if isinstance(value, (dict, list)) and share:
+            text = self._json.get(id(value)) or _canonical(value)
+            if self._counts.get(text, 0) > 1:
+                if text not in self._shared_index:
+                    self._shared_index[text] = len(self.shared)
+                    self.shared.append(None)
+                    self.shared[self._shared_index[text]] = self.pack(value, name, share=False)
+                return {REF: self._shared_index[text]}
+        if isinstance(value, dict):
+            names = tuple(value)
+            if names not in self._shape_index:
+                self._shape_index[names] = len(self.shapes)
+                self.shapes.append(self._intern(_canonical(names)))
+            return [self._shape_index[names], *(self.pack(v, k) for k, v in value.items())]
+        if isinstance(value, list):
+            return {LIST: [self.pack(v, name) for v in value]}
+        if isinstance(value, str):
+            if AMOUNT.fullmatch(value):
+                cents = _cents(value)
+                if cents is not None:
+                    return cents
+            if name is not None and _is_description(name) and len(value) >= INTERN_MIN_LENGTH:
+                return {TEXT: self._intern(value)}
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return {NUMBER: value}
+        return value
+
+
+def pack(claim):
+    """(packed claim, {lookup id: text}) - the texts belong in the lookup table"""
+    claim = dict(claim)
+    derived = 'timeline' in claim and claim['timeline'] == derive_timeline(claim)
+    if derived:
+        del claim['timeline']
+    packer = _Packer(claim)
+    body = packer.pack(claim, share=False)
+    packed = {VERSION: FORMAT_VERSION, CLAIM: body, SHAPES: packer.shapes}
+    if packer.shared:
+        packed[SHARED] = packer.shared
+    if derived:
+        packed[TIMELINE] = 1
+    return packed, packer.texts
+
+
+class _Unpacker:
+    def __init__(self, packed, lookup):
+        self.lookup = lookup
+        self.shapes = [_shape_keys(lookup[ident]) for ident in packed[SHAPES]]
+        self.shared = packed.get(SHARED, ())
+
+    def unpack(self, value):
+        kind = type(value)
+        if kind is list:
+            obj = dict(zip(self.shapes[value[0]], value[1:]))
+            # Leaves inline: most values are text or cents, and a call per
+            # value is what makes a naive decoder slower than json.loads
+            for name, item in obj.items():
+                kind = type(item)
+                if kind is int:
+                    obj[name] = _cents_text(item)
+                elif kind is list or kind is dict:
+                    obj[name] = self.unpack(item)
+            return obj
+        if kind is dict:
+            (marker, item), = value.items()
+            if marker == LIST:
+                return [self.unpack(v) for v in item]
+            if marker == TEXT:
+                return self.lookup[item]
+            if marker == REF:
+                # Unpacked per occurrence, so callers can change one copy
+                return self.unpack(self.shared[item])
+            return item
+        if kind is int:
+            return _cents_text(value)
+        return value
+
+
+def unpack(packed, lookup, fields=None):
+    """
+    The original claim from pack() output; `lookup` maps ids to texts (a
+    dict or a lookup table). fields: restore only these top-level keys.
+    """
+    if packed.get(VERSION) != FORMAT_VERSION:
+        return packed if fields is None else {k: packed[k] for k in fields if k in packed}
+    unpacker = _Unpacker(packed, lookup)
+    body = packed[CLAIM]
+    names = unpacker.shapes[body[0]]
+    if fields is None or (packed.get(TIMELINE) and 'timeline' in fields):
+        claim = unpacker.unpack(body)
+        if packed.get(TIMELINE):
+            claim['timeline'] = derive_timeline(claim)
+        return claim if fields is None else {k: claim[k] for k in fields if k in claim}
+    wanted = set(fields)
+    return {k: unpacker.unpack(v) for k, v in zip(names, body[1:]) if k in wanted}
+
+
+def dumps(claim, lookup):
+    """Packed claim as JSON text; new texts are added to the lookup table"""
+    packed, texts = pack(claim)
+    lookup.update(texts)
+    return _canonical(packed)
+
+
+def loads(payload, lookup, fields=None):
+    """Claim from dumps() output (or a plain claim JSON payload)"""
+    return unpack(json.loads(payload), lookup, fields)
+
+
+class SQLiteLookup:
+    """Interned texts in an SQLite table (claim_lookup), cached in process"""
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS claim_lookup (id TEXT PRIMARY KEY, text TEXT NOT NULL)"
+
+    def __init__(self, db):
+        self._db = db
+        self._db.execute(self.SCHEMA)
+        self._texts = {}
+
+    def update(self, texts):
+        new = {k: v for k, v in texts.items() if k not in self._texts}
+        if new:
+            with self._db:
+                self._db.executemany("INSERT OR IGNORE INTO claim_lookup (id, text) VALUES (?, ?)", new.items())
+            self._texts.update(new)
+
+    def __getitem__(self, ident):
+        if ident not in self._texts:
+            # Another process added it; one read picks up everything new
+            self._texts.update(self._db.execute("SELECT id, text FROM claim_lookup"))
+        return self._texts[ident]
+
+
+class StoreLookup:
+    """Interned texts in one Redis hash (connectme:claim_lookup), cached in process"""
+
+    def __init__(self, store):
+        self.store = store
+        self._texts = {}
+
+    def update(self, texts):
+        new = {k: v for k, v in texts.items() if k not in self._texts}
+        if new:
+            self.store.hset(LOOKUP_KEY, mapping=new)
+            self._texts.update(new)
+
+    def __getitem__(self, ident):
+        if ident not in self._texts:
+            self._texts.update(
+                {to_text(k): to_text(v) for k, v in self.store.hgetall(LOOKUP_KEY).items()})
+        return self._texts[ident]
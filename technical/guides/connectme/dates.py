@@ -0,0 +1,65 @@
+"""
+Service-date helpers shared by the cache, planner and fake backend
+"""
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+
+# UHC Summary API limits (see 4_EDGE_CASES.md, section 1)
+MAX_WINDOW_DAYS = 90
+
+
+def parse_date(value):
+    """Accept YYYY-MM-DD or MM/DD/YYYY (both appear in UHC and CSV data)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ('%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+
+def iso(value):
+    """YYYY-MM-DD, the format /claims/search/ expects"""
+    return parse_date(value).strftime('%Y-%m-%d')
+
+
+def days_between(start, end):
+    """Every day in [start, end], inclusive"""
+    start, end = parse_date(start), parse_date(end)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def contiguous_runs(days):
+    """Collapse a set of days into sorted inclusive (start, end) runs"""
+    runs = []
+    for day in sorted(set(days)):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def claim_service_date(claim):
+    """Service date of a /claims/search/ result, or None if it has none"""
+    summary = claim.get('claimSummary') or {}
+    for value in (claim.get('serviceDate'), summary.get('firstSrvcDt'), claim.get('firstServiceDate')):
+        if value:
+            try:
+                return parse_date(value)
+            except ValueError:
+                continue
+    return None
+
+
+def claim_key(claim):
+    """Identity of a claim in a result set: its number, or a content hash for claims without one"""
+    number = claim.get('claimNumber')
+    if number:
+        return str(number)
+    return 'sha1:' + hashlib.sha1(json.dumps(claim, sort_keys=True, default=str).encode()).hexdigest()
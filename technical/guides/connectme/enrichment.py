@@ -0,0 +1,169 @@
+"""
+Pipelined Summary → Details → Payment Status enrichment
+
+search_claims() used to call the three UHC APIs strictly in sequence, claim
+by claim (5_CLAIMS_LOGIC.md). enrich_pipeline() overlaps them:
+
+- the next Summary page downloads while the current page's claims are
+  being enriched
+- a bounded pool of workers enriches claims; Details and Payment Status for
+  a claim are fetched at the same time
+
+so a page costs roughly its slowest stage instead of the sum of every call.
+
+Usage:
+    stats = PipelineStats()
+    async for claim in enrich_pipeline(pages, fetch_details, fetch_payment, workers=8, stats=stats):
+        ...
+    print(stats.summary())
+
+fetch_details / fetch_payment take the summary claim and may be coroutine
+functions or plain functions (the backend's synchronous uhc_client calls are
+run in threads).
+"""
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+
+from .tracing import span
+
+_DONE = object()
+
+
+@dataclass
+class StageTiming:
+    """Call count and latency for one pipeline stage"""
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass
+class PipelineStats:
+    """Per-stage timing plus wall-clock time for one pipeline run"""
+    stages: dict = field(default_factory=lambda: {
+        'summary': StageTiming(), 'details': StageTiming(), 'payment': StageTiming(),
+    })
+    wall: float = 0.0
+    errors: int = 0
+
+    def summary(self):
+        parts = [
+            f"{name}: {t.count} calls, mean {t.mean:.2f}s, max {t.max:.2f}s"
+            for name, t in self.stages.items()
+        ]
+        return f"wall {self.wall:.2f}s | " + " | ".join(parts)
+
+
+def _as_coroutine_function(func):
+    if inspect.iscoroutinefunction(func):
+        return func
+
+    async def run_in_thread(*args):
+        return await asyncio.to_thread(func, *args)
+    return run_in_thread
+
+
+def merge_enrichment(claim, details, payment):
+    """Default merge, using the same keys as the stored claim JSON"""
+    enriched = dict(claim)
+    enriched['detailsJson'] = details
+    enriched['paymentJson'] = payment
+    enriched['hasDetailedData'] = details is not None
+    enriched['hasPaymentData'] = payment is not None
+    return enriched
+
+
+async def enrich_pipeline(pages, fetch_details, fetch_payment, *, workers=8,
+                          prefetch_pages=1, merge=merge_enrichment, stats=None):
+    """
+    Enrich every claim from `pages` (an async iterator of summary claim
+    lists) and yield enriched claims as they complete (not in input order).
+
+    - workers: claims enriched concurrently
+    - prefetch_pages: summary pages buffered ahead of the workers
+    - merge(claim, details, payment): builds the yielded claim; a failed
+      Details or Payment call is passed as None and counted in stats.errors
+    """
+    stats = stats if stats is not None else PipelineStats()
+    fetch_details = _as_coroutine_function(fetch_details)
+    fetch_payment = _as_coroutine_function(fetch_payment)
+    claims_queue = asyncio.Queue(maxsize=workers * (prefetch_pages + 1))
+    results = asyncio.Queue()
+    started = time.monotonic()
+
+    async def timed(stage, func, claim):
+        began = time.monotonic()
+        try:
+            with span(f'enrich.{stage}', claim_number=claim.get('claimNumber')):
+                return await func(claim)
+        except Exception:
+            stats.errors += 1
+            return None
+        finally:
+            stats.stages[stage].record(time.monotonic() - began)
+
+    async def produce():
+        iterator = pages.__aiter__()
+        while True:
+            began = time.monotonic()
+            with span('enrich.summary') as current:
+                # End of pages is not an error; catch it before the span sees it
+                try:
+                    page = await iterator.__anext__()
+                except StopAsyncIteration:
+                    page = None
+                current.set(claims=len(page) if page is not None else 0)
+            if page is None:
+                break
+            stats.stages['summary'].record(time.monotonic() - began)
+            for claim in page:
+                await claims_queue.put(claim)
+        for _ in range(workers):
+            await claims_queue.put(_DONE)
+
+    async def work():
+        while True:
+            claim = await claims_queue.get()
+            if claim is _DONE:
+                await results.put(_DONE)
+                return
+            details, payment = await asyncio.gather(
+                timed('details', fetch_details, claim),
+                timed('payment', fetch_payment, claim),
+            )
+            await results.put(merge(claim, details, payment))
+
+    producer = asyncio.create_task(produce())
+    tasks = [producer] + [asyncio.create_task(work()) for _ in range(workers)]
+    finished_workers = 0
+    try:
+        while finished_workers < workers:
+            getter = asyncio.ensure_future(results.get())
+            # Watch the producer too, so a failed Summary page is raised here
+            waiters = [getter] if producer.done() else [getter, producer]
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                producer.result()
+                continue
+            item = getter.result()
+            if item is _DONE:
+                finished_workers += 1
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stats.wall = time.monotonic() - started
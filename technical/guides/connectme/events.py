@@ -0,0 +1,212 @@
+"""
+Push progress stream for CSV / bulk jobs (Server-Sent Events over Redis pub/sub)
+
+Pollers hit /csv-jobs/{id}/ or /bulk/jobs/{id}/progress/ every 3s
+(test_bulk_upload.py, test_bulk_upload_by_patient.py, the history
+sidebar). Instead, the task publishes events to a per-job Redis channel
+and an SSE endpoint relays them:
+
+- snapshot  current counters and status, sent first on every connection
+- progress  only the counters that changed, at most every `min_interval`
+- rows      per-row outcomes (row, claim_number, status, success, error)
+- done      final status and counters; the stream ends after it
+
+Server side:
+    publisher = JobEventPublisher(store, job.id)
+    progress = JobProgress(save, store=store, job_id=job.id, publisher=publisher)
+    ...
+    publisher.done('COMPLETED', progress.fields())
+
+    # GET /api/v1/claims/csv-jobs/{id}/events/
+    return StreamingHttpResponse(stream_job_events(store, job.id, snapshot=...),
+                                 content_type='text/event-stream')
+
+Client side (scripts):
+    for event in follow_job(session, events_url, poll_url, headers=headers):
+        state = apply_event(state, event)
+"""
+import json
+import time
+
+from .progress import read_progress
+from .stores import key, to_text
+
+FINAL_STATUSES = ('COMPLETED', 'FAILED', 'CANCELLED')
+PUBLISH_INTERVAL = 0.25
+HEARTBEAT_SECONDS = 15
+ROW_EVENT_FIELDS = ['row', 'claim_number', 'status', 'success', 'error']
+
+
+def events_channel(job_id):
+    return key('csvjob', job_id, 'events')
+
+
+class JobEventPublisher:
+    """Publishes a job's events to its Redis channel"""
+
+    def __init__(self, store, job_id, *, min_interval=PUBLISH_INTERVAL, clock=time.monotonic):
+        self.store = store
+        self.job_id = job_id
+        self.channel = events_channel(job_id)
+        self.min_interval = min_interval
+        self._clock = clock
+        self._last = {}
+        self._last_sent = None
+        self.seq = 0
+
+    def _publish(self, event_type, **data):
+        self.seq += 1
+        event = dict(data, type=event_type, seq=self.seq, job_id=str(self.job_id))
+        self.store.publish(self.channel, json.dumps(event, default=str))
+
+    def progress(self, fields, force=False):
+        """Publish the counters that changed since the last progress event"""
+        delta = {name: value for name, value in fields.items() if self._last.get(name) != value}
+        if not delta:
+            return False
+        now = self._clock()
+        if not force and self._last_sent is not None and now - self._last_sent < self.min_interval:
+            return False
+        self._publish('progress', **delta)
+        self._last.update(delta)
+        self._last_sent = now
+        return True
+
+    def rows(self, results):
+        """Publish per-row outcomes (bulk.RESULT_FIELDS dicts) as one event"""
+        if results:
+            self._publish('rows', rows=[
+                {name: result.get(name) for name in ROW_EVENT_FIELDS} for result in results
+            ])
+
+    def done(self, status, fields=None):
+        """Final counters, then the status that ends every stream"""
+        if fields:
+            self.progress(fields, force=True)
+        self._publish('done', status=status, **(fields or {}))
+
+
+def format_sse(event):
+    """One SSE frame; the event's seq doubles as the SSE id"""
+    return f"id: {event.get('seq', 0)}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def stream_job_events(store, job_id, *, snapshot=None, heartbeat_seconds=HEARTBEAT_SECONDS,
+                      wait_seconds=1.0, clock=time.monotonic):
+    """
+    Generator of SSE frames for one job, for StreamingHttpResponse.
+
+    snapshot is what the view knows from the CSVJob row (status,
+    total_rows, counters); the Redis progress hash overrides the counters.
+    Subscribing happens before the snapshot is read so no event falls in
+    between. Ends after a 'done' event, or straight after the snapshot if
+    the job has already finished. Comment frames keep idle proxies open.
+    """
+    pubsub = store.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(events_channel(job_id))
+    try:
+        current = dict(snapshot or {})
+        current.update(read_progress(store, job_id))
+        yield format_sse(dict(current, type='snapshot', seq=0, job_id=str(job_id)))
+        if current.get('status') in FINAL_STATUSES:
+            yield format_sse(dict(current, type='done', seq=0, job_id=str(job_id)))
+            return
+        last_sent = clock()
+        while True:
+            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=wait_seconds)
+            if not message or message.get('type') != 'message':
+                if clock() - last_sent >= heartbeat_seconds:
+                    last_sent = clock()
+                    yield ": keep-alive\n\n"
+                continue
+            event = json.loads(to_text(message['data']))
+            last_sent = clock()
+            yield format_sse(event)
+            if event.get('type') == 'done':
+                return
+    finally:
+        pubsub.close()
+
+
+# --- client side -----------------------------------------------------------
+
+def parse_sse(lines):
+    """Decoded event dicts from an iterator of SSE text lines"""
+    data = []
+    for line in lines:
+        if line is None:
+            continue
+        line = to_text(line).rstrip('\r')
+        if not line:
+            if data:
+                yield json.loads('\n'.join(data))
+                data = []
+        elif line.startswith('data:'):
+            data.append(line[5:].lstrip())
+    if data:
+        yield json.loads('\n'.join(data))
+
+
+def apply_event(state, event):
+    """Fold an event into the job's running state (a plain dict)"""
+    state = dict(state or {})
+    if event['type'] in ('snapshot', 'progress', 'done'):
+        state.update({k: v for k, v in event.items() if k not in ('type', 'seq', 'job_id', 'rows')})
+    return state
+
+
+def poll_job(session, poll_url, *, headers=None, interval=3, max_wait=60, timeout=10):
+    """Old-style polling, yielding each response as a snapshot/done event"""
+    started = time.monotonic()
+    while time.monotonic() - started < max_wait:
+        response = session.get(poll_url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        job = response.json()
+        final = job.get('status') in FINAL_STATUSES
+        yield dict(job, type='done' if final else 'snapshot')
+        if final:
+            return
+        time.sleep(interval)
+
+
+def _frames_until(lines, deadline):
+    """SSE lines, stopping at the first frame boundary past `deadline` (heartbeats count)"""
+    for line in lines:
+        yield line
+        if not to_text(line or '').rstrip('\r') and time.monotonic() >= deadline:
+            return
+
+
+def follow_job(session, events_url, poll_url=None, *, headers=None, max_wait=60,
+               read_timeout=HEARTBEAT_SECONDS * 2):
+    """
+    Yield a job's events until 'done' or until max_wait seconds have passed,
+    using a `requests` session.
+
+    Streams events_url; if the backend has no events endpoint yet (404/405)
+    and poll_url is given, falls back to polling it every 3s. A stream that
+    stalls for longer than the read timeout also falls back to polling for
+    the time that is left.
+    """
+    deadline = time.monotonic() + max_wait
+    headers = dict(headers or {}, Accept='text/event-stream')
+    response = session.get(events_url, headers=headers, stream=True, timeout=(10, min(read_timeout, max_wait)))
+    poll_headers = {k: v for k, v in headers.items() if k != 'Accept'}
+    if response.status_code in (404, 405) and poll_url:
+        response.close()
+        yield from poll_job(session, poll_url, headers=poll_headers, max_wait=deadline - time.monotonic())
+        return
+    response.raise_for_status()
+    try:
+        for event in parse_sse(_frames_until(response.iter_lines(decode_unicode=True), deadline)):
+            yield event
+            if event.get('type') == 'done':
+                return
+    except OSError:
+        # requests' exceptions (read timeout, dropped connection) are OSErrors
+        pass
+    finally:
+        response.close()
+    remaining = deadline - time.monotonic()
+    if poll_url and remaining > 0:
+        yield from poll_job(session, poll_url, headers=poll_headers, max_wait=remaining)
@@ -0,0 +1,399 @@
+"""
+Streaming claims export: CSV or Parquet, with line-item and claim-code tables
+
+claims_detailed_export_2025-10-15.csv is built in the browser from the
+claims already on screen: one row per claim, 23 flattened fields, nothing
+about line items. A year of claims for a TIN does not fit that model. Here
+stored claims are read in keyset-paginated chunks (WHERE (day, claim) >
+last ORDER BY day, claim LIMIT n - no OFFSET, so every page costs the same)
+and each chunk is written out before the next is read:
+
+- stream_csv():      bytes of one table's CSV, chunk by chunk, for a
+                     StreamingHttpResponse - the download starts with the
+                     first chunk
+- stream_csv_zip():  claims.csv, line_items.csv and claim_codes.csv in one
+                     zip, streamed the same way (one pass per table)
+- write_parquet():   one Parquet file per table, a row group per chunk, for
+                     a Celery export task (needs pyarrow)
+
+stream_csv(pages, 'bulk_upload') writes a bulk-upload-ready CSV (name, DOB,
+subscriber ID and service dates from each claim's memberInfo), so building
+an upload from past results no longer needs a claim-detail request per claim.
+
+Memory is one chunk regardless of the export size. The claims table keeps
+the 23 columns and formatting of the browser export.
+
+Usage:
+    pages = cache_pages(WindowCache(), scope, '2025-01-01', '2025-12-31', status='Finalized',
+                        fields=table_fields(['claims']))
+    return StreamingHttpResponse(stream_csv(pages), content_type='text/csv')
+
+    pages = queryset_pages(Claim.objects.filter(tin=tin), to_claim=lambda row: row.raw_json)
+    write_parquet(pages, '/exports/job-42')
+
+    stream_csv(pages, 'bulk_upload')            # claim_number,first_name,...,last_service_date
+"""
+import csv
+import io
+import os
+import zipfile
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from pathlib import Path
+
+from .dates import parse_date
+from .pagination import status_matches
+
+PAGE_CLAIMS = 500
+EXPORT_TIMEZONE = os.environ.get('CONNECTME_EXPORT_TIMEZONE', 'America/New_York')
+MISSING = 'N/A'
+
+# (header, type); types drive CSV formatting and the Parquet schema
+CLAIM_COLUMNS = [
+    ('Claim Number', 'str'), ('Patient', 'str'), ('Provider', 'str'), ('Service Date', 'date'),
+    ('Status', 'str'), ('Charged Amount', 'amount'), ('Paid Amount', 'amount'),
+    ('Patient Balance', 'amount'), ('Deductible', 'amount'), ('Copay', 'amount'),
+    ('Coinsurance', 'amount'), ('Check Number', 'str'), ('Check Amount', 'amount'),
+    ('Payment Date', 'date'), ('Claim Received', 'date'), ('Last Status Change', 'date'),
+    ('Transaction ID', 'str'), ('Line Items Count', 'int'), ('Payments Count', 'int'),
+    ('Has Details', 'bool'), ('Has Payment Data', 'bool'), ('Remarks Count', 'int'),
+    ('Queried At', 'timestamp'),
+]
+LINE_ITEM_COLUMNS = [
+    ('Claim Number', 'str'), ('Line Number', 'int'), ('First Service Date', 'date'),
+    ('Last Service Date', 'date'), ('Service Code', 'str'), ('Procedure Code', 'str'),
+    ('Revenue Code', 'str'), ('Units', 'int'), ('Billed Amount', 'amount'),
+    ('Allowed Amount', 'amount'), ('Paid Amount', 'amount'), ('Patient Responsibility', 'amount'),
+    ('Deductible', 'amount'), ('Copay', 'amount'), ('Coinsurance', 'amount'),
+    ('ICN Suffix', 'str'), ('Network Status', 'str'), ('Processed Date', 'date'),
+]
+CLAIM_CODE_COLUMNS = [
+    ('Claim Number', 'str'), ('Line Number', 'int'), ('Type', 'str'), ('Code', 'str'),
+    ('Description', 'str'),
+]
+# The bulk-upload template (CSV_BULK_UPLOAD_GUIDE.md); written plain, ISO dates
+BULK_UPLOAD_COLUMNS = [
+    ('claim_number', 'str'), ('first_name', 'str'), ('last_name', 'str'), ('date_of_birth', 'date'),
+    ('subscriber_id', 'str'), ('first_service_date', 'date'), ('last_service_date', 'date'),
+]
+
+
+def _amount(value):
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value).replace(',', ''))
+    except InvalidOperation:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _date(value):
+    # Memoised: a year's export has a few hundred distinct dates and strptime is slow
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def _int(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def claim_rows(claim):
+    summary = claim.get('claimSummary') or {}
+    yield [
+        claim.get('claimNumber'), claim.get('patient'), claim.get('providerName'),
+        _date(claim.get('serviceDate')), claim.get('status'),
+        _amount(claim.get('chargedAmount') or summary.get('totalChargedAmt')),
+        _amount(claim.get('paidAmount') or summary.get('totalPaidAmt')),
+        _amount(claim.get('patientBalance')), _amount(claim.get('deductible')),
+        _amount(claim.get('copay')), _amount(claim.get('coinsurance')),
+        claim.get('checkNumber'), _amount(claim.get('checkAmount')), _date(claim.get('paymentDate')),
+        _date(claim.get('claimReceivedDate')), _date(claim.get('lastStatusChangeDate')),
+        claim.get('transactionId'), len(claim.get('lineItems') or ()), len(claim.get('payments') or ()),
+        bool(claim.get('hasDetailedData')), bool(claim.get('hasPaymentData')),
+        len(claim.get('remarks') or ()), _timestamp(claim.get('queriedAt')),
+    ]
+
+
+def line_item_rows(claim):
+    number = claim.get('claimNumber')
+    for line in claim.get('lineItems') or ():
+        yield [
+            number, _int(line.get('lineNbr')), _date(line.get('firstSrvcDt')), _date(line.get('lastSrvcDt')),
+            line.get('srvcCode'), line.get('procedureCd'), line.get('revenueCode') or None,
+            _int(line.get('unitCount')), _amount(line.get('billedAmt')), _amount(line.get('allowdAmt')),
+            _amount(line.get('paidAmt')), _amount(line.get('totalMemResp')), _amount(line.get('deductible')),
+            _amount(line.get('copay')), _amount(line.get('coinsurance')), line.get('icnSuffix'),
+            line.get('networkStatus'), _date(line.get('processedDt')),
+        ]
+
+
+def claim_code_rows(claim):
+    """Claim-level codes (Line Number empty), then each line's codes"""
+    number = claim.get('claimNumber')
+    for code in (claim.get('claimSummary') or {}).get('claimCodes') or ():
+        yield [number, None, code.get('type'), code.get('code'), code.get('description')]
+    for line in claim.get('lineItems') or ():
+        for code in line.get('claimCodes') or ():
+            yield [number, _int(line.get('lineNbr')), code.get('type'), code.get('code'), code.get('description')]
+
+
+def bulk_upload_rows(claim):
+    """
+    One upload row per claim from its memberInfo (DOB and subscriber ID come
+    with every search result); claims without name and DOB are skipped
+    """
+    member = claim.get('memberInfo') or {}
+    summary = claim.get('claimSummary') or {}
+    first, last = member.get('ptntFn'), member.get('ptntLn')
+    if not (first and last):
+        first, _, last = (claim.get('patient') or '').partition(' ')
+    dob = _date(member.get('ptntDob'))
+    if not (first and last and dob):
+        return
+    first_service = _date(summary.get('firstSrvcDt') or claim.get('serviceDate'))
+    yield [
+        claim.get('claimNumber'), first.strip(), last.strip(), dob, member.get('subscriberId') or None,
+        first_service, _date(summary.get('lastSrvcDt')) or first_service,
+    ]
+
+
+TABLES = {
+    'claims': (CLAIM_COLUMNS, claim_rows),
+    'line_items': (LINE_ITEM_COLUMNS, line_item_rows),
+    'claim_codes': (CLAIM_CODE_COLUMNS, claim_code_rows),
+    'bulk_upload': (BULK_UPLOAD_COLUMNS, bulk_upload_rows),
+}
+# Tables in the upload format rather than the browser export's display format
+UPLOAD_TABLES = {'bulk_upload'}
+# Top-level claim keys each table reads, for cache_pages(fields=...)
+TABLE_FIELDS = {
+    'claims': (
+        'claimNumber', 'patient', 'providerName', 'serviceDate', 'status', 'chargedAmount', 'paidAmount',
+        'patientBalance', 'deductible', 'copay', 'coinsurance', 'checkNumber', 'checkAmount', 'paymentDate',
+        'claimReceivedDate', 'lastStatusChangeDate', 'transactionId', 'lineItems', 'payments',
+        'hasDetailedData', 'hasPaymentData', 'remarks', 'queriedAt', 'claimSummary',
+    ),
+    'line_items': ('claimNumber', 'lineItems'),
+    'claim_codes': ('claimNumber', 'claimSummary', 'lineItems'),
+    'bulk_upload': ('claimNumber', 'patient', 'serviceDate', 'memberInfo', 'claimSummary'),
+}
+
+
+def table_fields(tables):
+    """Claim keys that `tables` (and the status filter) read"""
+    return tuple(sorted({'status'}.union(*(TABLE_FIELDS[table] for table in tables))))
+
+
+# --- sources -----------------------------------------------------------------
+
+def iter_keyset(fetch_after, page_size=PAGE_CLAIMS):
+    """
+    Claim lists from fetch_after(last_key, limit) -> [(key, claim), ...],
+    called with None first and then with the last key of the previous page,
+    until a short page comes back
+    """
+    after = None
+    while True:
+        rows = fetch_after(after, page_size)
+        if rows:
+            yield [claim for _, claim in rows]
+            after = rows[-1][0]
+        if len(rows) < page_size:
+            return
+
+
+def cache_pages(cache, scope, start, end, *, status=None, fields=None, page_size=PAGE_CLAIMS):
+    """
+    Claims stored in a cache.WindowCache for [start, end], keyset-paginated
+    with WindowCache.page_after. fields: decode only these top-level claim
+    keys (status filtering needs 'status').
+    """
+    def fetch_after(after, limit):
+        return cache.page_after(scope, start, end, after, limit, fields)
+
+    for page in iter_keyset(fetch_after, page_size):
+        claims = [claim for claim in page if status_matches(claim, status)]
+        if claims:
+            yield claims
+
+
+def queryset_pages(queryset, *, to_claim, key=('service_date', 'pk'), page_size=PAGE_CLAIMS):
+    """
+    Keyset pages of a Django queryset ordered by `key` (two fields, the last
+    unique); to_claim(obj) returns the claim dict stored on the row
+    """
+    try:
+        from django.db.models import Q
+    except ImportError as e:
+        raise ImportError("queryset_pages requires Django") from e
+    first, second = key
+    queryset = queryset.order_by(first, second)
+
+    def fetch_after(after, limit):
+        page = queryset
+        if after is not None:
+            page = page.filter(Q(**{f'{first}__gt': after[0]}) | Q(**{first: after[0], f'{second}__gt': after[1]}))
+        return [((getattr(obj, first), getattr(obj, 'pk' if second == 'pk' else second)), to_claim(obj))
+                for obj in page[:limit]]
+
+    return iter_keyset(fetch_after, page_size)
+
+
+# --- writers -----------------------------------------------------------------
+
+def _format(value, kind, timezone):
+    if value is None or value == '':
+        return MISSING
+    if kind == 'amount':
+        return f"{value:.2f}"
+    if kind == 'date':
+        return value.strftime('%m/%d/%Y')
+    if kind == 'bool':
+        return 'Yes' if value else 'No'
+    if kind == 'timestamp':
+        if timezone and value.tzinfo:
+            value = value.astimezone(timezone)
+        return value.strftime('%b %d, %Y at %I:%M %p')
+    return str(value)
+
+
+def _timezone(name):
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        return None
+
+
+def _upload_format(value, kind, timezone):
+    if value is None:
+        return ''
+    return value.isoformat() if kind == 'date' else str(value)
+
+
+def _csv_chunks(pages, table, timezone):
+    columns, rows_of = TABLES[table]
+    kinds = [kind for _, kind in columns]
+    buffer = io.StringIO()
+    # Header unquoted and values quoted, like the browser export
+    buffer.write(','.join(name for name, _ in columns) + '\n')
+    if table in UPLOAD_TABLES:
+        writer, format_value = csv.writer(buffer, lineterminator='\n'), _upload_format
+    else:
+        writer, format_value = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator='\n'), _format
+    for page in pages:
+        for claim in page:
+            for row in rows_of(claim):
+                writer.writerow([format_value(value, kind, timezone) for value, kind in zip(row, kinds)])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_csv(pages, table='claims', *, timezone=EXPORT_TIMEZONE):
+    """Bytes of `table` as CSV, one block per page of claims"""
+    return _csv_chunks(pages, table, _timezone(timezone))
+
+
+class _Pipe(io.RawIOBase):
+    """Unseekable sink that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def stream_csv_zip(make_pages, tables=('claims', 'line_items', 'claim_codes'), *, timezone=EXPORT_TIMEZONE):
+    """
+    Bytes of a zip with one CSV per table. make_pages() returns a fresh
+    page iterator; it is called once per table.
+    """
+    zone = _timezone(timezone)
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for table in tables:
+            with archive.open(f"{table}.csv", 'w', force_zip64=True) as member:
+                for block in _csv_chunks(make_pages(), table, zone):
+                    member.write(block)
+                    data = pipe.drain()
+                    if data:
+                        yield data
+    yield pipe.drain()
+
+
+def _arrow_schema(pa, columns):
+    types = {'str': pa.string(), 'amount': pa.decimal128(12, 2), 'date': pa.date32(), 'int': pa.int32(),
+             'bool': pa.bool_(), 'timestamp': pa.timestamp('us', tz='UTC')}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def write_parquet(pages, directory, tables=('claims', 'line_items', 'claim_codes')):
+    """
+    One Parquet file per table in `directory` ({table}.parquet), written in a
+    single pass with one row group per page. Returns {table: rows}.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("write_parquet requires pyarrow: pip install pyarrow") from e
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    writers, counts = {}, dict.fromkeys(tables, 0)
+    try:
+        for table in tables:
+            writers[table] = pq.ParquetWriter(directory / f"{table}.parquet",
+                                              _arrow_schema(pa, TABLES[table][0]))
+        for page in pages:
+            for table in tables:
+                columns, rows_of = TABLES[table]
+                rows = [row for claim in page for row in rows_of(claim)]
+                if not rows:
+                    continue
+                # Decimal amounts are quantized to the column's two places
+                batch = pa.Table.from_pylist(
+                    [{name: _parquet_value(value, kind) for (name, kind), value in zip(columns, row)}
+                     for row in rows],
+                    schema=writers[table].schema)
+                writers[table].write_table(batch)
+                counts[table] += len(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def _parquet_value(value, kind):
+    if kind == 'amount' and value is not None:
+        return value.quantize(Decimal('0.01'))
+    if kind == 'str' and value is not None and not isinstance(value, str):
+        return str(value)
+    if kind == 'date' and isinstance(value, datetime):
+        return value.date()
+    return value
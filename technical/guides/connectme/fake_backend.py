@@ -0,0 +1,171 @@
+"""
+Offline stand-in for the ConnectMe backend
+
+Plugs into ClaimsClient as its transport, so scripts and jobs can be run
+without the real endpoints:
+
+    backend = FakeBackend.from_sample_file()
+    async with ClaimsClient(transport=backend) as client:
+        claims = await client.search('2025-07-01', '2025-07-03')
+
+Claims are plain dicts shaped like search_results_july_2025.json.
+"""
+import asyncio
+import copy
+import json
+import random
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .client import CLAIM_DETAIL_PATH, MOCK_LOGIN_PATH, SEARCH_PATH, Response
+from .dates import parse_date
+from .pagination import status_matches
+
+SAMPLE_FILE = (
+    Path(__file__).resolve().parents[2]
+    / "testing" / "10_test-results" / "search_results_july_2025.json"
+)
+
+STATUSES = ["Finalized", "Finalized", "Finalized", "Denied", "Pending", "In Process"]
+
+
+def load_sample_claims(path=SAMPLE_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def generate_claims(count, start, end, templates=None, seed=0):
+    """
+    Synthesize `count` claims with service dates spread over [start, end],
+    cloned from the sample export so every nested structure is realistic.
+    """
+    rng = random.Random(seed)
+    templates = templates or load_sample_claims()
+    start, end = parse_date(start), parse_date(end)
+    span = (end - start).days
+    claims = []
+    for i in range(count):
+        claim = copy.deepcopy(templates[i % len(templates)])
+        service_date = (start + timedelta(days=rng.randint(0, span))).strftime('%m/%d/%Y')
+        claim['id'] = str(uuid.UUID(int=rng.getrandbits(128)))
+        claim['claimNumber'] = f"FK{i:08d}"
+        claim['serviceDate'] = service_date
+        claim['status'] = rng.choice(STATUSES)
+        summary = claim.get('claimSummary') or {}
+        summary['firstSrvcDt'] = summary['lastSrvcDt'] = service_date
+        for line in claim.get('lineItems', []):
+            line['firstSrvcDt'] = line['lastSrvcDt'] = service_date
+        claims.append(claim)
+    return claims
+
+
+class FakeBackend:
+    """
+    In-memory transport answering mock login, Keycloak token, claims search
+    and claim detail requests.
+
+    - latency: seconds slept per request (float, or callable(method, path))
+    - token_ttl: expires_in returned with every token
+    - max_results: cap on claims per search, like the backend's 500-claim
+      pagination limit (None = unlimited)
+
+    Searches that send pageSize are answered page by page: each response
+    carries nextTransactionId until the last page, and the statusFilter is
+    applied per page, the way the streaming backend does it.
+    """
+
+    def __init__(self, claims=(), latency=0.0, token_ttl=300, max_results=None):
+        self.claims = list(claims)
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.max_results = max_results
+        self._pages = {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.tokens_issued = 0
+        self._valid_tokens = set()
+
+    @classmethod
+    def from_sample_file(cls, path=SAMPLE_FILE, **kwargs):
+        return cls(load_sample_claims(path), **kwargs)
+
+    def calls_to(self, path):
+        return [c for c in self.calls if c[1] == path]
+
+    def expire_tokens(self):
+        """Invalidate every issued token, as if they all expired server-side"""
+        self._valid_tokens.clear()
+
+    async def request(self, method, url, *, headers=None, json=None, data=None, timeout=None):
+        path = urlsplit(url).path
+        self.calls.append((method, path, json if json is not None else data))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay = self.latency(method, path) if callable(self.latency) else self.latency
+            if delay:
+                await asyncio.sleep(delay)
+            return self._dispatch(method, path, headers or {}, json, data)
+        finally:
+            self.in_flight -= 1
+
+    def _issue_token(self):
+        self.tokens_issued += 1
+        token = f"fake-token-{self.tokens_issued}"
+        self._valid_tokens.add(token)
+        return Response(200, {'access_token': token, 'expires_in': self.token_ttl})
+
+    def _authorized(self, headers):
+        token = headers.get('Authorization', '').removeprefix('Bearer ')
+        return token in self._valid_tokens
+
+    def _dispatch(self, method, path, headers, json, data):
+        if method == "POST" and (path == MOCK_LOGIN_PATH or path.endswith('/openid-connect/token')):
+            return self._issue_token()
+        if not self._authorized(headers):
+            return Response(401, {'detail': 'Token expired'}, 'Token expired')
+        if method == "POST" and path == SEARCH_PATH:
+            payload = json or {}
+            if payload.get('pageSize'):
+                return Response(200, self.search_page(payload))
+            return Response(200, {'claims': self.search(payload)})
+        prefix, _, suffix = CLAIM_DETAIL_PATH.partition('{claim_number}')
+        if method == "GET" and path.startswith(prefix) and path.endswith(suffix):
+            claim_number = path[len(prefix):len(path) - len(suffix)]
+            for claim in self.claims:
+                if claim.get('claimNumber') == claim_number:
+                    return Response(200, claim)
+            return Response(404, {'detail': 'Not found'}, 'Not found')
+        return Response(404, {'detail': 'Unknown endpoint'}, f'Unknown endpoint {method} {path}')
+
+    def _in_window(self, payload):
+        first = parse_date(payload['firstServiceDate'])
+        last = parse_date(payload['lastServiceDate'])
+        matches = [c for c in self.claims if first <= parse_date(c['serviceDate']) <= last]
+        return matches[:self.max_results]
+
+    def search(self, payload):
+        """Claims whose service date falls in the payload's window"""
+        return [
+            claim for claim in self._in_window(payload)
+            if status_matches(claim, payload.get('statusFilter'))
+        ]
+
+    def search_page(self, payload):
+        """One page of a paged search, continuing from payload['transactionId']"""
+        offset = self._pages.pop(payload.get('transactionId'), 0)
+        size = int(payload['pageSize'])
+        window = self._in_window(payload)
+        page = window[offset:offset + size]
+        body = {
+            'claims': [c for c in page if status_matches(c, payload.get('statusFilter'))],
+            'transactionId': payload.get('transactionId'),
+        }
+        if offset + size < len(window):
+            next_transaction_id = str(uuid.uuid4())
+            self._pages[next_transaction_id] = offset + size
+            body['nextTransactionId'] = next_transaction_id
+        return body
@@ -0,0 +1,189 @@
+"""
+Streaming CSV ingestion for bulk upload jobs
+
+process_csv_file used to read the whole upload into memory, build every
+result row in a list and write the results CSV at the end - hence the 10MB
+cap and the advice to split files into 500-row batches
+(CSV_BULK_UPLOAD_GUIDE.md, 8_BULK_UPLOAD_OPTIMIZATION.md). Here the upload
+is decoded and parsed incrementally, rows are validated as they are read,
+and each chunk's results are written to the results file as soon as they
+are matched. Only one chunk is in memory at a time, so a 100k-row export
+runs in one job with flat memory.
+
+Usage (inside the Celery task):
+    with open(job.file.path, 'rb') as upload, open(results_path, 'w', newline='') as out:
+        stats = stream_csv_job(upload, process_chunk, out, chunk_rows=500)
+    job.success_count, job.failure_count = stats.success_count, stats.failure_count
+
+process_chunk([(row_number, row), ...]) returns one result dict per row
+(bulk.RESULT_FIELDS keys); invalid rows never reach it.
+"""
+import codecs
+import csv
+import io
+from dataclasses import dataclass
+
+from .bulk import RESULT_FIELDS, failed_row
+from .dates import parse_date
+from .metrics import CSVJOB_ROWS, record_job
+from .tracing import span
+
+REQUIRED_FIELDS = ['first_name', 'last_name', 'date_of_birth']
+# Either identifies the claim better; patient-only rows are matched by matcher.ClaimIndex
+IDENTIFIER_FIELDS = ['claim_number', 'subscriber_id']
+OPTIONAL_DATE_FIELDS = ['first_service_date', 'last_service_date']
+CHUNK_ROWS = 500
+READ_BYTES = 64 * 1024
+
+
+class CSVFormatError(ValueError):
+    """The upload cannot be processed at all (e.g. required columns missing)"""
+
+
+def iter_lines(source, encoding='utf-8-sig', read_bytes=READ_BYTES):
+    """
+    Decode an upload into text lines without reading it all.
+
+    source may be a binary file object, a text file object, or an iterable
+    of byte chunks (Django's UploadedFile.chunks(), an S3 body). Line
+    endings are kept so quoted fields spanning lines parse correctly.
+    """
+    if isinstance(source, io.TextIOBase):
+        yield from source
+        return
+    if hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(read_bytes), b'')
+    else:
+        chunks = source
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def validate_row(row):
+    """Problems with one CSV row, as a list of messages (empty when valid)"""
+    errors = [f"Missing {name}" for name in REQUIRED_FIELDS if not row.get(name)]
+    for name in ['date_of_birth'] + OPTIONAL_DATE_FIELDS:
+        value = row.get(name)
+        if value:
+            try:
+                parse_date(value)
+            except ValueError:
+                errors.append(f"Invalid {name}: {value}")
+    return errors
+
+
+def iter_csv_rows(source, encoding='utf-8-sig'):
+    """
+    Yield (row_number, row, errors) for every data row, 1-based like the
+    results CSV. Header names are normalised (trimmed, lower-case) and
+    values trimmed. Raises CSVFormatError if required columns are missing.
+    """
+    reader = csv.reader(iter_lines(source, encoding))
+    header = next(reader, None)
+    if header is None:
+        raise CSVFormatError("CSV file is empty")
+    header = [name.strip().lower() for name in header]
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if missing:
+        raise CSVFormatError(f"Missing required columns: {', '.join(missing)}")
+    row_number = 0
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        row_number += 1
+        row = {name: value.strip() for name, value in zip(header, values)}
+        yield row_number, row, validate_row(row)
+
+
+def iter_chunks(items, size=CHUNK_ROWS):
+    """Lists of up to `size` items from any iterator"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@dataclass
+class IngestStats:
+    """Running totals for a streamed job"""
+    rows: int = 0
+    success_count: int = 0
+    failure_count: int = 0
+    invalid_count: int = 0
+    chunks: int = 0
+
+
+class ResultWriter:
+    """Appends result rows to the results CSV as they arrive"""
+
+    def __init__(self, fileobj, stats=None):
+        self.fileobj = fileobj
+        self.stats = stats if stats is not None else IngestStats()
+        self._writer = csv.DictWriter(fileobj, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, results):
+        for result in results:
+            self._writer.writerow(result)
+            self.stats.rows += 1
+            if result.get('success'):
+                self.stats.success_count += 1
+            else:
+                self.stats.failure_count += 1
+        self.fileobj.flush()
+
+
+def stream_csv_job(source, process_chunk, result_file, *, chunk_rows=CHUNK_ROWS,
+                   encoding='utf-8-sig', on_chunk=None):
+    """
+    Parse `source` chunk by chunk, run process_chunk on the valid rows of
+    each chunk and write the chunk's results (in CSV row order) to
+    result_file before reading further.
+
+    on_chunk(stats) is called after every chunk, e.g. to save CSVJob
+    progress. A chunk whose process_chunk raises marks its own valid rows
+    as failed; the job carries on with the next chunk.
+    """
+    writer = ResultWriter(result_file)
+    stats = writer.stats
+    chunks = iter_chunks(iter_csv_rows(source, encoding), chunk_rows)
+    while True:
+        with span('csv.read', chunk=stats.chunks + 1) as current:
+            chunk = next(chunks, None)
+            current.set(rows=len(chunk or ()))
+        if chunk is None:
+            break
+        valid = [(n, row) for n, row, errors in chunk if not errors]
+        results = [failed_row(n, row, '; '.join(errors)) for n, row, errors in chunk if errors]
+        stats.invalid_count += len(results)
+        if valid:
+            try:
+                with span('bulk.chunk', chunk=stats.chunks + 1, rows=len(valid)):
+                    results.extend(process_chunk(valid))
+            except Exception as e:
+                results.extend(failed_row(n, row, e) for n, row in valid)
+        results.sort(key=lambda r: r['row'])
+        with span('csv.write', rows=len(results)):
+            writer.write(results)
+        matched = sum(1 for result in results if result.get('success'))
+        invalid = len(chunk) - len(valid)
+        CSVJOB_ROWS.inc(matched, result='matched')
+        CSVJOB_ROWS.inc(len(results) - matched - invalid, result='unmatched')
+        CSVJOB_ROWS.inc(invalid, result='invalid')
+        stats.chunks += 1
+        if on_chunk:
+            on_chunk(stats)
+    record_job(stats)
+    return stats
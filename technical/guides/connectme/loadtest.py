@@ -0,0 +1,407 @@
+"""
+Load testing the ConnectMe API with concurrent virtual users
+
+run_all_tests.sh runs each functional script once, serially, so nothing
+shows where the gunicorn / Celery deployment stops scaling. LoadTest
+replays the same flows the test_*.py scripts exercise:
+
+- practice list      GET  /providers/practices/
+- claims search      POST /claims/search/ for a random window
+- bulk upload        POST /claims/bulk/upload/, then job polling on
+                     GET  /claims/csv-jobs/{id}/ until the job finishes
+
+from virtual users (one thread and requests.Session each), picked by
+weight, with think time between flows. The number of users follows a ramp
+profile - stages of (seconds, users) ramped linearly like k6 stages - so a
+single run walks from light to month-end load. All users share one login
+through a TokenBroker.
+
+Every request is recorded per endpoint (throughput, error rate, status
+codes, p50 / p95 / p99 and a latency histogram) and per second (active
+users, requests, errors, p95). ceiling() groups the seconds into bands
+of user counts and reports how many users the deployment carried before
+p95 latency or the error rate first broke its budget.
+
+Usage:
+    test = LoadTest(target, auth=keycloak_login(username, password), profile=PROFILES['ramp'])
+    report = test.run()
+    print(format_report(report))
+"""
+import io
+import random
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from .bench import percentile
+from .client import BULK_UPLOAD_PATH, CSV_JOB_PATH, KEYCLOAK_URL, MOCK_LOGIN_PATH, PRACTICES_PATH, SEARCH_PATH
+from .events import FINAL_STATUSES
+from .stores import LocalStore
+from .tokens import TokenBroker
+
+# Seconds; the last bucket is +Inf
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# (seconds, users) stages; users ramp linearly from the previous stage's level
+PROFILES = {
+    'smoke': [(30, 2)],
+    'ramp': [(60, 10), (120, 25), (120, 50), (60, 0)],
+    'spike': [(30, 5), (10, 60), (60, 60), (30, 5)],
+    'month-end': [(120, 20), (300, 100), (600, 100), (120, 0)],
+}
+FLOW_WEIGHTS = {'practices': 3, 'search': 5, 'bulk': 1}
+THINK_SECONDS = (1.0, 3.0)
+POLL_SECONDS = 2.0
+JOB_MAX_WAIT = 300
+REQUEST_TIMEOUT = 60
+# Budget a load level has to meet to count as sustainable
+P95_BUDGET = 5.0
+ERROR_BUDGET = 0.01
+LEVEL_BANDS = 10
+SEARCH_FROM = date(2025, 7, 1)
+SEARCH_DAYS = 90
+LOAD_CSV = (
+    "first_name,last_name,date_of_birth,claim_number\n"
+    "KIMBERLY,KURAK,02/06/1969,FE23924647\n"
+    "JOHN,SMITH,01/15/1980,\n"
+    "MARY,JONES,07/04/1975,\n"
+)
+
+
+def parse_profile(value):
+    """A PROFILES name, or stages written '60s:10,2m:50,30s:0'"""
+    if value in PROFILES:
+        return PROFILES[value]
+    stages = []
+    for stage in value.split(','):
+        duration, _, users = stage.strip().partition(':')
+        seconds = float(duration[:-1]) * 60 if duration.endswith('m') else float(duration.rstrip('s'))
+        stages.append((seconds, int(users)))
+    return stages
+
+
+def users_at(profile, elapsed):
+    """Target user count `elapsed` seconds into the profile (None once it is over)"""
+    level = 0
+    for seconds, users in profile:
+        if elapsed < seconds:
+            return round(level + (users - level) * elapsed / seconds)
+        elapsed -= seconds
+        level = users
+    return None
+
+
+def keycloak_login(username, password, token_url=KEYCLOAK_URL, client_id='connectme-preprod-frontend'):
+    """fetch() for a Keycloak password grant, as the test_*.py scripts log in"""
+    def fetch(session, target):
+        response = session.post(token_url, data={
+            'client_id': client_id, 'username': username, 'password': password,
+            'grant_type': 'password', 'scope': 'openid profile email',
+        }, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    return fetch
+
+
+def mock_login(session, target):
+    """fetch() for the backend's /auth/mock/login/ (dev / pre-prod)"""
+    response = session.post(f"{target}{MOCK_LOGIN_PATH}", json={}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class EndpointStats:
+    """Counters, latency samples and a histogram for one endpoint"""
+
+    def __init__(self):
+        self.latencies = []
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, seconds, status, error):
+        self.latencies.append(seconds)
+        self.buckets[bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.errors += bool(error)
+
+    def summary(self, duration):
+        count = len(self.latencies)
+        return {
+            'requests': count,
+            'throughput': round(count / duration, 2) if duration else 0.0,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0.0,
+            'p50': round(percentile(self.latencies, 50), 3),
+            'p95': round(percentile(self.latencies, 95), 3),
+            'p99': round(percentile(self.latencies, 99), 3),
+            'max': round(max(self.latencies, default=0.0), 3),
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items(), key=str)},
+            'histogram': dict(zip([f"<={b:g}s" for b in HISTOGRAM_BUCKETS] + ['>60s'], self.buckets)),
+        }
+
+
+@dataclass
+class Second:
+    """One second of the run"""
+    users: int = 0
+    requests: int = 0
+    errors: int = 0
+    latencies: list = field(default_factory=list)
+
+
+class Recorder:
+    """Thread-safe sink for every request the virtual users make"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started = clock()
+        self.endpoints = {}
+        self.timeline = []
+
+    def _second(self):
+        index = int(self._clock() - self.started)
+        while len(self.timeline) <= index:
+            users = self.timeline[-1].users if self.timeline else 0
+            self.timeline.append(Second(users))
+        return self.timeline[index]
+
+    def set_users(self, users):
+        with self._lock:
+            self._second().users = users
+
+    def record(self, endpoint, seconds, status, error):
+        with self._lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).record(seconds, status, error)
+            second = self._second()
+            second.requests += 1
+            second.errors += bool(error)
+            second.latencies.append(seconds)
+
+
+class VirtualUser(threading.Thread):
+    """Runs weighted flows back to back until stopped"""
+
+    def __init__(self, test, number):
+        super().__init__(name=f'vu-{number}', daemon=True)
+        self.test = test
+        self.stopping = threading.Event()
+        self.rng = random.Random(number)
+        self.session = test.session_factory()
+        self.practice_id = None
+
+    def call(self, endpoint, method, path, **kwargs):
+        """
+        One timed request; returns the response, or None when no token could
+        be had or the request failed to connect (recorded as a failed request)
+        """
+        test = self.test
+        started = time.monotonic()
+        try:
+            token = test.token(self.session)
+            response = self.session.request(method, f"{test.target}{path}",
+                                            headers={'Authorization': f'Bearer {token}'},
+                                            timeout=test.request_timeout, **kwargs)
+        except Exception as e:
+            test.recorder.record(endpoint, time.monotonic() - started, type(e).__name__, True)
+            return None
+        test.recorder.record(endpoint, time.monotonic() - started, response.status_code,
+                             response.status_code >= 400)
+        if response.status_code == 401:
+            try:
+                test.token(self.session, rejected=token)
+            except Exception:
+                # Recorded as a failed 'login'; the next call tries again
+                pass
+        return response
+
+    def practices(self):
+        response = self.call('practice list', 'GET', PRACTICES_PATH)
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            practices = data.get('results', data) if isinstance(data, dict) else data
+            if practices:
+                self.practice_id = self.rng.choice(practices)['id']
+
+    def search(self):
+        if self.practice_id is None:
+            self.practices()
+        start = SEARCH_FROM + timedelta(days=self.rng.randrange(SEARCH_DAYS))
+        end = start + timedelta(days=self.rng.randint(0, 6))
+        payload = {'firstServiceDate': start.isoformat(), 'lastServiceDate': end.isoformat()}
+        if self.practice_id is not None:
+            payload['practiceId'] = str(self.practice_id)
+        self.call('claims search', 'POST', SEARCH_PATH, json=payload)
+
+    def bulk(self):
+        files = {'file': ('load_test.csv', io.BytesIO(self.test.csv_content.encode()), 'text/csv')}
+        response = self.call('bulk upload', 'POST', BULK_UPLOAD_PATH, files=files,
+                             data={'provider': 'uhc', 'use_batch_query': 'true'})
+        if response is None or response.status_code not in (200, 201):
+            return
+        job_id = response.json().get('id')
+        deadline = time.monotonic() + self.test.job_max_wait
+        while job_id and time.monotonic() < deadline and not self.stopping.is_set():
+            job = self.call('job poll', 'GET', CSV_JOB_PATH.format(job_id=job_id))
+            if job is None or job.status_code != 200 or job.json().get('status') in FINAL_STATUSES:
+                return
+            self.stopping.wait(self.test.poll_seconds)
+
+    def run(self):
+        flows, weights = zip(*self.test.weights.items())
+        while not self.stopping.is_set():
+            getattr(self, self.rng.choices(flows, weights)[0])()
+            self.stopping.wait(self.rng.uniform(*self.test.think_seconds))
+
+
+class LoadTest:
+    """
+    Drive `target` with virtual users following `profile`.
+
+    - auth: fetch(session, target) -> {'access_token', 'expires_in'}
+      (keycloak_login(...) or mock_login); one token is shared by all users
+    - weights: relative frequency of the 'practices' / 'search' / 'bulk' flows
+    - session_factory: makes each user's HTTP session (requests.Session)
+    """
+
+    def __init__(self, target, *, auth=mock_login, profile=PROFILES['smoke'], weights=FLOW_WEIGHTS,
+                 think_seconds=THINK_SECONDS, poll_seconds=POLL_SECONDS, job_max_wait=JOB_MAX_WAIT,
+                 request_timeout=REQUEST_TIMEOUT, csv_content=LOAD_CSV, session_factory=None, verify=True):
+        self.target = target.rstrip('/')
+        self.auth = auth
+        self.profile = profile
+        self.weights = {name: weight for name, weight in weights.items() if weight}
+        self.think_seconds = think_seconds
+        self.poll_seconds = poll_seconds
+        self.job_max_wait = job_max_wait
+        self.request_timeout = request_timeout
+        self.csv_content = csv_content
+        self.session_factory = session_factory or self._requests_session(verify)
+        self.broker = TokenBroker(LocalStore())
+        self.recorder = None
+        self.users = []
+
+    @staticmethod
+    def _requests_session(verify):
+        try:
+            import requests
+        except ImportError as e:
+            raise ImportError("LoadTest requires requests: pip install requests") from e
+
+        def factory():
+            session = requests.Session()
+            session.verify = verify
+            return session
+        return factory
+
+    def token(self, session, rejected=None):
+        def fetch():
+            started = time.monotonic()
+            try:
+                data = self.auth(session, self.target)
+            except Exception as e:
+                self.recorder.record('login', time.monotonic() - started, type(e).__name__, True)
+                raise
+            self.recorder.record('login', time.monotonic() - started, 200, False)
+            return data
+        return self.broker.get('load-test', fetch, rejected=rejected)
+
+    def _scale(self, users):
+        while len(self.users) < users:
+            user = VirtualUser(self, len(self.users) + 1)
+            self.users.append(user)
+            user.start()
+        while len(self.users) > users:
+            self.users.pop().stopping.set()
+
+    def run(self, tick=1.0, on_tick=None):
+        """Follow the profile to the end; returns the report dict"""
+        self.recorder = Recorder()
+        self.token(self.session_factory())
+        try:
+            while True:
+                elapsed = time.monotonic() - self.recorder.started
+                users = users_at(self.profile, elapsed)
+                if users is None:
+                    break
+                self._scale(users)
+                self.recorder.set_users(users)
+                if on_tick:
+                    on_tick(elapsed, users, self.recorder)
+                time.sleep(tick)
+        finally:
+            self._scale(0)
+        return self.report()
+
+    def report(self):
+        recorder = self.recorder
+        duration = max(1e-9, len(recorder.timeline) or time.monotonic() - recorder.started)
+        return {
+            'target': self.target,
+            'profile': self.profile,
+            'duration': round(duration, 1),
+            'endpoints': {name: stats.summary(duration)
+                          for name, stats in sorted(recorder.endpoints.items())},
+            'timeline': [{'second': i, 'users': s.users, 'requests': s.requests, 'errors': s.errors,
+                          'p95': round(percentile(s.latencies, 95), 3)}
+                         for i, s in enumerate(recorder.timeline)],
+            'ceiling': ceiling(recorder.timeline),
+        }
+
+
+def ceiling(timeline, p95_budget=P95_BUDGET, error_budget=ERROR_BUDGET, bands=LEVEL_BANDS):
+    """
+    Throughput, p95 and error rate per band of user counts (up to `bands`
+    bands, so each has enough requests to judge), and the highest band
+    reached before the first one that broke the p95 or error budget.
+    """
+    peak = max((second.users for second in timeline), default=0)
+    width = max(1, -(-peak // bands))
+    levels = {}
+    for second in timeline:
+        if second.users:
+            band = -(-second.users // width) * width
+            level = levels.setdefault(band, [0, Second(band)])
+            level[0] += 1
+            level[1].requests += second.requests
+            level[1].errors += second.errors
+            level[1].latencies.extend(second.latencies)
+    rows = []
+    sustainable, broken = None, False
+    for users in sorted(levels):
+        seconds, level = levels[users]
+        p95 = percentile(level.latencies, 95)
+        error_rate = level.errors / level.requests if level.requests else 0.0
+        ok = level.requests > 0 and p95 <= p95_budget and error_rate <= error_budget
+        broken = broken or not ok
+        if not broken:
+            sustainable = users
+        rows.append({'users': users, 'throughput': round(level.requests / seconds, 2),
+                     'p95': round(p95, 3), 'error_rate': round(error_rate, 4), 'ok': ok})
+    return {'levels': rows, 'sustainable_users': sustainable,
+            'p95_budget': p95_budget, 'error_budget': error_budget}
+
+
+def format_report(report, bar_width=30):
+    lines = [f"Target: {report['target']}   Duration: {report['duration']}s", '',
+             f"{'endpoint':<15} {'reqs':>6} {'req/s':>7} {'errors':>7} {'p50':>7} {'p95':>7} "
+             f"{'p99':>7} {'max':>7}  statuses"]
+    for name, s in report['endpoints'].items():
+        statuses = ' '.join(f"{code}:{n}" for code, n in s['statuses'].items())
+        lines.append(f"{name:<15} {s['requests']:>6} {s['throughput']:>7.2f} {s['error_rate']:>7.1%} "
+                     f"{s['p50']:>7.3f} {s['p95']:>7.3f} {s['p99']:>7.3f} {s['max']:>7.3f}  {statuses}")
+    for name, s in report['endpoints'].items():
+        lines += ['', f"{name} latency"]
+        peak = max(s['histogram'].values()) or 1
+        for bucket, n in s['histogram'].items():
+            lines.append(f"  {bucket:>8} {'#' * round(bar_width * n / peak):<{bar_width}} {n}")
+    result = report['ceiling']
+    lines += ['', f"{'users<=':>7} {'req/s':>7} {'p95':>7} {'errors':>7}"]
+    for level in result['levels']:
+        lines.append(f"{level['users']:>7} {level['throughput']:>7.2f} {level['p95']:>7.3f} "
+                     f"{level['error_rate']:>7.1%}  {'' if level['ok'] else 'over budget'}")
+    lines.append(f"Sustainable: up to {result['sustainable_users']} users "
+                 f"(p95 <= {result['p95_budget']:g}s, errors <= {result['error_budget']:.0%})")
+    return '\n'.join(lines)
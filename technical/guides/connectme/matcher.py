@@ -0,0 +1,286 @@
+"""
+Multi-key claim index for matching bulk-upload rows against a batch query
+
+batch_query_claims() builds {claimNumber: claim}, so CSV rows without a
+claim number (patient-only uploads, Scenario 1 in test_bulk_upload.py,
+test_bulk_upload_by_patient.py) cannot be matched and fall back to one
+ptntFn/ptntLn/ptntDob UHC call per patient. ClaimIndex indexes the batch
+result once, by:
+
+- claimNumber
+- (last name, first name, DOB), names normalised
+- subscriber ID
+- DOB (candidate block for the fuzzy fallback)
+- service-date interval
+
+so each row resolves locally with dictionary lookups. Matching goes
+claim number -> exact patient -> subscriber ID -> fuzzy name within the
+same DOB or subscriber, and is narrowed by the row's service dates when it
+has them. A row that gives a claim number is matched on it alone: a
+different claim for the same patient is not the claim the row asked for.
+
+Usage:
+    index = ClaimIndex(batch_result['claims'])
+    match = index.match(row)            # None, or Match(claim, method, score)
+    result = match_result(row_number, row, match)
+"""
+import bisect
+import difflib
+import re
+import unicodedata
+from dataclasses import dataclass
+
+from .bulk import failed_row
+from .dates import claim_service_date, parse_date
+
+FUZZY_THRESHOLD = 0.85
+
+
+def normalize_name(value):
+    """Upper-case, accents stripped, punctuation dropped: "O'Brien-Sá" -> 'OBRIEN SA'"""
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch)).upper()
+    value = re.sub(r"['.]", '', value)
+    return ' '.join(re.sub(r'[^A-Z ]', ' ', value).split())
+
+
+def normalize_id(value):
+    """Subscriber IDs appear with and without leading zeros"""
+    return re.sub(r'\D', '', str(value or '')).lstrip('0')
+
+
+def _date_or_none(value):
+    if not value:
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+@dataclass
+class PatientKey:
+    """Identity fields pulled from a claim or a CSV row"""
+    first: str = ''
+    last: str = ''
+    dob: object = None
+    subscriber_id: str = ''
+
+    @property
+    def exact(self):
+        return (self.last, self.first, self.dob)
+
+
+def claim_patient(claim):
+    """PatientKey for a UHC summary claim or a stored /claims/search/ result"""
+    member = claim.get('memberInfo') or {}
+    first = member.get('ptntFn') or claim.get('patientFirstName') or ''
+    last = member.get('ptntLn') or claim.get('patientLastName') or ''
+    if not (first or last) and isinstance(claim.get('patient'), str):
+        # Stored claims only carry "FIRST LAST"
+        parts = claim['patient'].split()
+        first, last = (parts[0], ' '.join(parts[1:])) if len(parts) > 1 else ('', claim['patient'])
+    return PatientKey(
+        first=normalize_name(first),
+        last=normalize_name(last),
+        dob=_date_or_none(member.get('ptntDob') or claim.get('patientDob')),
+        subscriber_id=normalize_id(member.get('subscriberId') or claim.get('subscriberId')),
+    )
+
+
+def row_patient(row):
+    """PatientKey for a bulk-upload CSV row"""
+    return PatientKey(
+        first=normalize_name(row.get('first_name')),
+        last=normalize_name(row.get('last_name')),
+        dob=_date_or_none(row.get('date_of_birth')),
+        subscriber_id=normalize_id(row.get('subscriber_id')),
+    )
+
+
+def claim_service_interval(claim):
+    """(first, last) service date of a claim, or None"""
+    summary = claim.get('claimSummary') or {}
+    first = claim_service_date(claim)
+    if first is None:
+        return None
+    last = _date_or_none(summary.get('lastSrvcDt') or claim.get('lastServiceDate')) or first
+    return first, max(first, last)
+
+
+def name_similarity(a, b):
+    """
+    0..1 similarity of two PatientKeys' names. Also tries first/last
+    swapped and the first given name alone (middle names dropped), both
+    common in practice-management exports.
+    """
+    def ratio(x, y):
+        if not x or not y:
+            return 0.0
+        return difflib.SequenceMatcher(None, x, y).ratio()
+
+    def first_token(name):
+        return name.split()[0] if name else ''
+
+    straight = 0.6 * ratio(a.last, b.last) + 0.4 * ratio(a.first, b.first)
+    swapped = 0.6 * ratio(a.last, b.first) + 0.4 * ratio(a.first, b.last)
+    given = 0.6 * ratio(a.last, b.last) + 0.4 * ratio(first_token(a.first), first_token(b.first))
+    return max(straight, swapped, given)
+
+
+@dataclass
+class Match:
+    """A claim chosen for a row, how it was found, and how sure we are (0..1)"""
+    claim: dict
+    method: str
+    score: float
+
+
+class ClaimIndex:
+    """In-memory indexes over one batch query result"""
+
+    def __init__(self, claims, fuzzy_threshold=FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.by_number = {}
+        self.by_patient = {}
+        self.by_subscriber = {}
+        self.by_dob = {}
+        self._patients = {}
+        self._intervals = {}
+        by_start = []
+        for claim in claims:
+            number = str(claim.get('claimNumber') or '').strip().upper()
+            if number:
+                self.by_number.setdefault(number, claim)
+            patient = claim_patient(claim)
+            self._patients[id(claim)] = patient
+            if patient.dob is not None:
+                self.by_patient.setdefault(patient.exact, []).append(claim)
+                self.by_dob.setdefault(patient.dob, []).append(claim)
+            if patient.subscriber_id:
+                self.by_subscriber.setdefault(patient.subscriber_id, []).append(claim)
+            interval = self._intervals[id(claim)] = claim_service_interval(claim)
+            if interval:
+                by_start.append((interval[0], interval[1], claim))
+        by_start.sort(key=lambda item: item[0])
+        self._by_start = by_start
+        self._starts = [start for start, _, _ in by_start]
+        self._max_span = max((end - start for start, end, _ in by_start), default=None)
+
+    def __len__(self):
+        return len(self.by_number)
+
+    def patient(self, claim):
+        return self._patients.get(id(claim)) or claim_patient(claim)
+
+    def _service_slice(self, first, last):
+        # Claims starting after `last` cannot overlap; nor can those starting
+        # more than the longest claim span before `first`
+        lo = bisect.bisect_left(self._starts, first - self._max_span)
+        return lo, bisect.bisect_right(self._starts, last)
+
+    def in_service_range(self, first, last):
+        """Claims whose service interval overlaps [first, last]"""
+        if not self._starts:
+            return []
+        first, last = parse_date(first), parse_date(last)
+        lo, hi = self._service_slice(first, last)
+        return [claim for _, end, claim in self._by_start[lo:hi] if end >= first]
+
+    def _row_interval(self, row):
+        first = _date_or_none(row.get('first_service_date'))
+        last = _date_or_none(row.get('last_service_date'))
+        if not (first or last):
+            return None
+        return first or last, last or first
+
+    def _narrow(self, claims, interval):
+        # Claims without service dates cannot be ruled out, so they stay
+        if interval is None:
+            return claims
+        first, last = interval
+        if self._starts:
+            lo, hi = self._service_slice(first, last)
+            if hi - lo < len(claims):
+                # The date index is the smaller side (a patient with a long history)
+                overlapping = {id(claim) for _, end, claim in self._by_start[lo:hi] if end >= first}
+                return [claim for claim in claims
+                        if id(claim) in overlapping or self._intervals[id(claim)] is None]
+        narrowed = []
+        for claim in claims:
+            span = self._intervals[id(claim)]
+            if span is None or (span[0] <= last and span[1] >= first):
+                narrowed.append(claim)
+        return narrowed
+
+    def _rank(self, claims):
+        # Most recent service first when one patient has several claims
+        return sorted(claims, key=lambda c: claim_service_date(c) or parse_date('1900-01-01'), reverse=True)
+
+    def match_all(self, row):
+        """Every acceptable claim for a row, best first, as Match objects"""
+        number = str(row.get('claim_number') or '').strip().upper()
+        if number:
+            claim = self.by_number.get(number)
+            return [Match(claim, 'claim_number', 1.0)] if claim else []
+
+        interval = self._row_interval(row)
+        patient = row_patient(row)
+        if patient.dob is not None:
+            exact = self._narrow(self.by_patient.get(patient.exact, []), interval)
+            if exact:
+                return [Match(claim, 'patient', 1.0) for claim in self._rank(exact)]
+        if patient.subscriber_id:
+            by_subscriber = [
+                claim for claim in self.by_subscriber.get(patient.subscriber_id, [])
+                if patient.dob is None or self.patient(claim).dob in (None, patient.dob)
+            ]
+            by_subscriber = self._narrow(by_subscriber, interval)
+            if by_subscriber:
+                return [Match(claim, 'subscriber', 0.95) for claim in self._rank(by_subscriber)]
+        return self._fuzzy(patient, interval)
+
+    def _fuzzy(self, patient, interval):
+        """Name similarity within the same DOB (or subscriber) block only"""
+        candidates = {}
+        for claim in self.by_dob.get(patient.dob, []) if patient.dob else []:
+            candidates[id(claim)] = claim
+        for claim in self.by_subscriber.get(patient.subscriber_id, []) if patient.subscriber_id else []:
+            candidates[id(claim)] = claim
+        scored = []
+        for claim in self._narrow(list(candidates.values()), interval):
+            score = name_similarity(patient, self.patient(claim))
+            if score >= self.fuzzy_threshold:
+                scored.append(Match(claim, 'fuzzy', round(score, 3)))
+        scored.sort(key=lambda m: (m.score, claim_service_date(m.claim) or parse_date('1900-01-01')), reverse=True)
+        return scored
+
+    def match(self, row):
+        """Best Match for a row, or None"""
+        matches = self.match_all(row)
+        return matches[0] if matches else None
+
+
+def match_result(row_number, row, match):
+    """Results-CSV row (bulk.RESULT_FIELDS) for a row and its Match (or None)"""
+    if match is None:
+        return failed_row(row_number, row, 'Claim not found')
+    claim = match.claim
+    summary = claim.get('claimSummary') or {}
+    patient = claim.get('patient')
+    if not isinstance(patient, str):
+        member = claim.get('memberInfo') or {}
+        patient = f"{member.get('ptntFn', '')} {member.get('ptntLn', '')}".strip()
+    return {
+        'row': row_number,
+        'claim_number': claim.get('claimNumber', ''),
+        'status': claim.get('status') or claim.get('claimStatus', ''),
+        'patient_name': patient,
+        'total_charged': claim.get('chargedAmount') or summary.get('totalChargedAmt', ''),
+        'total_paid': claim.get('paidAmount') or summary.get('totalPaidAmt', ''),
+        'processed_date': summary.get('processedDt', ''),
+        'success': True,
+        'error': '',
+        'match_method': match.method,
+        'match_score': match.score,
+    }
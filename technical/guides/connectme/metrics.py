@@ -0,0 +1,294 @@
+"""
+Prometheus metrics for the claims search and bulk-upload pipelines
+
+health_check_api() (monitoring_views.py) reports point-in-time DB / Celery /
+Redis / disk / memory status, which is enough to see that something is down
+but not that throughput dropped or that workers are saturated. This module
+keeps counters and histograms that a /metrics view renders in the
+Prometheus text format:
+
+    connectme_uhc_request_seconds{endpoint,status}   UHC call latency (histogram)
+    connectme_search_pages                           Summary pages per search (histogram)
+    connectme_csvjob_rows_total{result}              matched / unmatched / invalid rows
+    connectme_csvjob_match_ratio                     matched share per CSVJob (histogram)
+    connectme_celery_queue_depth{queue}              broker list length, read at scrape time
+    connectme_celery_task_seconds{task,state}        task runtime (histogram)
+    connectme_cache_lookups_total{result}            WindowCache day hits / misses
+
+gunicorn and Celery run many processes, so values are aggregated in process
+and flushed every FLUSH_SECONDS into one Redis hash (connectme:metrics) that
+the /metrics view reads - the same pattern as tracing.StageExporter. With
+no REDIS_URL, stores.default_store() keeps them in process.
+
+Usage:
+    from connectme import metrics
+    metrics.UHC_REQUEST_SECONDS.observe(0.42, endpoint='summary', status=200)
+
+    def metrics_view(request):                       # urls.py: path('metrics', metrics_view)
+        body = metrics.render(redis_from_url(), queues=('celery',))
+        return HttpResponse(body, content_type=metrics.CONTENT_TYPE)
+
+    metrics.connect_celery()                         # celery.py, after app.autodiscover_tasks()
+"""
+import abc
+import atexit
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from .stores import default_store, key, to_text
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_KEY = key('metrics')
+FLUSH_SECONDS = 5.0
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+RATIO_BUCKETS = (0.5, 0.75, 0.9, 0.95, 0.99, 1)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600)
+CELERY_QUEUES = ('celery',)
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(pairs):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def _number(value):
+    value = float(value)
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Registry:
+    """
+    Pending increments for this process, flushed to `store` at most every
+    flush_seconds (one HINCRBY / HINCRBYFLOAT per changed field)
+    """
+
+    def __init__(self, store=None, *, flush_seconds=FLUSH_SECONDS, clock=time.monotonic):
+        self.metrics = {}
+        self.flush_seconds = flush_seconds
+        self._store = store
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = clock()
+        atexit.register(self.flush)
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = default_store()
+        return self._store
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def add(self, increments):
+        """increments: [(field, amount), ...]; amounts are summed until the next flush"""
+        with self._lock:
+            for field_name, amount in increments:
+                self._pending[field_name] = self._pending.get(field_name, 0) + amount
+            due = self._clock() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write pending increments. Runs inline from searches and jobs, so a
+        store error is logged and the unwritten increments are kept for the
+        next flush - telemetry must never break the job it is measuring.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = self._clock()
+        written = 0
+        try:
+            store = self.store
+            for field_name, amount in pending.items():
+                if isinstance(amount, float):
+                    store.hincrbyfloat(METRICS_KEY, field_name, amount)
+                else:
+                    store.hincrby(METRICS_KEY, field_name, amount)
+                written += 1
+        except Exception as e:
+            unwritten = list(pending.items())[written:]
+            logger.warning("metrics flush failed, keeping %d pending fields: %s", len(unwritten), e)
+            with self._lock:
+                for field_name, amount in unwritten:
+                    self._pending[field_name] = self._pending.get(field_name, 0) + amount
+
+
+class Metric(abc.ABC):
+    """Base for Counter / Histogram / Gauge; subclasses render their own samples"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), *, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def _series(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return f"{self.name}|{_labels((name, labels[name]) for name in self.labelnames)}"
+
+    @abc.abstractmethod
+    def samples(self, fields):
+        """Prometheus sample lines from this metric's stored {suffix: {labels: value}}"""
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.add([(f"{self._series(labels)}|", amount)])
+
+    def samples(self, fields):
+        for labels, value in sorted(fields.get('', {}).items()):
+            yield f"{self.name}{{{labels}}} {_number(value)}" if labels else f"{self.name} {_number(value)}"
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), *, buckets=LATENCY_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry=registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        series = self._series(labels)
+        # Per-bucket (not cumulative) counts; render() accumulates them
+        self.registry.add([
+            (f"{series}|b{bisect_left(self.buckets, value)}", 1),
+            (f"{series}|sum", float(value)),
+            (f"{series}|count", 1),
+        ])
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, fields):
+        for labels in sorted(fields.get('count', {})):
+            prefix = f"{labels}," if labels else ''
+            seen = 0
+            for i, bound in enumerate(self.buckets + (float('inf'),)):
+                seen += int(float(fields.get(f'b{i}', {}).get(labels, 0)))
+                yield f'{self.name}_bucket{{{prefix}le="{_number(bound)}"}} {seen}'
+            suffix = f"{{{labels}}}" if labels else ''
+            yield f"{self.name}_sum{suffix} {_number(fields.get('sum', {}).get(labels, 0))}"
+            yield f"{self.name}_count{suffix} {_number(fields['count'][labels])}"
+
+
+class Gauge(Metric):
+    """Set at scrape time by render(); not aggregated across processes"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), *, registry=None):
+        super().__init__(name, documentation, labelnames, registry=registry)
+        self.values = {}
+
+    def set(self, value, **labels):
+        self.values[self._series(labels).partition('|')[2]] = value
+
+    def samples(self, fields):
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{{{labels}}} {_number(value)}" if labels else f"{self.name} {_number(value)}"
+
+
+REGISTRY = Registry()
+
+UHC_REQUEST_SECONDS = Histogram(
+    'connectme_uhc_request_seconds', 'UHC API call latency including retries and hedges',
+    ('endpoint', 'status'))
+SEARCH_PAGES = Histogram(
+    'connectme_search_pages', 'UHC Summary pages fetched per search', buckets=PAGE_BUCKETS)
+CSVJOB_ROWS = Counter(
+    'connectme_csvjob_rows_total', 'Bulk-upload rows processed, by outcome (matched, unmatched, invalid)',
+    ('result',))
+CSVJOB_MATCH_RATIO = Histogram(
+    'connectme_csvjob_match_ratio', 'Share of rows matched per CSV job', buckets=RATIO_BUCKETS)
+CELERY_QUEUE_DEPTH = Gauge(
+    'connectme_celery_queue_depth', 'Messages waiting in the Celery broker queue', ('queue',))
+CELERY_TASK_SECONDS = Histogram(
+    'connectme_celery_task_seconds', 'Celery task runtime', ('task', 'state'), buckets=TASK_BUCKETS)
+CACHE_LOOKUPS = Counter(
+    'connectme_cache_lookups_total', 'Search cache day lookups, by result (hit, miss)', ('result',))
+
+
+def read_fields(store):
+    """{metric: {suffix: {labels: value}}} from the shared hash"""
+    parsed = {}
+    for raw_field, value in store.hgetall(METRICS_KEY).items():
+        name, _, rest = to_text(raw_field).partition('|')
+        labels, _, suffix = rest.rpartition('|')
+        parsed.setdefault(name, {}).setdefault(suffix, {})[labels] = to_text(value)
+    return parsed
+
+
+def queue_depth(broker, queues=CELERY_QUEUES):
+    """Set CELERY_QUEUE_DEPTH from LLEN on the Redis broker's queue lists"""
+    for queue in queues:
+        CELERY_QUEUE_DEPTH.set(broker.llen(queue), queue=queue)
+
+
+def render(store=None, *, registry=None, broker=None, queues=CELERY_QUEUES):
+    """
+    Prometheus text exposition of every process's metrics. This process's
+    pending increments are flushed first; `broker` (default: `store`) is
+    where the Celery queue depth is read.
+    """
+    registry = registry or REGISTRY
+    store = store if store is not None else registry.store
+    registry.flush()
+    if queues:
+        queue_depth(broker if broker is not None else store, queues)
+    fields = read_fields(store)
+    lines = []
+    for metric in registry.metrics.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples(fields.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+def record_job(stats):
+    """CSVJOB_MATCH_RATIO for a finished job (ingest.IngestStats)"""
+    if stats.rows:
+        CSVJOB_MATCH_RATIO.observe(stats.success_count / stats.rows)
+
+
+def connect_celery():
+    """Time every Celery task via task_prerun / task_postrun signals"""
+    try:
+        from celery import signals
+    except ImportError as e:
+        raise ImportError("connect_celery requires celery: pip install celery") from e
+    started = {}
+
+    def prerun(task_id=None, **kwargs):
+        started[task_id] = time.perf_counter()
+
+    def postrun(task_id=None, task=None, state=None, **kwargs):
+        began = started.pop(task_id, None)
+        if began is not None:
+            CELERY_TASK_SECONDS.observe(time.perf_counter() - began, task=task.name, state=state or 'UNKNOWN')
+        REGISTRY.flush()
+
+    signals.task_prerun.connect(prerun, weak=False)
+    signals.task_postrun.connect(postrun, weak=False)
@@ -0,0 +1,97 @@
+"""
+Streaming pagination over UHC Summary API pages
+
+The backend used to loop over every transactionId page (up to 500 claims)
+and buffer them all before the status filter ran (TEST_PAGINATION_FIX.md).
+These generators yield page by page instead, so the status filter runs as a
+streaming stage and callers can stop as soon as they have what they need -
+no further pages are requested once iteration stops.
+
+Server side (api_views.search_claims / batch_query_claims):
+
+    def fetch_page(transaction_id):
+        response = uhc_client.get_claims_summary(params, transaction_id=transaction_id)
+        return response.get('claims', []), response.get('transactionId')
+
+    for claim in filter_status(iter_claims(iter_summary_pages(fetch_page)), 'DENIED'):
+        ...
+
+Client side, ClaimsClient.iter_search() follows the same page chain
+through /claims/search/ (see client.py).
+"""
+from .metrics import SEARCH_PAGES
+from .tracing import span
+
+PAGE_SIZE = 50
+MAX_CLAIMS = 500
+
+
+def iter_summary_pages(fetch_page, max_claims=MAX_CLAIMS):
+    """
+    Yield lists of claims, one per Summary API page.
+
+    fetch_page(transaction_id) -> (claims, next_transaction_id); it is called
+    with None for the first page. Paging stops when no next transactionId is
+    returned or max_claims have been yielded.
+    """
+    transaction_id = None
+    fetched = 0
+    page = 0
+    try:
+        while True:
+            page += 1
+            with span('uhc.summary.page', page=page) as current:
+                claims, next_transaction_id = fetch_page(transaction_id)
+                current.set(claims=len(claims))
+            fetched += len(claims)
+            yield claims
+            if not next_transaction_id or fetched >= max_claims:
+                return
+            transaction_id = next_transaction_id
+    finally:
+        SEARCH_PAGES.observe(page)
+
+
+async def aiter_summary_pages(fetch_page, max_claims=MAX_CLAIMS):
+    """Async twin of iter_summary_pages(); fetch_page is a coroutine function"""
+    transaction_id = None
+    fetched = 0
+    page = 0
+    try:
+        while True:
+            page += 1
+            with span('uhc.summary.page', page=page) as current:
+                claims, next_transaction_id = await fetch_page(transaction_id)
+                current.set(claims=len(claims))
+            fetched += len(claims)
+            yield claims
+            if not next_transaction_id or fetched >= max_claims:
+                return
+            transaction_id = next_transaction_id
+    finally:
+        SEARCH_PAGES.observe(page)
+
+
+def iter_claims(pages):
+    """Flatten a page iterator into individual claims"""
+    for page in pages:
+        yield from page
+
+
+def status_matches(claim, status_filter):
+    """Case-insensitive statusFilter check (None/'' matches everything)"""
+    return not status_filter or str(claim.get('status', '')).upper() == status_filter.upper()
+
+
+def filter_status(claims, status_filter):
+    """Streaming statusFilter stage"""
+    for claim in claims:
+        if status_matches(claim, status_filter):
+            yield claim
+
+
+async def afilter_status(claims, status_filter):
+    """Async streaming statusFilter stage"""
+    async for claim in claims:
+        if status_matches(claim, status_filter):
+            yield claim
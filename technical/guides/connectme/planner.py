@@ -0,0 +1,225 @@
+"""
+Service-date query planner
+
+Turns any requested range into the fewest API-legal /claims/search/ windows:
+
+- each window spans at most 90 days (UHC Summary API limit)
+- nothing older than 24 months or later than today is requested
+  (see 4_EDGE_CASES.md, sections 1.1-1.3)
+
+fetch_range() executes a plan and splits adaptively: a window that comes
+back with the pagination cap (500 claims, TEST_PAGINATION_FIX.md) may have
+been truncated, so it is bisected and re-fetched until every window is
+under the cap or down to a single day.
+
+cluster_ranges() plans bulk-upload batch queries: instead of one span
+from the CSV's earliest to latest service date (padded by 7 days,
+HOW_CLAIMS_ARE_QUERIED.md), rows' service dates are clustered into a few
+tight windows, and the gaps between clusters are never downloaded.
+
+Usage:
+    windows = plan_windows('2024-01-01', '2025-06-30')
+    claims, report = await fetch_range(client, '2024-01-01', '2025-06-30', practice_id=1)
+    ranges = cluster_ranges(csv_service_ranges(rows, job.start_date, job.end_date))
+"""
+import asyncio
+import calendar
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from .dates import MAX_WINDOW_DAYS, claim_key, iso, parse_date
+
+LOOKBACK_MONTHS = 24
+PAGE_CAP = 500
+# Range clustering: days added around each row, gaps short enough to
+# query through rather than pay for another call, and a cap on windows
+CLUSTER_PAD_DAYS = 2
+CLUSTER_MERGE_GAP_DAYS = 7
+MAX_CLUSTERS = 12
+
+
+def months_before(day, months):
+    """Same calendar day `months` earlier, clamped to the end of shorter months"""
+    month_index = day.year * 12 + day.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def earliest_service_date(today=None):
+    """Oldest service date UHC will answer for (LCLM_PS_107 beyond this)"""
+    return months_before(today or date.today(), LOOKBACK_MONTHS)
+
+
+def month_window(month):
+    """(first day, last day) of a YYYY-MM month"""
+    year, mon = (int(part) for part in month.split('-'))
+    return date(year, mon, 1), date(year, mon, calendar.monthrange(year, mon)[1])
+
+
+def split_range(start, end, max_days=MAX_WINDOW_DAYS):
+    """
+    Split [start, end] into ceil(days / max_days) contiguous windows of
+    near-equal length (no window longer than max_days).
+    """
+    start, end = parse_date(start), parse_date(end)
+    if end < start:
+        return []
+    total = (end - start).days + 1
+    count = -(-total // max_days)
+    base, extra = divmod(total, count)
+    windows = []
+    for i in range(count):
+        length = base + (1 if i < extra else 0)
+        window_end = start + timedelta(days=length - 1)
+        windows.append((start, window_end))
+        start = window_end + timedelta(days=1)
+    return windows
+
+
+def plan_windows(start, end, *, today=None, max_days=MAX_WINDOW_DAYS):
+    """
+    API-legal windows covering [start, end], clamped to the 24-month
+    lookback and to today. Raises ValueError when nothing is left to query.
+    """
+    today = today or date.today()
+    start, end = parse_date(start), parse_date(end)
+    if end < start:
+        raise ValueError(f"Range ends before it starts: {iso(start)} to {iso(end)}")
+    clamped_start = max(start, earliest_service_date(today))
+    clamped_end = min(end, today)
+    if clamped_end < clamped_start:
+        raise ValueError(
+            f"{iso(start)} to {iso(end)} is outside the queryable range "
+            f"({iso(earliest_service_date(today))} to {iso(today)})"
+        )
+    return split_range(clamped_start, clamped_end, max_days)
+
+
+def trailing_windows(count=None, *, today=None, max_days=MAX_WINDOW_DAYS):
+    """
+    Back-to-back max_days windows ending today, newest first, stopping at
+    the 24-month lookback. `count` limits how many are returned.
+    """
+    today = today or date.today()
+    earliest = earliest_service_date(today)
+    windows = []
+    end = today
+    while end >= earliest and (count is None or len(windows) < count):
+        start = max(end - timedelta(days=max_days - 1), earliest)
+        windows.append((start, end))
+        end = start - timedelta(days=1)
+    return windows
+
+
+def csv_service_ranges(rows, default_start=None, default_end=None):
+    """
+    (first, last) service dates of CSV rows. Rows without dates (or with
+    unreadable ones) fall back to the job's default range when given.
+    """
+    ranges = []
+    for row in rows:
+        first = row.get('first_service_date') or row.get('last_service_date')
+        last = row.get('last_service_date') or first
+        try:
+            first, last = parse_date(first), parse_date(last)
+        except (TypeError, ValueError, AttributeError):
+            if default_start and default_end:
+                ranges.append((parse_date(default_start), parse_date(default_end)))
+            continue
+        ranges.append((min(first, last), max(first, last)))
+    return ranges
+
+
+@dataclass
+class RangePlan:
+    """Windows to query for a set of service-date ranges"""
+    windows: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+
+    @property
+    def days(self):
+        return sum((end - start).days + 1 for start, end in self.windows)
+
+
+def cluster_ranges(ranges, *, pad_days=CLUSTER_PAD_DAYS, merge_gap_days=CLUSTER_MERGE_GAP_DAYS,
+                   max_windows=MAX_CLUSTERS, today=None, max_days=MAX_WINDOW_DAYS):
+    """
+    Cluster (first, last) ranges into a small set of tight, API-legal windows.
+
+    1. pad every range by pad_days and merge the ones that overlap
+    2. merge neighbours whose gap is at most merge_gap_days
+    3. while there are more than max_windows clusters, merge across the
+       smallest remaining gap
+    4. clamp each cluster to the 24-month lookback / today and split it
+       into <= max_days windows
+
+    Clusters entirely outside the queryable range go to plan.skipped
+    rather than failing the whole job.
+    """
+    pad = timedelta(days=pad_days)
+    clusters = []
+    for start, end in sorted((parse_date(s) - pad, parse_date(e) + pad) for s, e in ranges):
+        if clusters and (start - clusters[-1][1]).days - 1 <= merge_gap_days:
+            clusters[-1][1] = max(clusters[-1][1], end)
+        else:
+            clusters.append([start, end])
+    while len(clusters) > max(max_windows, 1):
+        gaps = [(clusters[i + 1][0] - clusters[i][1], i) for i in range(len(clusters) - 1)]
+        _, i = min(gaps)
+        clusters[i][1] = max(clusters[i][1], clusters.pop(i + 1)[1])
+
+    plan = RangePlan()
+    for start, end in clusters:
+        try:
+            plan.windows.extend(plan_windows(start, end, today=today, max_days=max_days))
+        except ValueError:
+            plan.skipped.append((start, end))
+    return plan
+
+
+@dataclass
+class FetchReport:
+    """What fetch_range() actually sent, and where results may be incomplete"""
+    windows: list = field(default_factory=list)
+    splits: int = 0
+    truncated: list = field(default_factory=list)
+
+    @property
+    def calls(self):
+        return len(self.windows)
+
+
+async def fetch_range(client, start, end, *, page_cap=PAGE_CAP, today=None, **filters):
+    """
+    Fetch every claim in [start, end]. Windows returning `page_cap` or more
+    claims are bisected and re-fetched; a single day that still hits the cap
+    is kept as-is and listed in report.truncated rather than dropped silently.
+
+    Returns (claims, FetchReport), claims de-duplicated by dates.claim_key
+    (claimNumber, or a content hash for claims without one).
+    """
+    report = FetchReport()
+    claims = {}
+
+    async def fetch(window_start, window_end):
+        results = await client.search(iso(window_start), iso(window_end), **filters)
+        report.windows.append((window_start, window_end))
+        if len(results) >= page_cap:
+            if window_start == window_end:
+                report.truncated.append(window_start)
+            else:
+                report.splits += 1
+                middle = window_start + (window_end - window_start) // 2
+                await asyncio.gather(
+                    fetch(window_start, middle),
+                    fetch(middle + timedelta(days=1), window_end),
+                )
+                return
+        for claim in results:
+            claims.setdefault(claim_key(claim), claim)
+
+    await asyncio.gather(
+        *(fetch(s, e) for s, e in plan_windows(start, end, today=today))
+    )
+    return list(claims.values()), report
@@ -0,0 +1,172 @@
+"""
+Batched CSVJob progress and Redis-backed cancellation
+
+process_csv_file used to save processed_rows / success_count /
+failure_count after every row and call job.refresh_from_db() every 5 rows
+to notice a cancel (9_BULK_UPLOAD_FIXES_AND_MONITORING.md) - two Postgres
+round trips per few rows, for every running job.
+
+- JobProgress counts in memory and hands all counters to one flush
+  callback (a single UPDATE) once `every_rows` rows or `every_seconds`
+  have passed, and always at the end
+- each flush also mirrors the counters into a Redis hash, so the
+  /csv-jobs/{id}/ view that pollers hit every 3s can answer from Redis
+- CancelFlag is a Redis key set by the cancel endpoint; the task checks
+  it with one EXISTS, throttled to `check_every_seconds`
+
+Usage (inside the Celery task):
+    def save(fields):
+        CSVJob.objects.filter(pk=job.pk).update(**fields)
+
+    cancel = CancelFlag(store, job.id)
+    progress = JobProgress(save, store=store, job_id=job.id, total_rows=total)
+    for row in rows:
+        cancel.raise_if_set()
+        progress.record(success=process(row))
+    progress.flush()
+"""
+import time
+
+from .stores import key, to_text
+from .tracing import span
+
+PROGRESS_FIELDS = ['processed_rows', 'success_count', 'failure_count']
+FLUSH_EVERY_ROWS = 200
+FLUSH_EVERY_SECONDS = 2.0
+CANCEL_CHECK_SECONDS = 1.0
+KEY_TTL = 24 * 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside the task once the job's cancel flag is set"""
+
+
+def progress_key(job_id):
+    return key('csvjob', job_id, 'progress')
+
+
+def cancel_key(job_id):
+    return key('csvjob', job_id, 'cancel')
+
+
+class JobProgress:
+    """In-memory CSVJob counters flushed on a row/time budget"""
+
+    def __init__(self, flush, *, store=None, job_id=None, total_rows=None,
+                 every_rows=FLUSH_EVERY_ROWS, every_seconds=FLUSH_EVERY_SECONDS,
+                 publisher=None, clock=time.monotonic):
+        self._flush = flush
+        self.publisher = publisher
+        self.store = store
+        self.job_id = job_id
+        self.total_rows = total_rows
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self._clock = clock
+        self.processed_rows = 0
+        self.success_count = 0
+        self.failure_count = 0
+        self.flushes = 0
+        self._unflushed = 0
+        self._last_flush = clock()
+
+    def fields(self):
+        return {name: getattr(self, name) for name in PROGRESS_FIELDS}
+
+    def record(self, success, rows=1):
+        """Count `rows` finished rows, flushing if the budget is spent"""
+        self.processed_rows += rows
+        if success:
+            self.success_count += rows
+        else:
+            self.failure_count += rows
+        self._unflushed += rows
+        self._changed()
+
+    def update(self, stats):
+        """Take absolute totals from ingest.IngestStats (stream_csv_job's on_chunk)"""
+        added = stats.rows - self.processed_rows
+        self.processed_rows = stats.rows
+        self.success_count = stats.success_count
+        self.failure_count = stats.failure_count
+        self._unflushed += added
+        self._changed()
+
+    def _changed(self):
+        # Push subscribers get (throttled) live counters between DB flushes
+        if self.publisher is not None:
+            self.publisher.progress(self.fields())
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if not self._unflushed:
+            return False
+        if self._unflushed >= self.every_rows or self._clock() - self._last_flush >= self.every_seconds:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Write the counters now (one UPDATE plus one HSET)"""
+        fields = self.fields()
+        with span('db.progress_flush', job_id=self.job_id, rows=fields.get('processed_rows')):
+            self._flush(fields)
+            if self.store is not None and self.job_id is not None:
+                snapshot = dict(fields, updated_at=time.time())
+                if self.total_rows is not None:
+                    snapshot['total_rows'] = self.total_rows
+                self.store.hset(progress_key(self.job_id), mapping=snapshot)
+                self.store.expire(progress_key(self.job_id), KEY_TTL)
+        self.flushes += 1
+        self._unflushed = 0
+        self._last_flush = self._clock()
+
+
+def read_progress(store, job_id):
+    """
+    Latest flushed counters for a job from Redis, as ints, or {} if the job
+    has not flushed yet (the view then falls back to the CSVJob row).
+    """
+    raw = store.hgetall(progress_key(job_id))
+    progress = {}
+    for name, value in raw.items():
+        name, value = to_text(name), to_text(value)
+        progress[name] = float(value) if name == 'updated_at' else int(value)
+    return progress
+
+
+class CancelFlag:
+    """Per-job cancel request stored as a Redis key"""
+
+    def __init__(self, store, job_id, *, check_every_seconds=CANCEL_CHECK_SECONDS,
+                 clock=time.monotonic):
+        self.store = store
+        self.key = cancel_key(job_id)
+        self.check_every_seconds = check_every_seconds
+        self._clock = clock
+        self._last_check = None
+        self._cancelled = False
+        self.checks = 0
+
+    def request(self):
+        """Called by the cancel endpoint alongside status='CANCELLING'"""
+        self.store.set(self.key, 1, ex=KEY_TTL)
+
+    def clear(self):
+        self.store.delete(self.key)
+
+    def is_set(self):
+        """EXISTS at most once per check_every_seconds; sticky once seen"""
+        if self._cancelled:
+            return True
+        now = self._clock()
+        if self._last_check is not None and now - self._last_check < self.check_every_seconds:
+            return False
+        self._last_check = now
+        self.checks += 1
+        self._cancelled = bool(self.store.exists(self.key))
+        return self._cancelled
+
+    def raise_if_set(self):
+        if self.is_set():
+            raise JobCancelled("Job cancelled by user")
@@ -0,0 +1,236 @@
+"""
+Adaptive token-bucket rate limiting for outbound UHC calls
+
+Bulk jobs, interactive searches and scripts all call UHC per TIN and
+window with no shared throttle, so parallel jobs push a practice's
+credentials into 429s and every worker retries at once. RateLimiter keeps
+one token bucket per key (credential / TIN / payer) in Redis, so every
+process draws from the same budget, and adapts it (AIMD):
+
+- 429 or 5xx: the rate is halved (down to `min_rate`) and the bucket is
+  closed for Retry-After seconds when UHC sends one
+- success: the rate creeps back up by `increase` per second of success,
+  up to `max_rate`
+
+Without Redis (LocalStore or no store) the same buckets live in-process.
+
+Usage:
+    limiter = RateLimiter(redis_from_url(), rate=5, burst=10)
+    bucket = f'uhc:{credential.tin}:{payer_id}'
+    limiter.acquire(bucket)
+    response = requests.get(url, headers=headers, timeout=60)
+    limiter.report(bucket, response.status_code, response.headers.get('Retry-After'))
+
+    limiter.budget(bucket)   # {'rate': 3.5, 'tokens': 1.2, 'blocked_for': 0.0}
+
+resilience.Endpoint(limiter=...) does the acquire / report around each of
+its attempts; the shared resilience.ENDPOINTS use one limiter.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+
+from .stores import key
+
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+MIN_RATE = 0.5
+MAX_RATE = 20.0
+INCREASE_PER_SECOND = 0.5
+BACKOFF_FACTOR = 0.5
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+BUCKET_TTL = 3600
+
+# KEYS[1] bucket hash; ARGV: default rate, burst, ttl. Returns seconds to wait (0 = granted).
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate', 'blocked_until')
+local rate = tonumber(b[3]) or tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+local blocked = tonumber(b[4]) or 0
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if now < blocked then
+  wait = blocked - now
+elseif tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'rate', rate)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return tostring(wait)
+"""
+
+# KEYS[1] bucket hash; ARGV: throttled (0/1), retry_after, default rate, min, max, increase, factor, ttl
+REPORT_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'rate', 'last_report')
+local rate = tonumber(b[1]) or tonumber(ARGV[3])
+local last = tonumber(b[2]) or now
+if ARGV[1] == '1' then
+  rate = math.max(tonumber(ARGV[4]), rate * tonumber(ARGV[7]))
+  local retry_after = tonumber(ARGV[2]) or 0
+  if retry_after > 0 then
+    redis.call('HSET', KEYS[1], 'blocked_until', now + retry_after)
+  end
+else
+  rate = math.min(tonumber(ARGV[5]), rate + tonumber(ARGV[6]) * math.min(1, now - last))
+end
+redis.call('HSET', KEYS[1], 'rate', rate, 'last_report', now)
+redis.call('EXPIRE', KEYS[1], ARGV[8])
+return tostring(rate)
+"""
+
+
+class RateLimitTimeout(Exception):
+    """acquire() could not get a token within its timeout"""
+
+
+@dataclass
+class _Bucket:
+    rate: float
+    tokens: float
+    ts: float
+    blocked_until: float = 0.0
+    last_report: float = None
+
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RateLimiter:
+    """Per-key adaptive token buckets shared through Redis (or in-process)"""
+
+    def __init__(self, store=None, *, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=MIN_RATE,
+                 max_rate=MAX_RATE, increase=INCREASE_PER_SECOND, backoff=BACKOFF_FACTOR,
+                 clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.backoff = backoff
+        self._clock = clock
+        self._redis = store if hasattr(store, 'register_script') else None
+        if self._redis is not None:
+            self._acquire_script = self._redis.register_script(ACQUIRE_SCRIPT)
+            self._report_script = self._redis.register_script(REPORT_SCRIPT)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    # --- one attempt ---------------------------------------------------
+
+    def try_acquire(self, name):
+        """Take a token if one is available; returns seconds to wait (0 = granted)"""
+        if self._redis is not None:
+            return float(self._acquire_script(
+                keys=[key('ratelimit', name)], args=[self.rate, self.burst, BUCKET_TTL]))
+        with self._lock:
+            now = self._clock()
+            bucket = self._buckets.setdefault(name, _Bucket(self.rate, self.burst, now))
+            bucket.tokens = min(self.burst, bucket.tokens + max(0.0, now - bucket.ts) * bucket.rate)
+            bucket.ts = now
+            if now < bucket.blocked_until:
+                return bucket.blocked_until - now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / bucket.rate
+
+    def acquire(self, name, timeout=None):
+        """Block until a token for `name` is granted"""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self.try_acquire(name)
+            if wait <= 0:
+                return
+            if deadline is not None and self._clock() + wait > deadline:
+                raise RateLimitTimeout(f"No UHC budget for {name} within {timeout}s")
+            time.sleep(wait)
+
+    async def aacquire(self, name, timeout=None):
+        """acquire() for asyncio callers"""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self.try_acquire(name)
+            if wait <= 0:
+                return
+            if deadline is not None and self._clock() + wait > deadline:
+                raise RateLimitTimeout(f"No UHC budget for {name} within {timeout}s")
+            await asyncio.sleep(wait)
+
+    # --- feedback --------------------------------------------------------
+
+    def report(self, name, status_code, retry_after=None):
+        """Adapt the rate for `name` to a UHC response status; returns the new rate"""
+        throttled = status_code in THROTTLE_STATUSES
+        if throttled:
+            self.throttled += 1
+        retry_after = _parse_retry_after(retry_after)
+        if self._redis is not None:
+            return float(self._report_script(
+                keys=[key('ratelimit', name)],
+                args=[1 if throttled else 0, retry_after, self.rate, self.min_rate,
+                      self.max_rate, self.increase, self.backoff, BUCKET_TTL],
+            ))
+        with self._lock:
+            now = self._clock()
+            bucket = self._buckets.setdefault(name, _Bucket(self.rate, self.burst, now))
+            if throttled:
+                bucket.rate = max(self.min_rate, bucket.rate * self.backoff)
+                if retry_after:
+                    bucket.blocked_until = now + retry_after
+            else:
+                elapsed = min(1.0, now - bucket.last_report) if bucket.last_report is not None else 0.0
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase * elapsed)
+            bucket.last_report = now
+            return bucket.rate
+
+    def budget(self, name):
+        """Current rate (calls/s), tokens available and seconds still blocked for `name`"""
+        if self._redis is not None:
+            raw = self._redis.hgetall(key('ratelimit', name))
+            fields = {k.decode() if isinstance(k, bytes) else k: float(v) for k, v in raw.items()}
+            # The scripts stamp ts / blocked_until with Redis TIME; read with the same clock
+            seconds, microseconds = self._redis.time()
+            now = seconds + microseconds / 1e6
+            rate = fields.get('rate', self.rate)
+            tokens = min(self.burst, fields.get('tokens', self.burst)
+                         + max(0.0, now - fields.get('ts', now)) * rate)
+            blocked = fields.get('blocked_until', 0.0) - now
+        else:
+            with self._lock:
+                now = self._clock()
+                bucket = self._buckets.get(name) or _Bucket(self.rate, self.burst, now)
+                rate = bucket.rate
+                tokens = min(self.burst, bucket.tokens + max(0.0, now - bucket.ts) * rate)
+                blocked = bucket.blocked_until - now
+        return {'rate': round(rate, 3), 'tokens': round(tokens, 3), 'blocked_for': round(max(0.0, blocked), 3)}
+
+    def call(self, name, func, *args, acquire_timeout=None, **kwargs):
+        """
+        acquire(), run func, and report its outcome. func returns a response
+        with .status_code (and optionally .headers['Retry-After']); an
+        exception counts as a 5xx. Other keyword arguments (e.g. the
+        request's own timeout) are passed through to func.
+        """
+        self.acquire(name, timeout=acquire_timeout)
+        try:
+            response = func(*args, **kwargs)
+        except Exception:
+            self.report(name, 503)
+            raise
+        headers = getattr(response, 'headers', None) or {}
+        self.report(name, response.status_code, headers.get('Retry-After'))
+        return response
@@ -0,0 +1,446 @@
+"""
+Batch payment reconciliation in exact cents
+
+PaymentReconciliation.tsx reconciles one claim per render in the browser
+(6_PAYMENT_RECONCILIATION.md): buildSuffixToDraftMap, line items summed per
+ICN suffix with parseFloat, each sum compared with its draft's draftAmt
+within a tolerance, then the global line / draft / totalPaidAmt tally. A
+month-end report for a TIN means re-running that for thousands of claims.
+
+Here a batch of claims is flattened once into columns - one row per line
+item, crosswalk entry and payment, with amounts as int64 cents parsed by
+Decimal - and every step is an array operation over the whole batch:
+suffix groups and claim totals are sorted int64 group sums, crosswalk and
+draft lookups are searchsorted joins. Amounts compare exactly, so a
+$0.01 short payment is a mismatch rather than rounding noise. Results go
+to a ReconciliationStore (SQLite, like cache.WindowCache) so the UI reads
+each claim's status and proof table instead of recomputing them.
+
+Requires numpy (pip install numpy).
+
+Usage:
+    result = reconcile(claims)                  # enriched claims: lineItems, payments, claimSummary
+    result.rows()                               # per-claim status, totals and per-suffix proof
+
+    store = ReconciliationStore()
+    reconcile_batches(claims, store, tin='854203105')
+    store.get('FK00000042')                     # what the UI renders
+    store.check('31064834')                     # claims and drafts on a check, and whether it balances
+    store.report('854203105', '2025-07-01', '2025-07-31')
+"""
+import json
+import os
+import sqlite3
+import time
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from pathlib import Path
+
+from .dates import claim_service_date, iso
+from .ingest import iter_chunks
+
+DEFAULT_STORE_PATH = Path(
+    os.environ.get('CONNECTME_RECONCILIATION_PATH',
+                   Path.home() / '.cache' / 'connectme' / 'reconciliation.sqlite3')
+)
+BATCH_CLAIMS = 5000
+UNMAPPED = 'UNMAPPED'
+
+# Suffix and claim statuses; codes index STATUSES
+MATCHED, MISMATCH, UNMAPPED_LINES, NO_DRAFT = range(4)
+STATUSES = ('MATCHED', 'MISMATCH', 'UNMAPPED', 'NO_DRAFT')
+
+# Check rollup statuses: BALANCED when checkAmt == the drafts stored for it ==
+# the line items mapped to those drafts; PARTIAL when the drafts fall short
+# of checkAmt (claims on the check not queried yet) but match their lines;
+# UNMAPPED when lines and drafts differ only because a multi-draft claim on
+# the check has suffixes missing from its crosswalk
+CHECK_ROLLUP_SQL = """
+INSERT INTO check_rollups
+SELECT check_number, MAX(tin), MAX(check_cents), SUM(draft_cents), SUM(linked_paid_cents),
+       COUNT(DISTINCT claim_number), COUNT(DISTINCT draft_number),
+       CASE WHEN SUM(draft_cents) > MAX(check_cents) THEN 'MISMATCH'
+            WHEN SUM(linked_paid_cents) != SUM(draft_cents) THEN
+                CASE WHEN MAX(claim_number IN (SELECT claim_number FROM claim_reconciliation
+                                               WHERE status = 'UNMAPPED'))
+                     THEN 'UNMAPPED' ELSE 'MISMATCH' END
+            WHEN SUM(draft_cents) < MAX(check_cents) THEN 'PARTIAL'
+            ELSE 'BALANCED' END,
+       ?
+FROM check_drafts WHERE check_number IN (SELECT check_number FROM affected_checks)
+GROUP BY check_number
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claim_reconciliation (
+    claim_number              TEXT PRIMARY KEY,
+    tin                       TEXT,
+    service_date              TEXT,
+    status                    TEXT NOT NULL,
+    line_items_cents          INTEGER NOT NULL,
+    drafts_cents              INTEGER NOT NULL,
+    summary_cents             INTEGER NOT NULL,
+    multi_claim_excess_cents  INTEGER NOT NULL,
+    proof                     TEXT NOT NULL,
+    reconciled_at             REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS claim_reconciliation_tin
+    ON claim_reconciliation (tin, service_date, status);
+CREATE TABLE IF NOT EXISTS check_drafts (
+    check_number       TEXT NOT NULL,
+    draft_number       TEXT NOT NULL,
+    claim_number       TEXT NOT NULL,
+    tin                TEXT,
+    check_cents        INTEGER NOT NULL,
+    draft_cents        INTEGER NOT NULL,
+    linked_paid_cents  INTEGER NOT NULL,
+    PRIMARY KEY (check_number, draft_number, claim_number)
+);
+CREATE INDEX IF NOT EXISTS check_drafts_claim ON check_drafts (claim_number);
+CREATE INDEX IF NOT EXISTS check_drafts_draft ON check_drafts (draft_number);
+CREATE TABLE IF NOT EXISTS check_rollups (
+    check_number       TEXT PRIMARY KEY,
+    tin                TEXT,
+    check_cents        INTEGER NOT NULL,
+    drafts_cents       INTEGER NOT NULL,
+    linked_paid_cents  INTEGER NOT NULL,
+    claims             INTEGER NOT NULL,
+    drafts             INTEGER NOT NULL,
+    status             TEXT NOT NULL,
+    updated_at         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS check_rollups_status ON check_rollups (tin, status);
+"""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("reconcile requires numpy: pip install numpy") from e
+    return numpy
+
+
+def to_cents(value):
+    """'1,234.56' / 12.5 / None -> integer cents, rounded half up"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int):
+        return value * 100
+    try:
+        amount = Decimal(str(value).replace(',', '').replace('$', '').strip() or '0')
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {value!r}") from None
+    return int((amount * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def format_cents(cents):
+    """-1234 -> '-12.34'"""
+    sign = '-' if cents < 0 else ''
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+class _Codes(dict):
+    """Interns strings as dense integer codes"""
+
+    def code(self, value):
+        return self.setdefault(value, len(self))
+
+    def names(self):
+        return sorted(self, key=self.get)
+
+
+class ClaimColumns:
+    """A batch of claims flattened into line / crosswalk / payment columns"""
+
+    def __init__(self, claims):
+        np = _numpy()
+        self.claim_numbers = []
+        self.service_dates = []
+        self.suffixes = _Codes({UNMAPPED: 0})
+        self.drafts = _Codes()
+        self.checks = _Codes()
+        lines, xwalk, payments, summary_cents = [], [], [], []
+        for i, claim in enumerate(claims):
+            summary = claim.get('claimSummary') or {}
+            self.claim_numbers.append(str(claim.get('claimNumber', '')))
+            day = claim_service_date(claim)
+            self.service_dates.append(iso(day) if day else None)
+            summary_cents.append(to_cents(summary.get('totalPaidAmt')))
+            for line in claim.get('lineItems') or ():
+                lines.append((i, self.suffixes.code(line.get('icnSuffix') or UNMAPPED),
+                              to_cents(line.get('paidAmt'))))
+            for entry in summary.get('clmXWalkData') or ():
+                suffix, draft = entry.get('clmIcnSufxCd'), entry.get('clmDrftNbr')
+                if suffix and draft:
+                    xwalk.append((i, self.suffixes.code(suffix), self.drafts.code(draft)))
+            for payment in claim.get('payments') or ():
+                payments.append((i, self.drafts.code(payment.get('draftNbr') or ''),
+                                 to_cents(payment.get('draftAmt')),
+                                 self.checks.code(payment.get('checkNbr') or ''),
+                                 to_cents(payment.get('checkAmt'))))
+        self.count = len(self.claim_numbers)
+        self.summary_cents = np.array(summary_cents, dtype=np.int64)
+        self.line_claim, self.line_suffix, self.line_paid = self._columns(np, lines, 3)
+        self.xwalk_claim, self.xwalk_suffix, self.xwalk_draft = self._columns(np, xwalk, 3)
+        (self.pay_claim, self.pay_draft, self.pay_amount,
+         self.pay_check, self.pay_check_amount) = self._columns(np, payments, 5)
+
+    @staticmethod
+    def _columns(np, rows, width):
+        array = np.array(rows, dtype=np.int64).reshape(-1, width)
+        return tuple(array[:, i] for i in range(width))
+
+
+def _group_sums(np, keys, values):
+    """Sorted distinct keys and the int64 sum of `values` per key"""
+    if not len(keys):
+        return keys, values
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(values, starts)
+
+
+def _lookup(np, table_keys, table_values, keys, missing=-1):
+    """table_values[i] where table_keys[i] == key (table_keys sorted), else `missing`"""
+    if not len(table_keys):
+        return np.full(len(keys), missing, dtype=np.int64), np.zeros(len(keys), dtype=bool)
+    positions = np.minimum(np.searchsorted(table_keys, keys), len(table_keys) - 1)
+    found = table_keys[positions] == keys
+    return np.where(found, table_values[positions], missing), found
+
+
+def _per_claim(np, count, claim_index, values):
+    totals = np.zeros(count, dtype=np.int64)
+    np.add.at(totals, claim_index, values)
+    return totals
+
+
+class Reconciliation:
+    """Reconciliation of one ClaimColumns batch; arrays are per claim or per suffix group"""
+
+    def __init__(self, columns):
+        np = _numpy()
+        self.columns = c = columns
+        n_suffixes, n_drafts, n_checks = len(c.suffixes) or 1, len(c.drafts) or 1, len(c.checks) or 1
+
+        # Line items summed per (claim, ICN suffix)
+        keys, self.group_cents = _group_sums(np, c.line_claim * n_suffixes + c.line_suffix, c.line_paid)
+        self.group_claim, self.group_suffix = keys // n_suffixes, keys % n_suffixes
+
+        # Suffix -> draft number via clmXWalkData (last entry wins, as Map.set does)
+        xwalk_keys = (c.xwalk_claim * n_suffixes + c.xwalk_suffix)[::-1]
+        xwalk_keys, first = np.unique(xwalk_keys, return_index=True)
+        self.group_draft, _ = _lookup(np, xwalk_keys, c.xwalk_draft[::-1][first], keys)
+
+        # Draft number -> draftAmt (first payment wins, as payments.find does)
+        pay_keys, first = np.unique(c.pay_claim * n_drafts + c.pay_draft, return_index=True)
+        draft_keys = self.group_claim * n_drafts + np.maximum(self.group_draft, 0)
+        self.group_draft_cents, paid = _lookup(np, pay_keys, c.pay_amount[first], draft_keys, 0)
+
+        self.group_status = np.select(
+            [self.group_draft < 0, ~paid, self.group_cents == self.group_draft_cents],
+            [UNMAPPED_LINES, NO_DRAFT, MATCHED], MISMATCH)
+
+        # Global tally: line items == drafts == totalPaidAmt
+        self.line_cents = _per_claim(np, c.count, c.line_claim, c.line_paid)
+        self.draft_cents = _per_claim(np, c.count, c.pay_claim, c.pay_amount)
+        self.global_match = (self.line_cents == self.draft_cents) & (self.line_cents == c.summary_cents)
+        problem = (self.group_status == MISMATCH) | (self.group_status == NO_DRAFT)
+        unmapped = (self.group_status == UNMAPPED_LINES) & (self.group_cents != 0)
+        self.problem_suffixes = _per_claim(np, c.count, self.group_claim, problem)
+        self.unmapped_suffixes = _per_claim(np, c.count, self.group_claim, unmapped)
+
+        # Multi-claim checks: checkAmt above this claim's drafts on that check
+        check_keys = c.pay_claim * n_checks + c.pay_check
+        summed_keys, drafts_on_check = _group_sums(np, check_keys, c.pay_amount)
+        distinct, first = np.unique(check_keys, return_index=True)
+        excess = np.maximum(c.pay_check_amount[first] - drafts_on_check, 0) if len(distinct) else distinct
+        self.multi_claim_excess = _per_claim(np, c.count, distinct // n_checks, excess)
+
+        self.status = np.select(
+            [self.unmapped_suffixes > 0, self.global_match & (self.problem_suffixes == 0)],
+            [UNMAPPED_LINES, MATCHED], MISMATCH)
+        self._group_bounds = np.searchsorted(self.group_claim, np.arange(c.count + 1))
+
+    def __len__(self):
+        return self.columns.count
+
+    def counts(self):
+        """{status: claims}"""
+        np = _numpy()
+        codes, counts = np.unique(self.status, return_counts=True)
+        return {STATUSES[code]: int(count) for code, count in zip(codes, counts)}
+
+    def proof(self, i):
+        """Per-suffix proof table for claim i (the UI's 'Show Proof')"""
+        suffixes, drafts = self.columns.suffixes.names(), self.columns.drafts.names()
+        start, end = self._group_bounds[i], self._group_bounds[i + 1]
+        return [{
+            'suffix': suffixes[self.group_suffix[g]],
+            'draft_number': drafts[self.group_draft[g]] if self.group_draft[g] >= 0 else None,
+            'line_items_cents': int(self.group_cents[g]),
+            'draft_cents': int(self.group_draft_cents[g]),
+            'status': STATUSES[self.group_status[g]],
+        } for g in range(start, end)]
+
+    def check_rows(self):
+        """
+        (check, draft, claim_number, check_cents, draft_cents, linked_paid_cents)
+        per payment with a check number; linked_paid_cents sums the claim's
+        line items whose ICN suffix maps to that draft, or all of its line
+        items when that is the claim's only draft (no crosswalk needed)
+        """
+        np = _numpy()
+        c = self.columns
+        n_drafts = len(c.drafts) or 1
+        linked = self.group_draft >= 0
+        link_keys, link_cents = _group_sums(
+            np, self.group_claim[linked] * n_drafts + self.group_draft[linked], self.group_cents[linked])
+        pay_keys, first = np.unique(c.pay_claim * n_drafts + c.pay_draft, return_index=True)
+        linked_cents, _ = _lookup(np, link_keys, link_cents, pay_keys, 0)
+        pay_claims = c.pay_claim[first]
+        single = np.bincount(pay_claims, minlength=c.count)[pay_claims] == 1
+        linked_cents = np.where(single, self.line_cents[pay_claims], linked_cents)
+        drafts, checks = c.drafts.names(), c.checks.names()
+        for p, cents in zip(first, linked_cents):
+            check = checks[c.pay_check[p]]
+            if check:
+                yield (check, drafts[c.pay_draft[p]], c.claim_numbers[c.pay_claim[p]],
+                       int(c.pay_check_amount[p]), int(c.pay_amount[p]), int(cents))
+
+    def rows(self):
+        """One dict per claim, in input order"""
+        c = self.columns
+        for i in range(c.count):
+            yield {
+                'claim_number': c.claim_numbers[i],
+                'service_date': c.service_dates[i],
+                'status': STATUSES[self.status[i]],
+                'line_items_cents': int(self.line_cents[i]),
+                'drafts_cents': int(self.draft_cents[i]),
+                'summary_cents': int(c.summary_cents[i]),
+                'multi_claim_excess_cents': int(self.multi_claim_excess[i]),
+                'suffixes': self.proof(i),
+            }
+
+
+def reconcile(claims):
+    """Reconcile a list of enriched claims as one columnar batch"""
+    return Reconciliation(ClaimColumns(claims))
+
+
+class ReconciliationStore:
+    """
+    SQLite-backed per-claim reconciliation results, plus an index of
+    (checkNbr, draftNbr) across every stored claim with per-check rollups.
+    save() re-rolls only the checks the saved claims touch (before or after).
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def save(self, reconciliation, tin=None, now=None):
+        now = time.time() if now is None else now
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO claim_reconciliation VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row['claim_number'], tin, row['service_date'], row['status'], row['line_items_cents'],
+                  row['drafts_cents'], row['summary_cents'], row['multi_claim_excess_cents'],
+                  json.dumps(row['suffixes']), now)
+                 for row in reconciliation.rows()],
+            )
+            self._index_checks(reconciliation, tin, now)
+
+    def _index_checks(self, reconciliation, tin, now):
+        db = self._db
+        db.execute("CREATE TEMP TABLE IF NOT EXISTS affected_checks (check_number TEXT PRIMARY KEY)")
+        db.execute("CREATE TEMP TABLE IF NOT EXISTS saved_claims (claim_number TEXT PRIMARY KEY)")
+        db.execute("DELETE FROM affected_checks")
+        db.execute("DELETE FROM saved_claims")
+        db.executemany("INSERT OR IGNORE INTO saved_claims VALUES (?)",
+                       [(number,) for number in reconciliation.columns.claim_numbers])
+        db.execute("INSERT OR IGNORE INTO affected_checks SELECT check_number FROM check_drafts "
+                   "WHERE claim_number IN (SELECT claim_number FROM saved_claims)")
+        db.execute("DELETE FROM check_drafts WHERE claim_number IN (SELECT claim_number FROM saved_claims)")
+        rows = [(check, draft, claim, tin, check_cents, draft_cents, linked)
+                for check, draft, claim, check_cents, draft_cents, linked in reconciliation.check_rows()]
+        db.executemany("INSERT OR REPLACE INTO check_drafts VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        db.executemany("INSERT OR IGNORE INTO affected_checks VALUES (?)", [(row[0],) for row in rows])
+        db.execute("DELETE FROM check_rollups WHERE check_number IN (SELECT check_number FROM affected_checks)")
+        db.execute(CHECK_ROLLUP_SQL, (now,))
+
+    def get(self, claim_number):
+        """Stored result for one claim, or None"""
+        cursor = self._db.execute(
+            "SELECT * FROM claim_reconciliation WHERE claim_number = ?", (str(claim_number),))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        result = dict(zip([d[0] for d in cursor.description], row))
+        result['suffixes'] = json.loads(result.pop('proof'))
+        return result
+
+    def check(self, check_number):
+        """Rollup for one check, with its linked claims / drafts under 'draft_links', or None"""
+        cursor = self._db.execute("SELECT * FROM check_rollups WHERE check_number = ?", (str(check_number),))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        result = dict(zip([d[0] for d in cursor.description], row))
+        cursor = self._db.execute(
+            "SELECT draft_number, claim_number, draft_cents, linked_paid_cents FROM check_drafts "
+            "WHERE check_number = ? ORDER BY draft_number, claim_number", (str(check_number),))
+        result['draft_links'] = [dict(zip([d[0] for d in cursor.description], r)) for r in cursor]
+        return result
+
+    def draft(self, draft_number):
+        """(check_number, claim_number) pairs a draft number appears under"""
+        return self._db.execute(
+            "SELECT check_number, claim_number FROM check_drafts WHERE draft_number = ?",
+            (str(draft_number),)).fetchall()
+
+    def checks(self, tin=None, status=None, limit=100):
+        """Check rollups, largest first, optionally by TIN and status (e.g. 'MISMATCH')"""
+        sql, params = "SELECT * FROM check_rollups WHERE 1 = 1", []
+        if tin is not None:
+            sql, params = sql + " AND tin = ?", params + [tin]
+        if status is not None:
+            sql, params = sql + " AND status = ?", params + [status]
+        cursor = self._db.execute(sql + " ORDER BY check_cents DESC LIMIT ?", params + [limit])
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def report(self, tin, start=None, end=None):
+        """Claims and paid totals per status for a TIN, optionally by service date"""
+        sql = ("SELECT status, COUNT(*), SUM(line_items_cents), SUM(drafts_cents), SUM(summary_cents) "
+               "FROM claim_reconciliation WHERE tin = ?")
+        params = [tin]
+        if start:
+            sql, params = sql + " AND service_date >= ?", params + [iso(start)]
+        if end:
+            sql, params = sql + " AND service_date <= ?", params + [iso(end)]
+        statuses = {
+            status: {'claims': claims, 'line_items_cents': lines, 'drafts_cents': drafts,
+                     'summary_cents': summary}
+            for status, claims, lines, drafts, summary in self._db.execute(sql + " GROUP BY status", params)
+        }
+        return {'tin': tin, 'claims': sum(s['claims'] for s in statuses.values()), 'statuses': statuses}
+
+
+def reconcile_batches(claims, store, *, tin=None, batch_size=BATCH_CLAIMS):
+    """Reconcile and store an iterable of claims batch by batch; {status: claims}"""
+    totals = {}
+    for batch in iter_chunks(claims, batch_size):
+        result = reconcile(batch)
+        store.save(result, tin=tin)
+        for status, count in result.counts().items():
+            totals[status] = totals.get(status, 0) + count
+    return totals
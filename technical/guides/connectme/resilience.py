@@ -0,0 +1,369 @@
+"""
+Retry, circuit breaking and hedging for UHC Summary / Details / Payment calls
+
+UHC calls ran with 30-120s timeouts and no overall limit, and job logs
+show tasks stuck for 77k seconds on a hung socket. Endpoint wraps one UHC
+endpoint's calls with:
+
+- a hard per-attempt timeout and an overall deadline, enforced by waiting
+  on a worker thread, so a hung socket costs at most `deadline` seconds;
+  the call's own `timeout=` is capped at the attempt timeout so that the
+  abandoned thread's socket gives up too and the thread returns to the pool
+- jittered exponential retry (full jitter) on timeouts, connection errors,
+  429 and 5xx - idempotent GETs only; Retry-After is honoured
+- a circuit breaker per endpoint: after `failure_threshold` consecutive
+  failures calls fail fast for `reset_seconds`, then one trial call decides
+- optional hedging: if an attempt is still running at the endpoint's
+  observed p95 latency, a second identical request is sent and whichever
+  answers first wins
+- optional rate limiting: with a ratelimit.RateLimiter every attempt takes
+  a token from the `rate_key` bucket (a hedge only if one is free at once)
+  and reports its status back, so 429s slow every caller sharing the bucket
+
+Usage:
+    summary = ENDPOINTS['summary']
+    response = summary.call(requests.get, SUMMARY_URL, headers=headers, timeout=(5, 60),
+                            rate_key=f'uhc:{credential.tin}:{payer_id}')
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .metrics import UHC_REQUEST_SECONDS
+from .ratelimit import RateLimiter
+from .stores import default_store
+from .tracing import span
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+ATTEMPTS = 3
+BASE_DELAY = 0.5
+MAX_DELAY = 8.0
+ATTEMPT_TIMEOUT = 60.0
+DEADLINE = 150.0
+FAILURE_THRESHOLD = 5
+RESET_SECONDS = 30.0
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+# A hedged call holds up to two threads (primary + hedge), so this serves
+# 16 concurrent callers per endpoint without queueing
+MAX_WORKERS = 32
+
+
+class CircuitOpenError(Exception):
+    """The endpoint's breaker is open; the call was not attempted"""
+
+
+class AttemptTimeout(TimeoutError):
+    """An attempt outlived its timeout (the socket is abandoned, not the worker)"""
+
+
+class LatencyTracker:
+    """Recent successful-call latencies for one endpoint"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open trial after reset_seconds"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self._clock() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """The attempt said nothing about the endpoint (a caller error); let another trial run"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self._clock()
+            self._trial_running = False
+
+
+def backoff_delays(attempts=ATTEMPTS, base=BASE_DELAY, cap=MAX_DELAY, rng=random):
+    """Full-jitter exponential delays before attempts 2..n"""
+    return [rng.uniform(0, min(cap, base * 2 ** i)) for i in range(attempts - 1)]
+
+
+def _cap_timeout(value, seconds):
+    """A requests/httpx `timeout=` value (number or (connect, read)) capped at `seconds`"""
+    if value is None:
+        return seconds
+    if isinstance(value, (tuple, list)):
+        return tuple(seconds if part is None else min(part, seconds) for part in value)
+    if isinstance(value, (int, float)):
+        return min(value, seconds)
+    return value
+
+
+def _discard(future):
+    """Done-callback for a losing attempt: close its response, drop its error"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    close = getattr(future.result(), 'close', None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+def _transport_errors():
+    """Timeout / connection exception types of the HTTP libraries that are installed"""
+    errors = [TimeoutError, ConnectionError]
+    try:
+        import requests
+        errors += [requests.ConnectionError, requests.Timeout]
+    except ImportError:
+        pass
+    try:
+        import httpx
+        errors.append(httpx.TransportError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def _retry_after(response):
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class Endpoint:
+    """Resilient caller for one UHC endpoint"""
+
+    def __init__(self, name, *, attempts=ATTEMPTS, attempt_timeout=ATTEMPT_TIMEOUT, deadline=DEADLINE,
+                 hedge=False, hedge_percentile=95, hedge_min_samples=HEDGE_MIN_SAMPLES,
+                 breaker=None, max_workers=MAX_WORKERS, timeout_kwarg='timeout', limiter=None):
+        self.name = name
+        self.attempts = attempts
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        # Keyword the wrapped function takes its socket timeout by; None
+        # for functions that take none (their threads are only abandoned)
+        self.timeout_kwarg = timeout_kwarg
+        self.limiter = limiter
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'uhc-{name}')
+        self.stats = {'calls': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                      'timeouts': 0, 'rejected': 0}
+        self._stats_lock = threading.Lock()
+        self._retryable = _transport_errors()
+
+    def _count(self, name):
+        # Calls run on many threads at once
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def hedge_after(self):
+        """Seconds after which a hedge is sent, or None while there is too little data"""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _attempt(self, func, args, kwargs, timeout, rate_key=None):
+        """One attempt (possibly hedged); returns the first result or raises"""
+        started = time.monotonic()
+        kwargs = self._with_timeout(kwargs, timeout)
+        primary = self._pool.submit(func, *args, **kwargs)
+        futures = {primary}
+        hedge_after = self.hedge_after()
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(futures, timeout=hedge_after)
+            # A hedge never waits for rate budget: it only helps if sent now
+            if not done and (rate_key is None or self.limiter.try_acquire(rate_key) <= 0):
+                self._count('hedges')
+                futures.add(self._pool.submit(func, *args, **kwargs))
+        remaining = timeout - (time.monotonic() - started)
+        while futures and remaining > 0:
+            done, futures = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not futures:
+                    if future is not primary:
+                        self._count('hedge_wins')
+                    self._abandon((futures | done) - {future})
+                    result = future.result()
+                    self.latency.record(time.monotonic() - started)
+                    return result
+            remaining = timeout - (time.monotonic() - started)
+        self._abandon(futures)
+        self._count('timeouts')
+        raise AttemptTimeout(f"{self.name}: no response within {timeout:.1f}s")
+
+    def _with_timeout(self, kwargs, timeout):
+        if self.timeout_kwarg is None:
+            return kwargs
+        return dict(kwargs, **{self.timeout_kwarg: _cap_timeout(kwargs.get(self.timeout_kwarg), timeout)})
+
+    @staticmethod
+    def _abandon(futures):
+        """Unqueue attempts that have not started; close the others' responses when they finish"""
+        for future in futures:
+            if not future.cancel():
+                future.add_done_callback(_discard)
+
+    def call(self, func, *args, idempotent=True, rate_key=None, **kwargs):
+        """
+        func(*args, **kwargs) with retries, breaker and hedging. func returns
+        a response with .status_code; retryable statuses, timeouts and
+        connection errors are retried, and the last response is returned if
+        retries run out (or the breaker opens before the next attempt).
+        Any other exception is raised at once. Non-idempotent calls
+        get a single attempt and are never hedged.
+
+        rate_key: the limiter bucket (e.g. f'uhc:{tin}:{payer_id}'); defaults
+        to the endpoint name when the endpoint has a limiter.
+        """
+        if self.limiter is not None and rate_key is None:
+            rate_key = self.name
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            with span(f'uhc.{self.name}') as current:
+                response = self._call(func, args, kwargs, idempotent, rate_key)
+                status = getattr(response, 'status_code', None)
+                current.set(**{'http.status_code': status})
+                return response
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            UHC_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=self.name, status=status)
+
+    def _call(self, func, args, kwargs, idempotent, rate_key=None):
+        self._count('calls')
+        started = time.monotonic()
+        attempts = self.attempts if idempotent else 1
+        delays = backoff_delays(attempts) + [0]
+        last_error = response = None
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                if response is not None:
+                    # A retryable status already came back; it beats no answer
+                    return response
+                self._count('rejected')
+                raise CircuitOpenError(
+                    f"{self.name}: circuit open after {self.breaker.failures} failures") from last_error
+            remaining = self.deadline - (time.monotonic() - started)
+            timeout = min(self.attempt_timeout, remaining)
+            try:
+                if rate_key is not None:
+                    # RateLimitTimeout when no budget frees up before the deadline
+                    self.limiter.acquire(rate_key, timeout=remaining)
+                    timeout = min(self.attempt_timeout, self.deadline - (time.monotonic() - started))
+                if idempotent:
+                    response = self._attempt(func, args, kwargs, timeout, rate_key)
+                else:
+                    response = self._single(func, args, kwargs, timeout)
+            except self._retryable as e:
+                self.breaker.record_failure()
+                last_error, response = e, None
+                if rate_key is not None:
+                    self.limiter.report(rate_key, 503)
+            except Exception:
+                # Not a timeout or connection failure (e.g. a bug in the
+                # caller): retrying would not help, and it says nothing
+                # about UHC's health
+                self.breaker.release()
+                raise
+            else:
+                if rate_key is not None:
+                    headers = getattr(response, 'headers', None) or {}
+                    self.limiter.report(rate_key, getattr(response, 'status_code', 200),
+                                        headers.get('Retry-After'))
+                if getattr(response, 'status_code', 200) not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+            if attempt == attempts - 1:
+                break
+            delay = _retry_after(response) or delays[attempt]
+            if time.monotonic() - started + delay >= self.deadline:
+                break
+            self._count('retries')
+            time.sleep(delay)
+        if response is not None:
+            return response
+        raise last_error
+
+    def _single(self, func, args, kwargs, timeout):
+        future = self._pool.submit(func, *args, **self._with_timeout(kwargs, timeout))
+        done, _ = wait([future], timeout=timeout)
+        if not done:
+            self._abandon([future])
+            self._count('timeouts')
+            raise AttemptTimeout(f"{self.name}: no response within {timeout:.1f}s")
+        return future.result()
+
+    def snapshot(self):
+        """Breaker state, p50/p95 latency and counters, for monitoring"""
+        return dict(self.stats, endpoint=self.name, breaker=self.breaker.state,
+                    p50=self.latency.percentile(50), p95=self.latency.percentile(95))
+
+
+# One per UHC endpoint, shared by every caller in the process; their rate
+# budgets are shared across processes through Redis when REDIS_URL is set
+UHC_LIMITER = RateLimiter(default_store())
+ENDPOINTS = {
+    'summary': Endpoint('summary', hedge=True, limiter=UHC_LIMITER),
+    'details': Endpoint('details', hedge=True, limiter=UHC_LIMITER),
+    'payment': Endpoint('payment', hedge=True, limiter=UHC_LIMITER),
+}
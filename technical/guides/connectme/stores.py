@@ -0,0 +1,179 @@
+"""
+Shared key/value store for job flags and progress
+
+The backend already runs Redis for Celery (REDIS_URL, 1_DEPLOYMENT.md).
+redis_from_url() opens a client on it; LocalStore is an in-process
+stand-in with the same small subset of commands, for single-process runs
+and the offline fake backend (pub/sub included, within one process).
+
+Usage:
+    store = redis_from_url()            # REDIS_URL or redis://localhost:6379/0
+    store = LocalStore()                # no Redis available
+    store = default_store()             # Redis if REDIS_URL is set, else LocalStore
+"""
+import os
+import queue
+import threading
+import time
+
+DEFAULT_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+KEY_PREFIX = 'connectme'
+
+
+def key(*parts):
+    """Namespaced key, e.g. key('csvjob', job_id, 'cancel')"""
+    return ':'.join([KEY_PREFIX] + [str(part) for part in parts])
+
+
+def redis_from_url(url=None):
+    """redis.Redis client for `url` (default REDIS_URL)"""
+    try:
+        import redis
+    except ImportError as e:
+        raise ImportError("redis_from_url requires redis: pip install redis") from e
+    return redis.Redis.from_url(url or DEFAULT_REDIS_URL)
+
+
+_local_store = None
+
+
+def default_store():
+    """
+    Redis when REDIS_URL is set and the redis package is installed,
+    otherwise a process-wide LocalStore (scripts, offline runs)
+    """
+    global _local_store
+    if os.environ.get('REDIS_URL'):
+        try:
+            return redis_from_url()
+        except ImportError:
+            pass
+    if _local_store is None:
+        _local_store = LocalStore()
+    return _local_store
+
+
+def to_text(value):
+    """Redis returns bytes; LocalStore returns str"""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class LocalStore:
+    """Thread-safe in-process subset of the Redis commands used here"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._expires = {}
+        self._subscribers = {}
+
+    def _live(self, name):
+        expires = self._expires.get(name)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        return name in self._data
+
+    def set(self, name, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._live(name):
+                return None
+            self._data[name] = str(value)
+            if ex is not None:
+                self._expires[name] = time.monotonic() + ex
+            else:
+                self._expires.pop(name, None)
+            return True
+
+    def get(self, name):
+        with self._lock:
+            return self._data.get(name) if self._live(name) else None
+
+    def exists(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._live(name))
+
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in names:
+                removed += self._live(name)
+                self._data.pop(name, None)
+                self._expires.pop(name, None)
+            return removed
+
+    def expire(self, name, seconds):
+        with self._lock:
+            if not self._live(name):
+                return False
+            self._expires[name] = time.monotonic() + seconds
+            return True
+
+    def hset(self, name, mapping):
+        with self._lock:
+            if not self._live(name):
+                self._data[name] = {}
+            self._data[name].update({k: str(v) for k, v in mapping.items()})
+            return len(mapping)
+
+    def hincrby(self, name, field, amount=1):
+        return int(self.hincrbyfloat(name, field, amount))
+
+    def hincrbyfloat(self, name, field, amount=1.0):
+        with self._lock:
+            if not self._live(name):
+                self._data[name] = {}
+            value = float(self._data[name].get(field, 0)) + amount
+            self._data[name][field] = str(int(value) if value == int(value) else value)
+            return value
+
+    def llen(self, name):
+        with self._lock:
+            value = self._data.get(name) if self._live(name) else None
+            return len(value) if isinstance(value, list) else 0
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._data[name]) if self._live(name) else {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.put({'type': 'message', 'channel': channel, 'data': message})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        return LocalPubSub(self)
+
+
+class LocalPubSub:
+    """LocalStore counterpart of redis.client.PubSub (get_message only)"""
+
+    def __init__(self, store):
+        self._store = store
+        self._messages = queue.Queue()
+        self.channels = set()
+
+    def subscribe(self, *channels):
+        with self._store._lock:
+            for channel in channels:
+                self._store._subscribers.setdefault(channel, []).append(self._messages)
+                self.channels.add(channel)
+
+    def unsubscribe(self, *channels):
+        with self._store._lock:
+            for channel in channels or tuple(self.channels):
+                subscribers = self._store._subscribers.get(channel, [])
+                if self._messages in subscribers:
+                    subscribers.remove(self._messages)
+                self.channels.discard(channel)
+
+    def get_message(self, ignore_subscribe_messages=True, timeout=0.0):
+        try:
+            return self._messages.get(timeout=timeout) if timeout else self._messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.unsubscribe()
@@ -0,0 +1,77 @@
+"""
+Concurrent date-window sweeper
+
+Looks for a set of claim numbers across many service-date windows at once.
+All windows are searched in parallel (bounded by `concurrency`), and the
+sweep stops - cancelling any window still in flight - as soon as every
+target claim has been found.
+
+Usage:
+    found = await sweep_for_claims(client, ['51598988', 'FE98163821'], windows)
+    hit = found.get('51598988')   # SweepHit(claim, start, end) or None
+"""
+import asyncio
+from dataclasses import dataclass
+
+
+@dataclass
+class SweepHit:
+    """A target claim and the window it was found in"""
+    claim: dict
+    start: str
+    end: str
+
+
+def _normalize(claim_number):
+    return str(claim_number or '').strip()
+
+
+async def sweep_for_claims(client, claim_numbers, windows, *, concurrency=4,
+                           on_window=None, **filters):
+    """
+    Search `windows` [(first_service_date, last_service_date), ...] for every
+    claim in `claim_numbers` in one pass.
+
+    - concurrency: windows searched at the same time
+    - on_window: optional callback(start, end, claims_or_exception) fired as
+      each window finishes (for progress output)
+    - filters: passed through to client.search (practice_id, status_filter, ...)
+
+    Returns {claim_number: SweepHit} for the claims that were found. Windows
+    that fail are reported through on_window and otherwise skipped.
+    """
+    remaining = {_normalize(n) for n in claim_numbers}
+    found = {}
+    if not remaining:
+        return found
+
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def search_window(start, end):
+        async with limiter:
+            try:
+                return start, end, await client.search(start, end, **filters)
+            except Exception as e:
+                return start, end, e
+
+    tasks = [asyncio.create_task(search_window(start, end)) for start, end in windows]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            start, end, claims = await next_done
+            if on_window is not None:
+                on_window(start, end, claims)
+            if isinstance(claims, Exception):
+                continue
+
+            for claim in claims:
+                number = _normalize(claim.get('claimNumber'))
+                if number in remaining:
+                    remaining.discard(number)
+                    found[number] = SweepHit(claim, start, end)
+            if not remaining:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return found
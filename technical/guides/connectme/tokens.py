@@ -0,0 +1,208 @@
+"""
+Shared token broker for Keycloak and UHC OAuth tokens
+
+Every script did a Keycloak password grant at startup, and the backend
+called get_oauth_token(credential) for UHC on every search. TokenBroker
+keeps each token in Redis, shared by all Celery workers and gunicorn
+processes, with a short in-process copy in front of it:
+
+- callers get the cached token with no auth round trip
+- inside the last `refresh_ahead` seconds one caller takes a Redis lock
+  and refreshes; everyone else keeps using the still-valid token, so
+  expiry under load causes one refresh, not a thundering herd
+- a token a 401 came back for (4_EDGE_CASES.md 5.1, expiry mid-search)
+  is passed as `rejected` and replaced the same way
+
+Usage (backend):
+    broker = TokenBroker(redis_from_url())
+    token = broker.get(f'uhc:{credential.id}', lambda: request_uhc_token(credential))
+
+Usage (ClaimsClient wraps its auth this way itself when REDIS_URL is set
+or token_store= is passed):
+    auth = BrokeredAuth(broker, 'keycloak:vigneshr', KeycloakPasswordAuth('vigneshr', password))
+    async with ClaimsClient(base_url, auth=auth) as client:
+        ...
+
+fetch() returns the OAuth token response: {'access_token': ..., 'expires_in': ...}.
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+from .client import Token
+from .stores import key, to_text
+
+REFRESH_AHEAD_SECONDS = 60
+LOCK_SECONDS = 15
+WAIT_SECONDS = 0.05
+DEFAULT_EXPIRES_IN = 300
+
+
+class TokenBroker:
+    """Redis-backed token cache with single-flight refresh ahead of expiry"""
+
+    def __init__(self, store, *, refresh_ahead=REFRESH_AHEAD_SECONDS, lock_seconds=LOCK_SECONDS,
+                 wait_seconds=WAIT_SECONDS, clock=time.time):
+        self.store = store
+        self.refresh_ahead = refresh_ahead
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self._clock = clock
+        self._local = {}
+        self._local_lock = threading.Lock()
+        self._fetchers = {}
+        self.fetches = 0
+
+    # --- storage -------------------------------------------------------
+
+    def _read(self, name, rejected=None):
+        with self._local_lock:
+            cached = self._local.get(name)
+        if (cached and cached['access_token'] != rejected
+                and cached['expires_at'] - self.refresh_ahead > self._clock()):
+            return cached
+        raw = self.store.get(key('token', name))
+        if raw is None:
+            return None
+        cached = json.loads(to_text(raw))
+        with self._local_lock:
+            self._local[name] = cached
+        return cached
+
+    def _write(self, name, data):
+        expires_in = float(data.get('expires_in') or DEFAULT_EXPIRES_IN)
+        cached = {'access_token': data['access_token'], 'expires_at': self._clock() + expires_in}
+        self.store.set(key('token', name), json.dumps(cached), ex=max(1, int(expires_in)))
+        with self._local_lock:
+            self._local[name] = cached
+        self.fetches += 1
+        return cached
+
+    def _lock(self, name):
+        owner = uuid.uuid4().hex
+        if self.store.set(key('token', name, 'lock'), owner, nx=True, ex=self.lock_seconds):
+            return owner
+        return None
+
+    def _unlock(self, name, owner):
+        lock_key = key('token', name, 'lock')
+        if to_text(self.store.get(lock_key)) == owner:
+            self.store.delete(lock_key)
+
+    def _state(self, name, rejected):
+        """(cached, usable, due): usable = unexpired and not rejected; due = refresh now"""
+        cached = self._read(name, rejected)
+        if cached is None or cached['access_token'] == rejected:
+            return cached, False, True
+        remaining = cached['expires_at'] - self._clock()
+        return cached, remaining > 0, remaining <= self.refresh_ahead
+
+    def invalidate(self, name):
+        self.store.delete(key('token', name))
+        with self._local_lock:
+            self._local.pop(name, None)
+
+    # --- sync API (backend) --------------------------------------------
+
+    def get(self, name, fetch=None, *, rejected=None):
+        """
+        Access token for `name`, fetching through fetch() only when it is
+        missing, due for refresh, or is the `rejected` token. fetch defaults
+        to the one registered for `name`.
+        """
+        fetch = fetch or self._fetchers[name]
+        deadline = self._clock() + self.lock_seconds
+        while True:
+            cached, usable, due = self._state(name, rejected)
+            if usable and not due:
+                return cached['access_token']
+            owner = self._lock(name)
+            if owner:
+                try:
+                    cached, usable, due = self._state(name, rejected)
+                    if usable and not due:
+                        return cached['access_token']
+                    return self._write(name, fetch())['access_token']
+                finally:
+                    self._unlock(name, owner)
+            if usable:
+                # Someone else is refreshing; the current token is still good
+                return cached['access_token']
+            if self._clock() >= deadline:
+                return self._write(name, fetch())['access_token']
+            time.sleep(self.wait_seconds)
+
+    def register(self, name, fetch):
+        """Remember how to fetch `name`, for get(name) and refresh_due()"""
+        self._fetchers[name] = fetch
+
+    def refresh_due(self):
+        """
+        Refresh every registered token that is inside its refresh window -
+        run from Celery beat so requests never wait on a refresh.
+        """
+        refreshed = []
+        for name in list(self._fetchers):
+            _, _, due = self._state(name, None)
+            if due:
+                self.get(name)
+                refreshed.append(name)
+        return refreshed
+
+    # --- async API (ClaimsClient) --------------------------------------
+
+    async def aget(self, name, afetch, *, rejected=None):
+        """get() for coroutine fetchers; waiting uses asyncio.sleep"""
+        deadline = self._clock() + self.lock_seconds
+        while True:
+            cached, usable, due = self._state(name, rejected)
+            if usable and not due:
+                return cached
+            owner = self._lock(name)
+            if owner:
+                try:
+                    cached, usable, due = self._state(name, rejected)
+                    if usable and not due:
+                        return cached
+                    return self._write(name, await afetch())
+                finally:
+                    self._unlock(name, owner)
+            if usable:
+                return cached
+            if self._clock() >= deadline:
+                return self._write(name, await afetch())
+            await asyncio.sleep(self.wait_seconds)
+
+
+class BrokeredAuth:
+    """
+    ClaimsClient auth that goes through a TokenBroker, so concurrent scripts,
+    workers and processes share one login. Wraps MockLoginAuth /
+    KeycloakPasswordAuth.
+    """
+
+    def __init__(self, broker, name, auth):
+        self.broker = broker
+        self.name = name
+        self.auth = auth
+
+    @property
+    def identity(self):
+        return getattr(self.auth, 'identity', None)
+
+    async def fetch_token(self, client):
+        # The client only asks again when its copy expired or drew a 401
+        rejected = client._token.access_token if client._token else None
+
+        async def afetch():
+            token = await self.auth.fetch_token(client)
+            expires_in = token.expires_at - time.monotonic()
+            return {
+                'access_token': token.access_token,
+                'expires_in': expires_in if expires_in != float('inf') else DEFAULT_EXPIRES_IN,
+            }
+
+        cached = await self.broker.aget(self.name, afetch, rejected=rejected)
+        return Token(cached['access_token'], time.monotonic() + cached['expires_at'] - self.broker._clock())
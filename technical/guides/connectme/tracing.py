@@ -0,0 +1,402 @@
+"""
+Span timing for the claims search and bulk-upload hot paths
+
+Diagnosing a slow search or job meant grepping journalctl for "BATCH
+QUERY" and "Retrieved N claims from page" lines. span() times a block as an
+OpenTelemetry-shaped span (trace / span ids, parent, attributes, status)
+and hands it to the configured exporters:
+
+- JsonlExporter: one JSON line per span, to a local file
+- OTLPExporter:  batches spans as OTLP/HTTP JSON to a collector
+                 (http://localhost:4318/v1/traces); no SDK needed
+- StageExporter: per-minute latency histograms per span name in Redis, read
+                 by stage_breakdown() for the monitoring dashboard
+
+The package's own hot paths are instrumented: UHC calls (resilience),
+Summary pages (pagination), Details / Payment enrichment, plan fetches and
+matching (coalesce), (TIN, Payer ID) groups (bulk), CSV chunk read / process
+/ write (ingest) and progress flushes (progress). Children inherit the tin,
+payer_id, window and job_id attributes of the span around them, so an
+outer span('bulk.job', job_id=...) labels everything under it. Without an
+exporter span() is a no-op.
+
+Exporters are set from the environment at import:
+    CONNECTME_TRACE_FILE=/var/log/connectme/spans.jsonl
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318
+    CONNECTME_TRACE_STAGES=1                     (uses stores.default_store())
+
+Usage:
+    with span('bulk.job', job_id=job.id, tin=org.tin):
+        stream_csv_job(...)
+
+    @traced('uhc.summary')
+    def get_claims_summary(...): ...
+
+    pool.map(bind(run), items)      # carry the current span into worker threads
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.request
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from .stores import key, to_text
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.environ.get('OTEL_SERVICE_NAME', 'connectme')
+ATTRIBUTE_PREFIX = 'connectme.'
+# Copied from the enclosing span unless the child sets them itself
+INHERITED_ATTRIBUTES = tuple(ATTRIBUTE_PREFIX + name for name in (
+    'tin', 'payer_id', 'window_start', 'window_end', 'job_id'))
+STAGE_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+STAGE_FLUSH_SECONDS = 5.0
+STAGE_TTL = 24 * 3600
+OTLP_BATCH = 128
+# Spans kept for retry while the collector is unreachable; the oldest are dropped past this
+OTLP_MAX_PENDING = 8 * OTLP_BATCH
+
+_current = contextvars.ContextVar('connectme_span', default=None)
+
+
+def _attribute_name(name):
+    return name if '.' in name else ATTRIBUTE_PREFIX + name
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    status: str = 'OK'
+    message: str = ''
+
+    @property
+    def duration(self):
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, **attributes):
+        """Add attributes (e.g. result counts) before the span ends"""
+        for name, value in attributes.items():
+            if value is not None:
+                self.attributes[_attribute_name(name)] = value
+
+    def to_dict(self):
+        return {
+            'name': self.name, 'trace_id': self.trace_id, 'span_id': self.span_id,
+            'parent_id': self.parent_id, 'start': self.start_ns / 1e9,
+            'duration_ms': round(self.duration * 1000, 3), 'status': self.status,
+            'message': self.message, 'attributes': self.attributes,
+        }
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id, 'spanId': self.span_id, 'name': self.name, 'kind': 1,
+            'startTimeUnixNano': str(self.start_ns), 'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.message} if self.status == 'ERROR' else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+def _otlp_attribute(name, value):
+    if isinstance(value, bool):
+        return {'key': name, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': name, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': name, 'value': {'doubleValue': value}}
+    return {'key': name, 'value': {'stringValue': str(value)}}
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self, exporters=()):
+        self.exporters = list(exporters)
+
+    @property
+    def enabled(self):
+        return bool(self.exporters)
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+        return exporter
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the block as a child of the current span; exceptions mark it ERROR"""
+        if not self.exporters:
+            yield _NOOP
+            return
+        parent = _current.get()
+        span = Span(name, parent.trace_id if parent else f"{random.getrandbits(128):032x}",
+                    f"{random.getrandbits(64):016x}", parent.span_id if parent else None)
+        if parent:
+            span.attributes.update({k: v for k, v in parent.attributes.items() if k in INHERITED_ATTRIBUTES})
+        span.set(**attributes)
+        token = _current.set(span)
+        span.start_ns = time.time_ns()
+        try:
+            yield span
+        except Exception as e:
+            span.status, span.message = 'ERROR', f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current.reset(token)
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception:
+                    # Telemetry must never break the job it is measuring
+                    pass
+
+    def traced(self, name=None, **attributes):
+        """Decorator form of span(); works on plain and coroutine functions"""
+        def decorate(func):
+            span_name = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, **attributes):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, **attributes):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def flush(self):
+        for exporter in self.exporters:
+            flush = getattr(exporter, 'flush', None)
+            if flush:
+                flush()
+
+
+def current_span():
+    """The active span (None outside any span or when tracing is off)"""
+    return _current.get()
+
+
+def bind(func):
+    """
+    func running under the caller's current span, for thread pools
+    (contextvars do not cross into ThreadPoolExecutor workers by themselves)
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+# --- exporters ------------------------------------------------------------
+
+class JsonlExporter:
+    """Appends each finished span to a JSON-lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line)
+
+
+class OTLPExporter:
+    """Batches spans to an OTLP/HTTP JSON endpoint (an OpenTelemetry Collector, Jaeger, Tempo)"""
+
+    def __init__(self, endpoint='http://localhost:4318/v1/traces', *, batch=OTLP_BATCH, timeout=5,
+                 max_pending=OTLP_MAX_PENDING):
+        self.endpoint = endpoint
+        self.batch = batch
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = []
+        atexit.register(self.flush)
+
+    def export(self, span):
+        with self._lock:
+            self._pending.append(span)
+            full = len(self._pending) >= self.batch
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        POST pending spans. If the collector is unreachable they are kept for
+        the next flush (up to max_pending) and the failure is logged.
+        """
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if not spans:
+            return
+        body = {'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{'scope': {'name': 'connectme'}, 'spans': [s.to_otlp() for s in spans]}],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(body, default=str).encode(),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError as e:
+            with self._lock:
+                self._pending[:0] = spans
+                dropped = max(len(self._pending) - self.max_pending, 0)
+                del self._pending[:dropped]
+            logger.warning("OTLP export to %s failed, keeping %d spans (%d dropped): %s",
+                           self.endpoint, len(spans) - dropped, dropped, e)
+
+
+def _stage_key(minute):
+    return key('stages', minute)
+
+
+class StageExporter:
+    """
+    Per-minute latency histograms per span name, kept in `store` so the
+    dashboard process sees every worker's spans. Spans are aggregated in
+    process and written every `flush_seconds` (one HINCRBY per field).
+    """
+
+    def __init__(self, store, *, flush_seconds=STAGE_FLUSH_SECONDS, clock=time.time):
+        self.store = store
+        self.flush_seconds = flush_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = clock()
+        atexit.register(self.flush)
+
+    def export(self, span):
+        minute = int(span.end_ns / 1e9 // 60)
+        ms = span.duration * 1000
+        with self._lock:
+            counts = self._pending.setdefault(minute, {})
+            for suffix, amount in (('count', 1), ('ms', round(ms, 3)),
+                                   (f'b{bisect_left(STAGE_BUCKETS_MS, ms)}', 1)):
+                field_name = f"{span.name}|{suffix}"
+                counts[field_name] = counts.get(field_name, 0) + amount
+            if span.status == 'ERROR':
+                counts[f"{span.name}|errors"] = counts.get(f"{span.name}|errors", 0) + 1
+            due = self._clock() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write pending counts. As with metrics.Registry.flush, a store error
+        is logged and the unwritten counts are kept for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = self._clock()
+        written = set()
+        try:
+            for minute, counts in pending.items():
+                name = _stage_key(minute)
+                for field_name, amount in counts.items():
+                    if isinstance(amount, float):
+                        self.store.hincrbyfloat(name, field_name, amount)
+                    else:
+                        self.store.hincrby(name, field_name, amount)
+                    written.add((minute, field_name))
+                self.store.expire(name, STAGE_TTL)
+        except Exception as e:
+            unwritten = [(minute, field_name, amount) for minute, counts in pending.items()
+                         for field_name, amount in counts.items() if (minute, field_name) not in written]
+            logger.warning("stage flush failed, keeping %d pending fields: %s", len(unwritten), e)
+            with self._lock:
+                for minute, field_name, amount in unwritten:
+                    counts = self._pending.setdefault(minute, {})
+                    counts[field_name] = counts.get(field_name, 0) + amount
+
+
+def _bucket_percentile(buckets, total, q):
+    """Upper bound (ms) of the bucket holding the q-th percentile"""
+    if not total:
+        return 0.0
+    rank, seen = q / 100 * total, 0
+    for i, count in enumerate(buckets):
+        seen += count
+        if seen >= rank:
+            return float(STAGE_BUCKETS_MS[i]) if i < len(STAGE_BUCKETS_MS) else float('inf')
+    return float('inf')
+
+
+def stage_breakdown(store, minutes=15, now=None):
+    """
+    Per-stage latency over the last `minutes`: count, errors, total and mean
+    seconds, p50 / p95 (bucket upper bounds, ms) and share of all span time,
+    slowest stage first.
+    """
+    now = time.time() if now is None else now
+    stages = {}
+    for minute in range(int(now // 60) - minutes + 1, int(now // 60) + 1):
+        for field_name, value in store.hgetall(_stage_key(minute)).items():
+            name, _, suffix = to_text(field_name).rpartition('|')
+            stage = stages.setdefault(name, {'count': 0, 'ms': 0.0, 'errors': 0,
+                                             'buckets': [0] * (len(STAGE_BUCKETS_MS) + 1)})
+            value = float(to_text(value))
+            if suffix.startswith('b'):
+                stage['buckets'][int(suffix[1:])] += int(value)
+            else:
+                stage[suffix] += value
+    grand_total = sum(s['ms'] for s in stages.values()) or 1.0
+    rows = [{
+        'stage': name, 'count': int(s['count']), 'errors': int(s['errors']),
+        'total_seconds': round(s['ms'] / 1000, 3),
+        'mean_ms': round(s['ms'] / s['count'], 1) if s['count'] else 0.0,
+        'p50_ms': _bucket_percentile(s['buckets'], s['count'], 50),
+        'p95_ms': _bucket_percentile(s['buckets'], s['count'], 95),
+        'share': round(s['ms'] / grand_total, 3),
+    } for name, s in stages.items()]
+    return sorted(rows, key=lambda r: r['total_seconds'], reverse=True)
+
+
+# --- process-wide tracer ---------------------------------------------------
+
+def configure_from_env(tracer, environ=os.environ):
+    if environ.get('CONNECTME_TRACE_FILE'):
+        tracer.add_exporter(JsonlExporter(environ['CONNECTME_TRACE_FILE']))
+    if environ.get('OTEL_EXPORTER_OTLP_ENDPOINT'):
+        tracer.add_exporter(OTLPExporter(environ['OTEL_EXPORTER_OTLP_ENDPOINT'].rstrip('/') + '/v1/traces'))
+    if environ.get('CONNECTME_TRACE_STAGES'):
+        from .stores import default_store
+        tracer.add_exporter(StageExporter(default_store()))
+    return tracer
+
+
+tracer = configure_from_env(Tracer())
+span = tracer.span
+traced = tracer.traced
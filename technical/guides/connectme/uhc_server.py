@@ -0,0 +1,390 @@
+"""
+Local HTTP stand-in for the UHC Claims API (and the ConnectMe search API)
+
+The performance numbers in 8_BULK_UPLOAD_OPTIMIZATION.md were never
+measured, and measuring against UHC itself is neither repeatable nor
+allowed at volume. FakeUHCServer serves the three UHC workflows over real
+HTTP from a local thread, with claims shaped like
+search_results_july_2025.json:
+
+- GET  /Claims/api/claim/summary/byprovider/v2.0   tin, payerId, firstServiceDt,
+       lastServiceDt (+ ptntFn / ptntLn / ptntDob, transactionId) as query
+       parameters or headers; answers {'claims': [...], 'transactionId': next}
+- GET  /Claims/api/claim/detail/v2.0     claimNumber -> line items, timeline
+- GET  /Claims/api/claim/payment/v2.0    claimNumber -> payments
+- POST /oauth/token                      client-credentials token
+
+and, for ClaimsClient and load_test.py, the backend's mock login,
+practice list, paged /claims/search/, /claims/{n}/, bulk upload and
+csv-jobs (a job "processes" job_rows_per_second rows). Latency (fixed, (low, high) or callable(path)), page
+size and an injected error rate are configurable; tokens are not checked.
+
+SyntheticClaims renders 100k claims on demand from the sample templates,
+so the server holds a few tuples per claim instead of 100k deep copies.
+
+Usage:
+    claims = SyntheticClaims(10_000, '2025-07-01', '2025-07-30')
+    with FakeUHCServer(claims, latency=(0.2, 0.6), page_size=50, error_rate=0.01) as server:
+        requests.get(server.url + SUMMARY_PATH, params={...})
+"""
+import bisect
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from .client import (
+    BULK_UPLOAD_PATH,
+    CLAIM_DETAIL_PATH,
+    CSV_JOB_PATH,
+    MOCK_LOGIN_PATH,
+    PRACTICES_PATH,
+    SEARCH_PATH,
+)
+from .dates import claim_service_date, parse_date
+from .fake_backend import STATUSES, load_sample_claims
+from .pagination import PAGE_SIZE, status_matches
+
+SUMMARY_PATH = "/Claims/api/claim/summary/byprovider/v2.0"
+DETAIL_PATH = "/Claims/api/claim/detail/v2.0"
+PAYMENT_PATH = "/Claims/api/claim/payment/v2.0"
+TOKEN_PATH = "/oauth/token"
+STATS_PATH = "/__stats__"
+
+PRACTICES = [{'id': 1, 'name': 'RSM MEDICAL', 'tin': '854203105', 'payer_id': '87726'}]
+
+# Kept out of Summary responses; Details and Payment serve them
+DETAIL_KEYS = ('lineItems', 'timeline')
+PAYMENT_KEYS = ('payments',)
+
+FIRST_NAMES = ['JAMES', 'MARY', 'ROBERT', 'PATRICIA', 'JOHN', 'JENNIFER', 'MICHAEL', 'LINDA',
+               'DAVID', 'ELIZABETH', 'WILLIAM', 'BARBARA', 'RICHARD', 'SUSAN', 'JOSEPH', 'JESSICA',
+               'THOMAS', 'SARAH', 'CHARLES', 'KAREN']
+LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS',
+              'RODRIGUEZ', 'MARTINEZ', 'HERNANDEZ', 'LOPEZ', 'GONZALEZ', 'WILSON', 'ANDERSON',
+              'THOMAS', 'TAYLOR', 'MOORE', 'JACKSON', 'MARTIN', 'LEE', 'PEREZ', 'THOMPSON',
+              'WHITE', 'HARRIS']
+
+
+class ClaimSet:
+    """Claims ordered by service date, with window and claim-number lookups"""
+
+    def __init__(self, claims):
+        self._claims = sorted(claims, key=lambda c: claim_service_date(c) or date.min)
+        self.days = [(claim_service_date(c) or date.min).toordinal() for c in self._claims]
+        self._numbers = {c.get('claimNumber'): i for i, c in enumerate(self._claims)}
+
+    def __len__(self):
+        return len(self.days)
+
+    def claim(self, i):
+        return self._claims[i]
+
+    def patient(self, i):
+        """(first, last, dob) as UHC stores them"""
+        member = self._claims[i].get('memberInfo') or {}
+        return member.get('ptntFn', ''), member.get('ptntLn', ''), member.get('ptntDob', '')
+
+    def index_of(self, claim_number):
+        return self._numbers.get(claim_number)
+
+    def window(self, start, end):
+        """Indexes of the claims with a service date in [start, end]"""
+        lo = bisect.bisect_left(self.days, parse_date(start).toordinal())
+        hi = bisect.bisect_right(self.days, parse_date(end).toordinal())
+        return range(lo, hi)
+
+
+class SyntheticClaims(ClaimSet):
+    """
+    `count` claims spread over [start, end], numbered FK00000000.. in
+    service-date order. Each claim is rendered from a sample template when
+    it is requested; patients are drawn from a pool of 500 name pairs.
+    """
+
+    def __init__(self, count, start, end, templates=None, seed=0):
+        rng = random.Random(seed)
+        self.templates = templates or load_sample_claims()
+        first, span = parse_date(start).toordinal(), (parse_date(end) - parse_date(start)).days
+        self.days = sorted(first + rng.randint(0, span) for _ in range(count))
+        self._rows = []
+        for i in range(count):
+            dob = date(1940, 1, 1) + timedelta(days=rng.randint(0, 60 * 365))
+            self._rows.append((
+                rng.choice(STATUSES), i % len(self.templates), rng.choice(FIRST_NAMES),
+                rng.choice(LAST_NAMES), dob.strftime('%m/%d/%Y'), rng.getrandbits(64),
+            ))
+
+    def patient(self, i):
+        _, _, first, last, dob, _ = self._rows[i]
+        return first, last, dob
+
+    def index_of(self, claim_number):
+        number = str(claim_number or '')
+        if number.startswith('FK') and number[2:].isdigit() and int(number[2:]) < len(self):
+            return int(number[2:])
+        return None
+
+    def claim(self, i):
+        status, template_index, first, last, dob, bits = self._rows[i]
+        template = self.templates[template_index]
+        service_date = date.fromordinal(self.days[i]).strftime('%m/%d/%Y')
+        claim = dict(
+            template, id=str(uuid.UUID(int=bits << 64 | i)), claimNumber=f"FK{i:08d}",
+            patient=f"{first} {last}", serviceDate=service_date, status=status,
+        )
+        claim['memberInfo'] = dict(template.get('memberInfo') or {}, ptntFn=first, ptntLn=last,
+                                   ptntDob=dob, subscriberId=f"9{i:08d}")
+        claim['claimSummary'] = dict(template.get('claimSummary') or {},
+                                     firstSrvcDt=service_date, lastSrvcDt=service_date)
+        claim['lineItems'] = [dict(line, firstSrvcDt=service_date, lastSrvcDt=service_date)
+                              for line in template.get('lineItems', [])]
+        return claim
+
+
+def upload_rows(content_type, body):
+    """Data rows in the CSV part of a multipart/form-data upload"""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+    for part in message.iter_parts() if message.is_multipart() else ():
+        if part.get_filename():
+            lines = part.get_payload(decode=True).decode('utf-8-sig').splitlines()
+            return max(0, sum(1 for line in lines if line.strip()) - 1)
+    return 0
+
+
+def summary_record(claim):
+    """A claim as the Summary API returns it (no line items or payments)"""
+    return {k: v for k, v in claim.items() if k not in DETAIL_KEYS + PAYMENT_KEYS}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.fake.handle(self)
+
+    def do_POST(self):
+        self.server.fake.handle(self)
+
+
+class FakeUHCServer:
+    """
+    Threaded local server answering UHC and ConnectMe search requests.
+
+    - latency: seconds slept per request - a float, a (low, high) range
+      drawn uniformly, or callable(path)
+    - page_size: claims per Summary / search page
+    - error_rate: share of requests answered with error_status (429s carry
+      Retry-After: 1); token requests never fail
+    - job_rows_per_second: how fast an uploaded bulk job completes
+    """
+
+    def __init__(self, claims, *, latency=0.0, page_size=PAGE_SIZE, error_rate=0.0,
+                 error_status=503, token_ttl=3600, job_rows_per_second=100.0, seed=0,
+                 host='127.0.0.1', port=0):
+        self.claims = claims if isinstance(claims, ClaimSet) else ClaimSet(claims)
+        self.latency = latency
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_ttl = token_ttl
+        self.job_rows_per_second = job_rows_per_second
+        self._jobs = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {}
+        self.stats = {}
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-uhc', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- request plumbing ----------------------------------------------
+
+    def _delay(self, path):
+        if callable(self.latency):
+            return self.latency(path)
+        if isinstance(self.latency, (tuple, list)):
+            with self._lock:
+                return self._rng.uniform(*self.latency)
+        return self.latency
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _inject_error(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def handle(self, request):
+        split = urlsplit(request.path)
+        path = split.path
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+        params = dict(parse_qsl(split.query))
+        self._count(path)
+        delay = self._delay(path)
+        if delay:
+            time.sleep(delay)
+        headers = {}
+        if path in (TOKEN_PATH, MOCK_LOGIN_PATH, STATS_PATH):
+            status, payload = self._dispatch(request.command, path, params, request.headers, body)
+        elif self._inject_error():
+            self._count('errors')
+            status, payload = self.error_status, {'detail': 'Injected failure'}
+            if status == 429:
+                headers['Retry-After'] = '1'
+        else:
+            status, payload = self._dispatch(request.command, path, params, request.headers, body)
+        data = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _dispatch(self, method, path, params, headers, body):
+        if method == 'POST' and path in (TOKEN_PATH, MOCK_LOGIN_PATH):
+            return 200, {'access_token': uuid.uuid4().hex, 'token_type': 'Bearer',
+                         'expires_in': self.token_ttl}
+        if method == 'GET' and path == STATS_PATH:
+            with self._lock:
+                return 200, dict(self.stats)
+        if method == 'GET' and path in (SUMMARY_PATH, DETAIL_PATH, PAYMENT_PATH):
+            # UHC takes these as headers; curl examples pass them as query parameters
+            values = {name: headers[name] for name in (
+                'tin', 'payerId', 'firstServiceDt', 'lastServiceDt', 'ptntFn', 'ptntLn',
+                'ptntDob', 'transactionId', 'claimNumber') if headers.get(name)}
+            values.update(params)
+            if path == SUMMARY_PATH:
+                return self.summary(values)
+            return self.claim_part(values.get('claimNumber'), path)
+        if method == 'POST' and path == SEARCH_PATH:
+            return self.search(json.loads(body or b'{}'))
+        if method == 'GET' and path == PRACTICES_PATH:
+            return 200, {'results': PRACTICES}
+        if method == 'POST' and path == BULK_UPLOAD_PATH:
+            return self.upload(upload_rows(headers.get('Content-Type', ''), body))
+        job_prefix, _, job_suffix = CSV_JOB_PATH.partition('{job_id}')
+        if method == 'GET' and path.startswith(job_prefix) and path.endswith(job_suffix):
+            return self.job(path[len(job_prefix):len(path) - len(job_suffix)])
+        prefix, _, suffix = CLAIM_DETAIL_PATH.partition('{claim_number}')
+        if method == 'GET' and path.startswith(prefix) and path.endswith(suffix):
+            i = self.claims.index_of(path[len(prefix):len(path) - len(suffix)])
+            if i is None:
+                return 404, {'detail': 'Not found'}
+            return 200, self.claims.claim(i)
+        return 404, {'detail': f'Unknown endpoint {method} {path}'}
+
+    def _page(self, indexes, transaction_id, page_size):
+        """(page of indexes, next transactionId or None)"""
+        with self._lock:
+            offset = self._pages.pop(transaction_id, 0)
+        page = indexes[offset:offset + page_size]
+        next_transaction_id = None
+        if offset + page_size < len(indexes):
+            next_transaction_id = str(uuid.uuid4())
+            with self._lock:
+                self._pages[next_transaction_id] = offset + page_size
+        return page, next_transaction_id
+
+    # --- endpoints -----------------------------------------------------
+
+    def summary(self, values):
+        try:
+            indexes = self.claims.window(values['firstServiceDt'], values['lastServiceDt'])
+        except (KeyError, ValueError) as e:
+            return 400, {'detail': f'Invalid service dates: {e}'}
+        wanted = [values.get('ptntFn', '').upper(), values.get('ptntLn', '').upper(),
+                  values.get('ptntDob', '')]
+        if any(wanted):
+            indexes = [i for i in indexes if all(
+                not want or want == str(have).upper()
+                for want, have in zip(wanted, self.claims.patient(i)))]
+        page, next_transaction_id = self._page(indexes, values.get('transactionId'), self.page_size)
+        return 200, {'claims': [summary_record(self.claims.claim(i)) for i in page],
+                     'transactionId': next_transaction_id}
+
+    def claim_part(self, claim_number, path):
+        i = self.claims.index_of(claim_number)
+        if i is None:
+            return 404, {'detail': f'Claim {claim_number} not found'}
+        claim = self.claims.claim(i)
+        keys = DETAIL_KEYS + ('claimSummary',) if path == DETAIL_PATH else PAYMENT_KEYS
+        return 200, dict({k: claim.get(k) for k in keys}, claimNumber=claim_number,
+                         transactionId=claim.get('transactionId'))
+
+    def search(self, payload):
+        """/claims/search/: one page when pageSize is sent, else the whole window"""
+        try:
+            indexes = self.claims.window(payload['firstServiceDate'], payload['lastServiceDate'])
+        except (KeyError, ValueError) as e:
+            return 400, {'detail': f'Invalid service dates: {e}'}
+        status_filter = payload.get('statusFilter')
+        if not payload.get('pageSize'):
+            claims = (self.claims.claim(i) for i in indexes)
+            return 200, {'claims': [c for c in claims if status_matches(c, status_filter)]}
+        page, next_transaction_id = self._page(indexes, payload.get('transactionId'),
+                                               int(payload['pageSize']))
+        claims = (self.claims.claim(i) for i in page)
+        body = {'claims': [c for c in claims if status_matches(c, status_filter)],
+                'transactionId': payload.get('transactionId')}
+        if next_transaction_id:
+            body['nextTransactionId'] = next_transaction_id
+        return 200, body
+
+    def upload(self, total_rows):
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = (total_rows, time.monotonic())
+        return 201, self.job(job_id)[1]
+
+    def job(self, job_id):
+        """csv-jobs view of an upload: rows complete at job_rows_per_second"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return 404, {'detail': 'Not found'}
+        total_rows, created = job
+        processed = min(total_rows, int((time.monotonic() - created) * self.job_rows_per_second))
+        status = 'COMPLETED' if processed >= total_rows else ('PROCESSING' if processed else 'PENDING')
+        return 200, {'id': job_id, 'status': status, 'total_rows': total_rows,
+                     'processed_rows': processed, 'success_count': processed, 'failure_count': 0}
@@ -25,4 +25,6 @@ print("The export doesn't include:")
 print("   - Patient Date of Birth")
 print("   - Subscriber ID (Member ID)")
 print("\nThese are REQUIRED for bulk upload CSV!")
-print("\n💡 Solution: We need to query each claim individually to get full patient details")
+print("\n💡 Solution: export the stored search results in bulk-upload format instead -")
+print("   memberInfo carries DOB and subscriber ID (build_real_bulk_csv.py, or")
+print("   connectme.export.stream_csv(pages, 'bulk_upload'))")
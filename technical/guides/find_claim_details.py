@@ -2,71 +2,51 @@
 """
 Search for a specific claim to find its actual service dates and patient details
 """
-import requests
+import asyncio
 import json
-from datetime import datetime, timedelta
+import sys
 
-API_BASE_URL = "https://connectme.be.totesoft.com"
+from connectme import ClaimsClient
+from connectme.dates import iso
+from connectme.planner import trailing_windows
+from connectme.sweeper import sweep_for_claims
 
-def get_auth_token():
+async def get_auth_token(client):
     """Get authentication token"""
     print("🔐 Authenticating...")
     try:
-        response = requests.post(f"{API_BASE_URL}/api/v1/auth/mock/login/", json={}, timeout=10)
-        if response.status_code == 200:
-            token = response.json().get('access_token')
-            print(f"✅ Authenticated\n")
-            return token
-        return None
+        token = await client.token()
+        print(f"✅ Authenticated\n")
+        return token
     except Exception as e:
         print(f"❌ Auth error: {e}")
         return None
 
-def search_claim_by_date_ranges(token, claim_number):
-    """Search for a claim across multiple date ranges"""
-    print(f"🔍 Searching for claim: {claim_number}\n")
-    
-    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-    
-    # Try different 90-day windows going back 24 months
-    today = datetime.now()
-    
-    date_ranges = []
-    for i in range(8):  # 8 quarters = 2 years
-        end = today - timedelta(days=i*90)
-        start = end - timedelta(days=89)
-        date_ranges.append((start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')))
-    
-    for start, end in date_ranges:
-        print(f"   Trying: {start} to {end}...", end='')
-        
-        payload = {
-            'firstServiceDate': start,
-            'lastServiceDate': end
-        }
-        
-        try:
-            response = requests.post(f"{API_BASE_URL}/api/v1/claims/search/", 
-                                   headers=headers, json=payload, timeout=60)
-            
-            if response.status_code == 200:
-                data = response.json()
-                claims = data.get('claims', [])
-                
-                # Search for our claim number in the results
-                for claim in claims:
-                    if str(claim.get('claimNumber', '')).strip() == str(claim_number).strip():
-                        print(f" ✅ FOUND!\n")
-                        return claim, start, end
-                
-                print(f" ({len(claims)} claims, not found)")
-            else:
-                print(f" ❌ Error: {response.status_code}")
-        except Exception as e:
-            print(f" ❌ Timeout/Error")
-            continue
-    
-    return None, None, None
+async def search_claim_by_date_ranges(client, claim_numbers):
+    """
+    Search for claims across multiple date ranges in one concurrent sweep.
+    Returns {claim_number: (claim, start, end)} for the claims that were found.
+    """
+    print(f"🔍 Searching for claims: {', '.join(claim_numbers)}\n")
+    
+    # Back-to-back 90-day windows going back 24 months
+    date_ranges = [(iso(start), iso(end)) for start, end in trailing_windows()]
+    
+    def report(start, end, result):
+        if isinstance(result, Exception):
+            print(f"   {start} to {end}: ❌ Error: {result}")
+        else:
+            print(f"   {start} to {end}: {len(result)} claims")
+    
+    # All windows run at once (4 in flight); the sweep stops once every claim is found
+    found = await sweep_for_claims(
+        client, claim_numbers, date_ranges, concurrency=4, on_window=report, timeout=60
+    )
+    for claim_number, hit in found.items():
+        print(f"   ✅ FOUND {claim_number} in {hit.start} to {hit.end}")
+    print()
+    
+    return {n: (hit.claim, hit.start, hit.end) for n, hit in found.items()}
 
 def create_csv_from_claim(claim, claim_number, start_date, end_date):
     """Create CSV with the found claim details"""
@@ -111,7 +91,7 @@ def create_csv_from_claim(claim, claim_number, start_date, end_date):
     print("\nNow upload this CSV to test bulk upload!")
     return filename
 
-def main():
+async def main():
     print("""
 ╔═══════════════════════════════════════════════════════════════════════════╗
 ║                                                                           ║
@@ -120,18 +100,26 @@ def main():
 ╚═══════════════════════════════════════════════════════════════════════════╝
     """)
     
-    claim_number = "51598988"
-    
-    token = get_auth_token()
-    if not token:
-        print("❌ Cannot proceed without authentication")
-        return
+    # Usage: python3 find_claim_details.py [claim_number ...]
+    claim_numbers = sys.argv[1:] or ["51598988"]
     
-    claim, start_date, end_date = search_claim_by_date_ranges(token, claim_number)
+    async with ClaimsClient() as client:
+        token = await get_auth_token(client)
+        if not token:
+            print("❌ Cannot proceed without authentication")
+            return
+        
+        found = await search_claim_by_date_ranges(client, claim_numbers)
     
-    if claim:
+    for claim_number in claim_numbers:
+        report_claim(claim_number, found.get(claim_number.strip()))
+
+def report_claim(claim_number, hit):
+    """Write the CSV for a found claim, or explain why it was not found"""
+    if hit:
+        claim, start_date, end_date = hit
         print("\n" + "="*70)
-        print("  ✅ SUCCESS! FOUND CLAIM DETAILS")
+        print(f"  ✅ SUCCESS! FOUND CLAIM DETAILS: {claim_number}")
         print("="*70)
         create_csv_from_claim(claim, claim_number, start_date, end_date)
     else:
@@ -150,7 +138,7 @@ Possible reasons:
 
 🔍 What to do:
 
-1. Verify the claim number is correct: 51598988
+1. Verify the claim number is correct: {claim_number}
 2. Check when this claim was submitted to UHC
 3. Verify your practice TIN matches this claim
 4. Try using Claims Search in the web UI manually:
@@ -165,4 +153,4 @@ Then upload with manual date override in the UI.
         """)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
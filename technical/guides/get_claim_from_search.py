@@ -2,60 +2,37 @@
 """
 Search for claims and extract full details from search results
 """
-import requests
+import asyncio
 import csv
 import json
 from datetime import datetime
 
-API_BASE_URL = "https://connectme.be.totesoft.com"
+from connectme import ClaimsClient
 
-def get_auth_token():
+async def get_auth_token(client):
     """Get authentication token"""
     print("🔐 Authenticating...")
     try:
-        response = requests.post(f"{API_BASE_URL}/api/v1/auth/mock/login/", json={}, timeout=10)
-        if response.status_code == 200:
-            token = response.json().get('access_token')
-            print("✅ Authenticated\n")
-            return token
-        return None
+        token = await client.token()
+        print("✅ Authenticated\n")
+        return token
     except Exception as e:
         print(f"❌ Auth error: {e}")
         return None
 
-def search_claims(token):
+async def search_claims(client):
     """Search for claims in July 2025 date range"""
     print("🔍 Searching for claims (July 1-3, 2025)...")
     
-    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-    
-    payload = {
-        'firstServiceDate': '2025-07-01',
-        'lastServiceDate': '2025-07-03'
-    }
-    
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/api/v1/claims/search/",
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            claims = data.get('claims', [])
-            print(f"✅ Found {len(claims)} claims\n")
-            return claims
-        else:
-            print(f"❌ Error: {response.status_code}")
-            print(response.text)
-            return []
+        claims = await client.search('2025-07-01', '2025-07-03', timeout=60)
+        print(f"✅ Found {len(claims)} claims\n")
+        return claims
     except Exception as e:
         print(f"❌ Error: {e}")
         return []
 
-def main():
+async def main():
     print("""
 ╔═══════════════════════════════════════════════════════════════════════════╗
 ║                                                                           ║
@@ -64,11 +41,12 @@ def main():
 ╚═══════════════════════════════════════════════════════════════════════════╝
     """)
     
-    token = get_auth_token()
-    if not token:
-        return
-    
-    claims = search_claims(token)
+    async with ClaimsClient() as client:
+        token = await get_auth_token(client)
+        if not token:
+            return
+        
+        claims = await search_claims(client)
     
     if not claims:
         print("❌ No claims found")
@@ -87,4 +65,4 @@ def main():
         json.dump(claims, f, indent=2)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
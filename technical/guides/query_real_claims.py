@@ -2,59 +2,32 @@
 """
 Query UHC API to find real working claims and create a test CSV
 """
-import requests
+import asyncio
 import csv
 import json
 from datetime import datetime, timedelta
 
-# API Configuration
-API_BASE_URL = "https://connectme.be.totesoft.com"
-AUTH_URL = f"{API_BASE_URL}/api/v1/auth/mock/login/"
-SEARCH_URL = f"{API_BASE_URL}/api/v1/claims/search/"
+from connectme import ClaimsClient
 
-def get_auth_token():
+async def get_auth_token(client):
     """Get authentication token"""
     print("🔐 Authenticating...")
     try:
-        response = requests.post(AUTH_URL, json={}, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            token = data.get('access_token')
-            print(f"✅ Authentication successful!")
-            return token
-        else:
-            print(f"❌ Auth failed: {response.status_code}")
-            return None
+        token = await client.token()
+        print(f"✅ Authentication successful!")
+        return token
     except Exception as e:
         print(f"❌ Auth error: {e}")
         return None
 
-def search_claims(token, start_date, end_date):
+async def search_claims(client, start_date, end_date):
     """Search for claims in date range"""
     print(f"\n🔍 Searching claims from {start_date} to {end_date}...")
     
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        'firstServiceDate': start_date,
-        'lastServiceDate': end_date
-    }
-    
     try:
-        response = requests.post(SEARCH_URL, headers=headers, json=payload, timeout=30)
-        print(f"   Response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            data = response.json()
-            claims = data.get('claims', [])
-            print(f"✅ Found {len(claims)} claims!")
-            return claims
-        else:
-            print(f"❌ Search failed: {response.text[:200]}")
-            return []
+        claims = await client.search(start_date, end_date, timeout=30)
+        print(f"✅ Found {len(claims)} claims!")
+        return claims
     except Exception as e:
         print(f"❌ Search error: {e}")
         return []
@@ -123,7 +96,7 @@ def create_csv_from_claims(claims, filename):
     print(f"✅ Created {filename} with {len(csv_data)} claims")
     return True
 
-def main():
+async def main():
     print("""
 ╔═══════════════════════════════════════════════════════════════════════════╗
 ║                                                                           ║
@@ -132,26 +105,29 @@ def main():
 ╚═══════════════════════════════════════════════════════════════════════════╝
     """)
     
-    # Get auth token
-    token = get_auth_token()
-    if not token:
-        print("\n❌ Cannot proceed without authentication")
-        return
-    
-    # Try multiple date ranges
-    date_ranges = [
-        ('2024-01-01', '2024-12-31', 'working-claims-2024.csv'),
-        ('2023-01-01', '2023-12-31', 'working-claims-2023.csv'),
-        ('2022-01-01', '2022-12-31', 'working-claims-2022.csv'),
-    ]
-    
-    found_any = False
-    for start, end, filename in date_ranges:
-        claims = search_claims(token, start, end)
-        if claims:
-            if create_csv_from_claims(claims, f'csv-templates/{filename}'):
-                found_any = True
-                break  # Stop after finding claims in one range
+    async with ClaimsClient() as client:
+        # Get auth token
+        token = await get_auth_token(client)
+        if not token:
+            print("\n❌ Cannot proceed without authentication")
+            return
+        
+        # Try multiple date ranges
+        date_ranges = [
+            ('2024-01-01', '2024-12-31', 'working-claims-2024.csv'),
+            ('2023-01-01', '2023-12-31', 'working-claims-2023.csv'),
+            ('2022-01-01', '2022-12-31', 'working-claims-2022.csv'),
+        ]
+        
+        # One range at a time, newest first: older years are only queried
+        # when the newer ones come back empty
+        found_any = False
+        for start, end, filename in date_ranges:
+            claims = await search_claims(client, start, end)
+            if claims:
+                if create_csv_from_claims(claims, f'csv-templates/{filename}'):
+                    found_any = True
+                    break  # Stop after finding claims in one range
     
     if found_any:
         print("""
@@ -204,4 +180,4 @@ This means:
         """)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
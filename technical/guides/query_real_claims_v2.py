@@ -2,88 +2,69 @@
 """
 Query UHC API with proper constraints (90 days, last 24 months)
 """
-import requests
+import asyncio
 import csv
-from datetime import datetime, timedelta
 
-API_BASE_URL = "https://connectme.be.totesoft.com"
+from connectme import ClaimsClient
+from connectme.cache import CachedSearch
+from connectme.dates import iso
+from connectme.planner import trailing_windows
 
-def get_auth_token():
+async def get_auth_token(client):
     """Get authentication token"""
     print("🔐 Authenticating...")
     try:
-        response = requests.post(f"{API_BASE_URL}/api/v1/auth/mock/login/", json={}, timeout=10)
-        if response.status_code == 200:
-            token = response.json().get('access_token')
-            print(f"✅ Authenticated")
-            return token
-        return None
+        token = await client.token()
+        print(f"✅ Authenticated")
+        return token
     except Exception as e:
         print(f"❌ Auth error: {e}")
         return None
 
-def search_claims(token, start_date, end_date):
-    """Search for claims"""
-    print(f"🔍 Searching {start_date} to {end_date}...")
-    
-    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-    payload = {'firstServiceDate': start_date, 'lastServiceDate': end_date}
-    
+async def search_claims(search, start_date, end_date):
+    """Search for claims (days already fetched in the last 24h come from the local cache)"""
     try:
-        response = requests.post(f"{API_BASE_URL}/api/v1/claims/search/", 
-                               headers=headers, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            data = response.json()
-            claims = data.get('claims', [])
-            print(f"✅ Found {len(claims)} claims")
-            return claims
-        else:
-            print(f"❌ Error: {response.text[:150]}")
-            return []
+        claims = await search.search(start_date, end_date, timeout=30)
+        print(f"✅ {start_date} to {end_date}: found {len(claims)} claims")
+        return claims
     except Exception as e:
-        print(f"❌ Search error: {e}")
+        print(f"❌ {start_date} to {end_date}: search error: {e}")
         return []
 
-def main():
+async def main():
     print("\n" + "="*70)
     print("  QUERYING UHC API FOR REAL CLAIMS")
     print("  (with proper constraints: 90 days max, last 24 months)")
     print("="*70 + "\n")
     
-    token = get_auth_token()
-    if not token:
-        return
-    
-    # Generate 90-day windows within last 24 months
-    today = datetime.now()
-    date_windows = []
-    
-    # Try last 6 quarters (90-day windows)
-    for i in range(6):
-        end = today - timedelta(days=i*90)
-        start = end - timedelta(days=89)  # 90 days total
+    async with ClaimsClient() as client:
+        token = await get_auth_token(client)
+        if not token:
+            return
         
-        # Only if within 24 months
-        if (today - start).days <= 730:
-            date_windows.append((
-                start.strftime('%Y-%m-%d'),
-                end.strftime('%Y-%m-%d'),
-                f"Q{i+1}"
-            ))
+        # Last 6 back-to-back 90-day windows, clipped to the 24-month lookback
+        date_windows = [
+            (iso(start), iso(end), f"Q{i+1}")
+            for i, (start, end) in enumerate(trailing_windows(6))
+        ]
+    
+        print(f"Will try {len(date_windows)} date windows:\n")
     
-    print(f"Will try {len(date_windows)} date windows:\n")
+        # All windows are searched concurrently over one pooled connection set
+        search = CachedSearch(client)
+        results = await asyncio.gather(
+            *(search_claims(search, start, end) for start, end, _ in date_windows)
+        )
+        print(f"   💾 Cache hit ratio: {search.cache.hit_ratio:.0%}")
     
-    all_claims = []
-    for start, end, label in date_windows:
-        print(f"\n[{label}] {start} to {end}")
-        claims = search_claims(token, start, end)
-        if claims:
-            all_claims.extend(claims)
-            print(f"   📊 Total claims collected: {len(all_claims)}")
-            if len(all_claims) >= 10:
-                print(f"   ✅ Got enough claims, stopping search")
-                break
+        all_claims = []
+        for (start, end, label), claims in zip(date_windows, results):
+            if claims:
+                all_claims.extend(claims)
+                print(f"   [{label}] 📊 Total claims collected: {len(all_claims)}")
+                if len(all_claims) >= 10:
+                    print(f"   ✅ Got enough claims")
+                    break
     
     if all_claims:
         # Create CSV
@@ -131,4 +112,4 @@ Try using your enhanced-template-real.csv with the correct date range
         """)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
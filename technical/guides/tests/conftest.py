@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The guide scripts import connectme from technical/guides
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
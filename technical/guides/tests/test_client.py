@@ -0,0 +1,89 @@
+"""
+ClaimsClient against the in-memory FakeBackend: token cache, 401 retry and
+concurrent searches. Offline; run from technical/guides with `python -m pytest tests`.
+"""
+import asyncio
+
+from connectme import ClaimsClient, FakeBackend, generate_claims
+from connectme.client import MOCK_LOGIN_PATH, SEARCH_PATH
+from connectme.dates import parse_date
+from connectme.stores import LocalStore
+
+START, END = '2025-07-01', '2025-07-31'
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def backend(**kwargs):
+    return FakeBackend(generate_claims(40, START, END), **kwargs)
+
+
+def test_token_is_fetched_once_and_reused():
+    fake = backend()
+
+    async def main():
+        async with ClaimsClient(transport=fake) as client:
+            for _ in range(5):
+                assert len(await client.search(START, END)) == 40
+
+    run(main())
+    assert fake.tokens_issued == 1
+    assert len(fake.calls_to(MOCK_LOGIN_PATH)) == 1
+
+
+def test_token_inside_expiry_leeway_is_refreshed():
+    # expires_in below the 30s leeway: every request needs a new token
+    fake = backend(token_ttl=10)
+
+    async def main():
+        async with ClaimsClient(transport=fake) as client:
+            await client.search(START, END)
+            await client.search(START, END)
+
+    run(main())
+    assert fake.tokens_issued == 2
+
+
+def test_401_fetches_a_new_token_and_retries_once():
+    fake = backend()
+
+    async def main():
+        async with ClaimsClient(transport=fake) as client:
+            await client.search(START, END)
+            fake.expire_tokens()
+            return await client.search(START, END)
+
+    claims = run(main())
+    assert len(claims) == 40
+    assert fake.tokens_issued == 2
+    # first search, the rejected attempt, and its retry
+    assert len(fake.calls_to(SEARCH_PATH)) == 3
+
+
+def test_concurrent_searches_share_one_login_and_respect_max_concurrency():
+    fake = backend(latency=0.01)
+    windows = [(f'2025-07-{day:02d}', f'2025-07-{day:02d}') for day in range(1, 32)]
+
+    async def main():
+        async with ClaimsClient(transport=fake, max_concurrency=4) as client:
+            return await asyncio.gather(*(client.search(start, end) for start, end in windows))
+
+    results = run(main())
+    assert sum(len(claims) for claims in results) == 40
+    for (start, _), claims in zip(windows, results):
+        assert all(parse_date(claim['serviceDate']) == parse_date(start) for claim in claims)
+    assert fake.tokens_issued == 1
+    assert fake.max_in_flight <= 4
+
+
+def test_clients_on_one_token_store_share_a_login():
+    fake, store = backend(), LocalStore()
+
+    async def main():
+        clients = [ClaimsClient(transport=fake, token_store=store) for _ in range(3)]
+        await asyncio.gather(*(client.search(START, END) for client in clients for _ in range(3)))
+
+    run(main())
+    assert fake.tokens_issued == 1
@@ -9,15 +9,23 @@ Usage:
     python test_status_filter.py --practice-id 1 --month1 2024-07 --month2 2024-08
 """
 
+import asyncio
 import requests
 import json
 import argparse
+import time
 from datetime import datetime, timedelta
 from collections import defaultdict
+from pathlib import Path
 import sys
 
+# Shared tooling lives in technical/guides/connectme
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / 'guides'))
+from connectme import ClaimsAPIError, ClaimsClient, StaticTokenAuth
+from connectme.planner import month_window
+
 # Configuration
-API_BASE_URL = "https://pre-prod.connectme.be.totessoft.com/api/v1"
+BACKEND_URL = "https://pre-prod.connectme.be.totessoft.com"
 KEYCLOAK_URL = "https://auth.totesoft.com/realms/connectme-preprod/protocol/openid-connect/token"
 
 
@@ -27,23 +35,29 @@ class ClaimStatusFilterTester:
         self.practice_id = practice_id
         self.results = {}
         
+    async def _stream_claims(self, first_date, last_date, status_filter):
+        """Collect claims page by page, reporting progress as each page lands"""
+        claims = []
+        started = time.monotonic()
+        client = ClaimsClient(
+            BACKEND_URL, auth=StaticTokenAuth(self.access_token), timeout=120
+        )
+        async with client:
+            page_number = 0
+            async for page in client.iter_search_pages(
+                first_date, last_date,
+                practice_id=self.practice_id,
+                status_filter=status_filter,
+            ):
+                page_number += 1
+                claims.extend(page)
+                if page_number == 1:
+                    print(f"   ⏱️  First page after {time.monotonic() - started:.1f}s")
+                print(f"   📄 Page {page_number}: +{len(page)} claims ({len(claims)} so far)")
+        return claims
+    
     def search_claims(self, first_date, last_date, status_filter=None, test_name=""):
         """Search claims with given parameters"""
-        url = f"{API_BASE_URL}/claims/search/"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "firstServiceDate": first_date,
-            "lastServiceDate": last_date,
-            "practiceId": str(self.practice_id)
-        }
-        
-        if status_filter:
-            payload["statusFilter"] = status_filter
-        
         print(f"\n{'='*60}")
         print(f"Test: {test_name}")
         print(f"Date Range: {first_date} to {last_date}")
@@ -51,61 +65,49 @@ class ClaimStatusFilterTester:
         print(f"{'='*60}")
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=120)
-            
-            if response.status_code == 200:
-                data = response.json()
-                claims = data.get('claims', [])
-                
-                # Analyze results
-                claim_numbers = [c.get('claimNumber') for c in claims]
-                statuses = [c.get('status') for c in claims]
-                status_counts = defaultdict(int)
-                for status in statuses:
-                    status_counts[status] += 1
-                
-                result = {
-                    'success': True,
-                    'count': len(claims),
-                    'claim_numbers': claim_numbers,
-                    'status_counts': dict(status_counts),
-                    'claims': claims
-                }
-                
-                print(f"✅ SUCCESS: {len(claims)} claims returned")
-                print(f"   Claim Numbers: {', '.join(claim_numbers[:5])}{'...' if len(claim_numbers) > 5 else ''}")
-                print(f"   Status Breakdown: {dict(status_counts)}")
-                
-                return result
-            else:
-                print(f"❌ FAILED: HTTP {response.status_code}")
-                print(f"   Error: {response.text}")
-                return {
-                    'success': False,
-                    'error': response.text,
-                    'status_code': response.status_code
-                }
-                
+            claims = asyncio.run(self._stream_claims(first_date, last_date, status_filter))
+        except ClaimsAPIError as e:
+            print(f"❌ FAILED: HTTP {e.status_code}")
+            print(f"   Error: {e.message}")
+            return {
+                'success': False,
+                'error': e.message,
+                'status_code': e.status_code
+            }
         except Exception as e:
             print(f"❌ EXCEPTION: {str(e)}")
             return {
                 'success': False,
                 'error': str(e)
             }
+        
+        # Analyze results
+        claim_numbers = [c.get('claimNumber') for c in claims]
+        statuses = [c.get('status') for c in claims]
+        status_counts = defaultdict(int)
+        for status in statuses:
+            status_counts[status] += 1
+        
+        result = {
+            'success': True,
+            'count': len(claims),
+            'claim_numbers': claim_numbers,
+            'status_counts': dict(status_counts),
+            'claims': claims
+        }
+        
+        print(f"✅ SUCCESS: {len(claims)} claims returned")
+        print(f"   Claim Numbers: {', '.join(claim_numbers[:5])}{'...' if len(claim_numbers) > 5 else ''}")
+        print(f"   Status Breakdown: {dict(status_counts)}")
+        
+        return result
     
     def run_test_suite(self, month1, month2, status_to_test="DENIED"):
         """Run complete test suite"""
         
-        # Parse months (format: YYYY-MM)
-        year1, mon1 = month1.split('-')
-        year2, mon2 = month2.split('-')
-        
-        # Calculate date ranges
-        first_date_month1 = f"{month1}-01"
-        last_date_month1 = f"{month1}-30"  # Simplified, adjust for actual month end
-        
-        first_date_month2 = f"{month2}-01"
-        last_date_month2 = f"{month2}-30"
+        # Calculate date ranges (months in YYYY-MM format, real month ends)
+        first_date_month1, last_date_month1 = (d.isoformat() for d in month_window(month1))
+        first_date_month2, last_date_month2 = (d.isoformat() for d in month_window(month2))
         
         first_date_combined = first_date_month1
         last_date_combined = last_date_month2
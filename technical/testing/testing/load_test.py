@@ -0,0 +1,130 @@
+#!/opt/homebrew/bin/python3
+"""
+Load test: practice list, claims search, bulk upload and job polling from concurrent users
+
+Usage:
+    /opt/homebrew/bin/python3 load_test.py <username> <password> [--profile ramp]
+    /opt/homebrew/bin/python3 load_test.py vigneshr mypassword --profile month-end --output load.json
+    /opt/homebrew/bin/python3 load_test.py vigneshr mypassword --users 20 --duration 300 --mix search=1
+    /opt/homebrew/bin/python3 load_test.py --local --profile 10s:5,20s:20,10s:0      # dry run, no backend
+
+Profiles: smoke, ramp, spike, month-end, or stages like '60s:10,2m:50,30s:0'.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import urllib3
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'guides'))
+from connectme.loadtest import (
+    ERROR_BUDGET,
+    FLOW_WEIGHTS,
+    P95_BUDGET,
+    PROFILES,
+    THINK_SECONDS,
+    LoadTest,
+    format_report,
+    keycloak_login,
+    mock_login,
+    parse_profile,
+)
+
+# Disable SSL warnings (for self-signed certificates)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Configuration
+BACKEND_URL = "https://pre-prod.connectme.be.totessoft.com"
+KEYCLOAK_URL = "https://auth.totesoft.com/realms/connectme-preprod/protocol/openid-connect/token"
+
+
+def parse_mix(value):
+    """'practices=3,search=5,bulk=1' -> weights (missing flows get 0)"""
+    weights = dict.fromkeys(FLOW_WEIGHTS, 0)
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in weights:
+            raise argparse.ArgumentTypeError(f"Unknown flow {name!r} (use {', '.join(FLOW_WEIGHTS)})")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('username', nargs='?')
+    parser.add_argument('password', nargs='?')
+    parser.add_argument('--target', default=BACKEND_URL)
+    parser.add_argument('--keycloak-url', default=KEYCLOAK_URL)
+    parser.add_argument('--mock-login', action='store_true', help="log in via /auth/mock/login/")
+    parser.add_argument('--local', action='store_true',
+                        help="start a local stand-in backend and target it (checks the harness itself)")
+    parser.add_argument('--profile', type=parse_profile, default='smoke',
+                        help=f"{', '.join(PROFILES)} or '60s:10,2m:50,30s:0'")
+    parser.add_argument('--users', type=int, help="constant users instead of a profile")
+    parser.add_argument('--duration', type=float, default=300, help="seconds at --users")
+    parser.add_argument('--mix', type=parse_mix, default=FLOW_WEIGHTS,
+                        help="flow weights, e.g. practices=3,search=5,bulk=1")
+    parser.add_argument('--think', type=float, nargs=2, default=THINK_SECONDS, metavar=('MIN', 'MAX'))
+    parser.add_argument('--output', help="save the full report (histograms, timeline) as JSON")
+    args = parser.parse_args()
+
+    profile = args.profile
+    if args.users:
+        profile = [(min(30.0, args.duration / 10), args.users), (args.duration, args.users)]
+
+    server = None
+    if args.local:
+        from connectme.uhc_server import FakeUHCServer, SyntheticClaims
+        server = FakeUHCServer(SyntheticClaims(5000, '2025-07-01', '2025-09-30'),
+                               latency=(0.05, 0.3)).start()
+        args.target, auth = server.url, mock_login
+    elif args.mock_login:
+        auth = mock_login
+    elif args.username and args.password:
+        auth = keycloak_login(args.username, args.password, args.keycloak_url)
+    else:
+        print("❌ Error: Username and password required (or --mock-login / --local)")
+        print("Usage: python3 load_test.py <username> <password> [--profile ramp]")
+        sys.exit(1)
+
+    print("=" * 80)
+    print("🔥 ConnectMe Load Test")
+    print("=" * 80)
+    print(f"Target: {args.target}")
+    print(f"Profile: {', '.join(f'{s:g}s→{u}' for s, u in profile)}")
+    print(f"Flows: {', '.join(f'{k}={v:g}' for k, v in args.mix.items() if v)}")
+    print("=" * 80)
+
+    def on_tick(elapsed, users, recorder):
+        if int(elapsed) % 10 == 0:
+            second = recorder.timeline[-1] if recorder.timeline else None
+            rate = f"{second.requests} req/s, {second.errors} errors" if second else ''
+            print(f"   t={elapsed:5.0f}s  users={users:<4} {rate}")
+
+    test = LoadTest(args.target, auth=auth, profile=profile, weights=args.mix,
+                    think_seconds=tuple(args.think), verify=False)
+    try:
+        report = test.run(on_tick=on_tick)
+    finally:
+        if server:
+            server.stop()
+
+    print()
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to {args.output}")
+
+    total = sum(s['requests'] for s in report['endpoints'].values())
+    errors = sum(s['errors'] for s in report['endpoints'].values())
+    if not total:
+        print("❌ No requests completed")
+        sys.exit(1)
+    print(f"\n{'✅' if errors / total <= ERROR_BUDGET else '⚠️ '} {total} requests, "
+          f"{errors / total:.2%} errors (budget {ERROR_BUDGET:.0%}, p95 budget {P95_BUDGET:g}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,26 @@
 #   ./run_all_tests.sh <username> <password>
 #   ./run_all_tests.sh vigneshr mypassword
 #
+# Load mode (same flows from concurrent virtual users, see load_test.py):
+#   ./run_all_tests.sh --load <profile> <username> <password> [load_test.py options]
+#   ./run_all_tests.sh --load ramp vigneshr mypassword --output load.json
+#   Profiles: smoke, ramp, spike, month-end, or stages like 60s:10,2m:50,30s:0
+#
+
+# Load mode
+if [ "$1" == "--load" ]; then
+    if [ $# -lt 4 ]; then
+        echo "❌ Error: Profile, username and password required"
+        echo ""
+        echo "Usage: ./run_all_tests.sh --load <profile> <username> <password> [options]"
+        echo "Example: ./run_all_tests.sh --load ramp vigneshr mypassword"
+        exit 1
+    fi
+    PROFILE=$2
+    shift 2
+    cd "$(dirname "$0")"
+    exec python3 load_test.py "$@" --profile "$PROFILE"
+fi
 
 # Check if credentials provided
 if [ $# -lt 2 ]; then
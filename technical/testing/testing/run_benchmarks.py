@@ -0,0 +1,91 @@
+#!/opt/homebrew/bin/python3
+"""
+Benchmark /claims/search/ and the bulk-upload pipeline against a local fake UHC
+
+No credentials or network needed: a stand-in UHC server (connectme/uhc_server.py)
+runs on localhost with the latency, page size and error rate given here.
+
+Usage:
+    /opt/homebrew/bin/python3 run_benchmarks.py                               # 10 .. 100k claims
+    /opt/homebrew/bin/python3 run_benchmarks.py --doc-table --latency 1.5     # 8_BULK_UPLOAD_OPTIMIZATION.md table
+    /opt/homebrew/bin/python3 run_benchmarks.py --sizes 10 1000 --latency 0.05,0.3 --error-rate 0.02
+    /opt/homebrew/bin/python3 run_benchmarks.py --output new.json --baseline baseline.json
+
+Exits 1 when a result regressed against --baseline or a documented target was missed.
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'guides'))
+from connectme.bench import (
+    REGRESSION_TOLERANCE,
+    SCENARIOS,
+    SIZES,
+    TARGETS,
+    compare,
+    format_table,
+    load_results,
+    run_suite,
+    save_results,
+)
+
+
+def parse_latency(value):
+    """'0.2' -> 0.2, '0.1,0.5' -> (0.1, 0.5)"""
+    parts = [float(p) for p in value.split(',')]
+    return parts[0] if len(parts) == 1 else tuple(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--doc-table', action='store_true',
+                        help=f"bulk runs at the documented sizes {sorted(TARGETS)}")
+    parser.add_argument('--latency', type=parse_latency, default=0.0,
+                        help="seconds per UHC request, or low,high (default 0)")
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--output', default=f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument('--baseline', help="earlier --output file to compare against")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+    if args.doc_table:
+        args.sizes, args.scenarios = sorted(TARGETS), ['bulk']
+
+    print("=" * 80)
+    print("⏱️  ConnectMe benchmarks (local fake UHC)")
+    print("=" * 80)
+    print(f"Sizes: {args.sizes}  Scenarios: {args.scenarios}")
+    print(f"Latency: {args.latency}  Page size: {args.page_size}  Error rate: {args.error_rate}")
+    print()
+
+    results = run_suite(
+        args.sizes, args.scenarios, latency=args.latency, page_size=args.page_size,
+        error_rate=args.error_rate,
+        on_result=lambda r: print(f"   {r.scenario} x{r.claims}: {r.seconds:.2f}s"),
+    )
+    print()
+    print(format_table(results))
+    save_results(results, args.output, latency=args.latency, page_size=args.page_size,
+                 error_rate=args.error_rate, run_at=datetime.now().isoformat())
+    print(f"\n💾 Results saved to {args.output}")
+
+    missed = [r for r in results if r.met_target is False]
+    for r in missed:
+        print(f"❌ {r.claims} claims took {r.seconds:.1f}s (documented: ~{r.target_seconds:g}s)")
+    failed = bool(missed)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if not regressions:
+            print(f"✅ No regressions against {args.baseline}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,14 +9,17 @@ Usage:
 import requests
 import json
 import sys
-import time
 import os
 import urllib3
 import ssl
 from datetime import datetime, date, timedelta
+from pathlib import Path
 from requests.adapters import HTTPAdapter
 from urllib3.poolmanager import PoolManager
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'guides'))
+from connectme.events import apply_event, follow_job
+
 # Disable SSL warnings (for self-signed certificates)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -151,45 +154,33 @@ def upload_csv(token, filename, provider='uhc', use_batch_query=True):
         return False, None
 
 def monitor_job_progress(token, job_id, max_wait=60):
-    """Monitor job processing progress"""
+    """Monitor job processing progress (event stream, or polling on older backends)"""
     print_header("Step 4: Monitoring Job Progress")
     
-    start_time = time.time()
-    check_count = 0
+    job_url = f"{BACKEND_URL}/api/v1/claims/csv-jobs/{job_id}/"
+    job_data = {}
     
-    while time.time() - start_time < max_wait:
-        check_count += 1
-        
-        try:
-            response = session.get(
-                f"{BACKEND_URL}/api/v1/claims/csv-jobs/{job_id}/",
-                headers={'Authorization': f'Bearer {token}'},
-                timeout=10
-            )
+    try:
+        for event in follow_job(session, f"{job_url}events/", job_url,
+                                headers={'Authorization': f'Bearer {token}'}, max_wait=max_wait):
+            job_data = apply_event(job_data, event)
+            if event['type'] == 'rows':
+                for row in event['rows']:
+                    marker = '✓' if row.get('success') else '✗'
+                    print_info(f"  {marker} row {row.get('row')}: {row.get('claim_number')} {row.get('status') or row.get('error') or ''}")
+                continue
             
-            if response.status_code == 200:
-                job_data = response.json()
-                status = job_data.get('status')
-                processed = job_data.get('processed_rows', 0)
-                total = job_data.get('total_rows', 0)
-                success_count = job_data.get('success_count', 0)
-                failure_count = job_data.get('failure_count', 0)
-                
-                progress = (processed / total * 100) if total > 0 else 0
-                
-                print_info(f"[Check {check_count}] Status: {status} | Progress: {progress:.1f}% ({processed}/{total}) | Success: {success_count} | Failed: {failure_count}")
-                
-                if status in ['COMPLETED', 'FAILED', 'CANCELLED']:
-                    print_success(f"Job finished with status: {status}")
-                    return True, job_data
-                
-                time.sleep(3)
-            else:
-                print_error(f"Failed to check job status: {response.status_code}")
-                return False, None
-        except Exception as e:
-            print_error(f"Error checking job status: {e}")
-            return False, None
+            processed = job_data.get('processed_rows', 0)
+            total = job_data.get('total_rows', 0)
+            progress = (processed / total * 100) if total > 0 else 0
+            print_info(f"[{event['type']}] Status: {job_data.get('status')} | Progress: {progress:.1f}% ({processed}/{total}) | Success: {job_data.get('success_count', 0)} | Failed: {job_data.get('failure_count', 0)}")
+            
+            if event['type'] == 'done':
+                print_success(f"Job finished with status: {job_data.get('status')}")
+                return True, job_data
+    except Exception as e:
+        print_error(f"Error checking job status: {e}")
+        return False, None
     
     print_error(f"Job did not complete within {max_wait} seconds")
     return False, None
@@ -5,6 +5,11 @@ This searches for claims by patient name, DOB, and practice
 """
 import requests
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'guides'))
+from connectme.events import apply_event, follow_job
 
 # Configuration
 BACKEND_URL = "https://pre-prod.connectme.be.totessoft.com"
@@ -103,34 +108,25 @@ try:
         # Step 4: Check job progress
         print()
         print("Step 4: Monitoring job progress...")
-        import time
+        job_url = f"{BACKEND_URL}/api/v1/claims/bulk/jobs/{job_id}/"
+        job_state = {}
+        status_val = None
         
-        for i in range(20):  # Check for up to 60 seconds
-            time.sleep(3)
-            
-            try:
-                progress_response = requests.get(
-                    f"{BACKEND_URL}/api/v1/claims/bulk/jobs/{job_id}/progress/",
-                    headers={'Authorization': f'Bearer {access_token}'},
-                    timeout=10
-                )
+        try:
+            for event in follow_job(requests, f"{job_url}events/", f"{job_url}progress/",
+                                    headers={'Authorization': f'Bearer {access_token}'}, max_wait=60):
+                if event['type'] == 'rows':
+                    continue
+                job_state = apply_event(job_state, event)
+                status_val = job_state.get('status')
+                processed = job_state.get('processed_rows', 0)
+                total = job_state.get('total_rows', 0)
+                success = job_state.get('success_count', 0)
+                failed = job_state.get('failure_count', 0)
                 
-                if progress_response.status_code == 200:
-                    progress = progress_response.json()
-                    status_val = progress.get('status')
-                    processed = progress.get('processed_rows', 0)
-                    total = progress.get('total_rows', 0)
-                    success = progress.get('success_count', 0)
-                    failed = progress.get('failure_count', 0)
-                    
-                    print(f"   [{i+1}] Status: {status_val} | Processed: {processed}/{total} | Success: {success} | Failed: {failed}")
-                    
-                    if status_val in ['COMPLETED', 'FAILED', 'CANCELLED']:
-                        break
-                else:
-                    print(f"   ⚠️  Progress check failed: {progress_response.status_code}")
-            except Exception as e:
-                print(f"   ⚠️  Progress check error: {e}")
+                print(f"   [{event['type']}] Status: {status_val} | Processed: {processed}/{total} | Success: {success} | Failed: {failed}")
+        except Exception as e:
+            print(f"   ⚠️  Progress check error: {e}")
         
         # Step 5: Get results
         print()
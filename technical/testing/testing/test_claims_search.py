@@ -6,34 +6,17 @@ Usage:
     python3 test_claims_search.py <username> <password>
     python3 test_claims_search.py vigneshr mypassword
 """
-import requests
-import json
+import asyncio
 import sys
-import urllib3
-import ssl
 from datetime import datetime, date, timedelta
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
+from pathlib import Path
 
-# Disable SSL warnings (for self-signed certificates)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# Create a custom SSL adapter to handle SSL issues
-class SSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, *args, **kwargs):
-        context = ssl.create_default_context()
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        kwargs['ssl_context'] = context
-        return super().init_poolmanager(*args, **kwargs)
-
-# Create a session with the custom adapter
-session = requests.Session()
-session.mount('https://', SSLAdapter())
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'guides'))
+from connectme import ClaimsAPIError, ClaimsClient, KeycloakPasswordAuth
+from connectme.client import PRACTICES_PATH, SEARCH_PATH
 
 # Configuration
 BACKEND_URL = "https://pre-prod.connectme.be.totessoft.com"
-KEYCLOAK_URL = "https://auth.totesoft.com/realms/connectme-preprod/protocol/openid-connect/token"
 
 # Get credentials from command line or use defaults
 TEST_USERNAME = sys.argv[1] if len(sys.argv) > 1 else "vigneshr"
@@ -53,69 +36,47 @@ def print_error(message):
 def print_info(message):
     print(f"ℹ️  {message}")
 
-def get_auth_token(username, password):
-    """Get Keycloak authentication token"""
+async def get_auth_token(client, username):
+    """Get Keycloak authentication token (cached by the client for every later call)"""
     print_header("Step 1: Getting Authentication Token")
     
     try:
-        response = session.post(
-            KEYCLOAK_URL,
-            data={
-                'client_id': 'connectme-preprod-frontend',
-                'username': username,
-                'password': password,
-                'grant_type': 'password',
-                'scope': 'openid profile email',
-            },
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            token_data = response.json()
-            access_token = token_data['access_token']
-            print_success(f"Authenticated as: {username}")
-            print_info(f"Token: {access_token[:30]}...")
-            return access_token
-        else:
-            print_error(f"Authentication failed: {response.status_code}")
-            print_error(f"Response: {response.text}")
-            return None
+        access_token = await client.token()
+        print_success(f"Authenticated as: {username}")
+        print_info(f"Token: {access_token[:30]}...")
+        return access_token
+    except ClaimsAPIError as e:
+        print_error(f"Authentication failed: {e.status_code}")
+        print_error(f"Response: {e.message}")
+        return None
     except Exception as e:
         print_error(f"Authentication error: {e}")
         return None
 
-def get_practice_id(token):
+async def get_practice_id(client):
     """Get the first available practice ID"""
     print_header("Step 2: Getting Practice ID")
     
     try:
-        response = session.get(
-            f"{BACKEND_URL}/api/v1/providers/practices/",
-            headers={'Authorization': f'Bearer {token}'} if token else {},
-            timeout=10
-        )
+        data = await client.request("GET", PRACTICES_PATH, timeout=10)
+        practices = data.get('results', data) if isinstance(data, dict) else data
         
-        if response.status_code == 200:
-            data = response.json()
-            practices = data.get('results', data)
-            
-            if isinstance(practices, list) and len(practices) > 0:
-                practice = practices[0]
-                print_success(f"Found practice: {practice['name']} (ID: {practice['id']}, TIN: {practice['tin']})")
-                return practice['id']
-            else:
-                print_error("No practices found")
-                return None
+        if isinstance(practices, list) and len(practices) > 0:
+            practice = practices[0]
+            print_success(f"Found practice: {practice['name']} (ID: {practice['id']}, TIN: {practice['tin']})")
+            return practice['id']
         else:
-            print_error(f"Failed to get practices: {response.status_code}")
-            print_error(f"Response: {response.text}")
+            print_error("No practices found")
             return None
+    except ClaimsAPIError as e:
+        print_error(f"Failed to get practices: {e.status_code}")
+        print_error(f"Response: {e.message}")
+        return None
     except Exception as e:
         print_error(f"Error getting practices: {e}")
         return None
 
-def test_claims_search_scenario(token, practice_id, scenario_name, params):
+async def test_claims_search_scenario(client, practice_id, scenario_name, params):
     """Test a specific claims search scenario"""
     print_header(f"Testing: {scenario_name}")
     
@@ -127,62 +88,46 @@ def test_claims_search_scenario(token, practice_id, scenario_name, params):
         print_info(f"  {key}: {value}")
     
     try:
-        response = session.post(
-            f"{BACKEND_URL}/api/v1/claims/search/",
-            json=params,
-            headers={
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json',
-            },
-            timeout=60
-        )
+        # The full response (count, hasMore, transactionId), not just search()'s claims list
+        data = await client.request("POST", SEARCH_PATH, json=params, timeout=60)
         
-        print_info(f"Status Code: {response.status_code}")
+        # Handle different response formats
+        claims = data.get('claims', [])
+        count = data.get('count', len(claims))
+        has_more = data.get('hasMore', False)
+        transaction_id = data.get('transactionId')
         
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Handle different response formats
-            claims = data.get('claims', [])
-            count = data.get('count', len(claims))
-            has_more = data.get('hasMore', False)
-            transaction_id = data.get('transactionId')
-            
-            print_success(f"Search successful!")
-            print_info(f"Found: {count} claim(s)")
-            if has_more:
-                print_info("More results available")
-            if transaction_id:
-                print_info(f"Transaction ID: {transaction_id}")
-            
-            # Show sample claims
-            if claims and len(claims) > 0:
-                print_info("\nSample Claims:")
-                for i, claim in enumerate(claims[:5], 1):
-                    claim_num = claim.get('claimNumber', 'N/A')
-                    patient = claim.get('patient', 'N/A')
-                    status = claim.get('status', 'N/A')
-                    charged = claim.get('chargedAmount', 'N/A')
-                    paid = claim.get('paidAmount', 'N/A')
-                    print_info(f"  {i}. {claim_num} - {patient}")
-                    print_info(f"     Status: {status}, Charged: ${charged}, Paid: ${paid}")
-            
-            return True, data
-        else:
-            print_error(f"Search failed: {response.status_code}")
-            try:
-                error_data = response.json()
-                print_error(f"Error: {json.dumps(error_data, indent=2)}")
-            except:
-                print_error(f"Response: {response.text[:500]}")
-            return False, None
+        print_success(f"Search successful!")
+        print_info(f"Found: {count} claim(s)")
+        if has_more:
+            print_info("More results available")
+        if transaction_id:
+            print_info(f"Transaction ID: {transaction_id}")
+        
+        # Show sample claims
+        if claims and len(claims) > 0:
+            print_info("\nSample Claims:")
+            for i, claim in enumerate(claims[:5], 1):
+                claim_num = claim.get('claimNumber', 'N/A')
+                patient = claim.get('patient', 'N/A')
+                status = claim.get('status', 'N/A')
+                charged = claim.get('chargedAmount', 'N/A')
+                paid = claim.get('paidAmount', 'N/A')
+                print_info(f"  {i}. {claim_num} - {patient}")
+                print_info(f"     Status: {status}, Charged: ${charged}, Paid: ${paid}")
+        
+        return True, data
+    except ClaimsAPIError as e:
+        print_error(f"Search failed: {e.status_code}")
+        print_error(f"Response: {e.message[:500]}")
+        return False, None
     except Exception as e:
         print_error(f"Error during search: {e}")
         import traceback
         traceback.print_exc()
         return False, None
 
-def run_claims_search_tests():
+async def run_claims_search_tests():
     """Run all claims search tests"""
     print("\n" + "🚀 " + "="*76)
     print("🚀 ConnectMe Claims Search Test Suite")
@@ -198,14 +143,21 @@ def run_claims_search_tests():
         print_info("Example: python3 test_claims_search.py vigneshr mypassword")
         return False
     
+    # One client for the whole run: one login, pooled connections (verify=False for the self-signed cert)
+    auth = KeycloakPasswordAuth(TEST_USERNAME, TEST_PASSWORD)
+    async with ClaimsClient(BACKEND_URL, auth=auth, verify=False) as client:
+        return await run_scenarios(client)
+
+async def run_scenarios(client):
+    """Authenticate, pick a practice and run every search scenario"""
     # Get auth token
-    token = get_auth_token(TEST_USERNAME, TEST_PASSWORD)
+    token = await get_auth_token(client, TEST_USERNAME)
     if not token:
         print_error("Failed to authenticate. Cannot proceed with tests.")
         return False
     
     # Get practice ID
-    practice_id = get_practice_id(token)
+    practice_id = await get_practice_id(client)
     if not practice_id:
         print_error("Failed to get practice ID. Cannot proceed with tests.")
         return False
@@ -254,8 +206,8 @@ def run_claims_search_tests():
     results = {'passed': 0, 'failed': 0, 'total': len(scenarios)}
     
     for scenario in scenarios:
-        success, data = test_claims_search_scenario(
-            token,
+        success, data = await test_claims_search_scenario(
+            client,
             practice_id,
             scenario['name'],
             scenario['params']
@@ -296,6 +248,6 @@ def run_claims_search_tests():
     return results['failed'] == 0
 
 if __name__ == '__main__':
-    success = run_claims_search_tests()
+    success = asyncio.run(run_claims_search_tests())
     sys.exit(0 if success else 1)
 